@@ -1,8 +1,10 @@
 from django.contrib import admin
 from .models import (
     Grade, Subject, Chapter, StudyMaterial, Quiz, Question,
-    QuestionChoice, StudentProgress, Flashcard
+    QuestionChoice, StudentProgress, SubjectProgress, Flashcard, GenerationBatch, GenerationBatchItem,
+    ContentBundle, QuizSession, QuizSessionAnswer, FlashcardReview
 )
+from .dashboard import rebuild_subject_progress
 
 
 @admin.register(Grade)
@@ -20,14 +22,14 @@ class SubjectAdmin(admin.ModelAdmin):
 
 @admin.register(Chapter)
 class ChapterAdmin(admin.ModelAdmin):
-    list_display = ['title', 'subject', 'chapter_number', 'created_at']
+    list_display = ['title', 'subject', 'chapter_number', 'videos_fetched_at', 'videos_attempted_at', 'created_at']
     list_filter = ['subject']
     search_fields = ['title']
 
 
 @admin.register(StudyMaterial)
 class StudyMaterialAdmin(admin.ModelAdmin):
-    list_display = ['title', 'chapter', 'material_type', 'source', 'created_at']
+    list_display = ['title', 'chapter', 'material_type', 'source', 'quality_score', 'created_at']
     list_filter = ['material_type', 'source']
     search_fields = ['title']
 
@@ -54,9 +56,56 @@ class QuestionChoiceAdmin(admin.ModelAdmin):
 class StudentProgressAdmin(admin.ModelAdmin):
     list_display = ['student', 'chapter', 'status', 'progress_percentage', 'last_studied']
     list_filter = ['status']
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Admin saves bypass record_progress; recompute the affected aggregates
+        students = {obj.student_id, form.initial.get('student')} - {None}
+        rebuild_subject_progress(students)
+
+
+@admin.register(SubjectProgress)
+class SubjectProgressAdmin(admin.ModelAdmin):
+    list_display = ['student', 'subject', 'chapters_started', 'progress_total', 'mastered', 'difficult', 'last_studied']
 
 
 @admin.register(Flashcard)
 class FlashcardAdmin(admin.ModelAdmin):
     list_display = ['question', 'chapter', 'created_at']
     search_fields = ['question']
+
+
+@admin.register(GenerationBatch)
+class GenerationBatchAdmin(admin.ModelAdmin):
+    list_display = ['id', 'grade', 'subject', 'status', 'created_at', 'finished_at']
+    list_filter = ['status']
+
+
+@admin.register(GenerationBatchItem)
+class GenerationBatchItemAdmin(admin.ModelAdmin):
+    list_display = ['batch', 'chapter', 'status', 'attempts', 'questions_created', 'flashcards_created']
+    list_filter = ['status']
+
+
+@admin.register(ContentBundle)
+class ContentBundleAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'grade', 'version', 'chapters', 'size', 'raw_size', 'built_at']
+
+
+@admin.register(QuizSession)
+class QuizSessionAdmin(admin.ModelAdmin):
+    list_display = ['id', 'student', 'chapter', 'status', 'answered', 'correct', 'difficulty', 'created_at']
+    list_filter = ['status']
+
+
+@admin.register(QuizSessionAnswer)
+class QuizSessionAnswerAdmin(admin.ModelAdmin):
+    list_display = ['session', 'question', 'difficulty', 'is_correct', 'answered_at']
+
+
+@admin.register(FlashcardReview)
+class FlashcardReviewAdmin(admin.ModelAdmin):
+    list_display = ['student', 'flashcard', 'ease_factor', 'interval_days', 'repetitions', 'lapses', 'due_at']
+    raw_id_fields = ['student', 'flashcard']
+    # The table grows with students times cards; skip the unfiltered COUNT(*)
+    show_full_result_count = False
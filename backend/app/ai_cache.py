@@ -0,0 +1,223 @@
+"""
+Content-addressed response cache for Gemini calls.
+
+Responses are keyed on a hash of (function, model name, normalized prompt,
+parameters). A small in-process LRU answers repeated lookups without a network
+round trip and the shared Django cache (Redis in production) makes a response
+generated by one worker available to every other worker.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'ai-cache'
+COUNTERS = ('local_hits', 'shared_hits', 'misses')
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace so indentation changes don't produce new keys"""
+    return ' '.join(str(prompt).split())
+
+
+def content_tag(text):
+    """Tag identifying every response generated from a piece of source text"""
+    digest = hashlib.sha256(normalize_prompt(text).encode('utf-8')).hexdigest()
+    return f'{KEY_PREFIX}:tag:{digest}'
+
+
+def make_key(function, model_name, prompt, params=None):
+    """Build the cache key for one Gemini call"""
+    payload = json.dumps({
+        'function': function,
+        'model': model_name,
+        'prompt': normalize_prompt(prompt),
+        'params': params or {},
+    }, sort_keys=True, default=str)
+    digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    return f'{KEY_PREFIX}:{function}:{digest}'
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU with a per-entry TTL
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (found, value)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+            return True, value
+
+    def set(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class AIResponseCache:
+    """
+    Local LRU tier in front of the shared Django cache.
+
+    The shared tier is best effort: if Redis is unreachable lookups fall
+    through to Gemini instead of failing the request.
+    """
+
+    def __init__(self, alias=None, ttl=None, local_max_entries=None, local_ttl=None):
+        self.alias = alias or settings.AI_CACHE_ALIAS
+        self.ttl = ttl if ttl is not None else settings.AI_CACHE_TTL
+        self.local = LRUCache(
+            local_max_entries if local_max_entries is not None else settings.AI_CACHE_LOCAL_MAX_ENTRIES,
+            local_ttl if local_ttl is not None else settings.AI_CACHE_LOCAL_TTL,
+        )
+        self._counts = dict.fromkeys(COUNTERS, 0)
+        self._counts_lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        """Return the cached response for key, or None on a miss"""
+        found, value = self.local.get(key)
+        if found:
+            self._count('local_hits')
+            return value
+
+        try:
+            value = self.shared.get(key)
+        except Exception as e:
+            logger.warning("AI cache read failed: %s", e)
+            value = None
+
+        if value is not None:
+            self.local.set(key, value)
+            self._count('shared_hits')
+            return value
+
+        self._count('misses')
+        return None
+
+    def set(self, key, value, tags=()):
+        """Store a response; tags allow invalidating it with its source text"""
+        self.local.set(key, value)
+        try:
+            self.shared.set(key, value, self.ttl)
+            for tag in tags:
+                # Read-modify-write is not atomic; a lost index entry only means
+                # that response ages out via TTL instead of explicit invalidation.
+                keys = self.shared.get(tag) or []
+                if key not in keys:
+                    self.shared.set(tag, keys + [key], self.ttl)
+        except Exception as e:
+            logger.warning("AI cache write failed: %s", e)
+
+    def invalidate_content(self, text):
+        """Drop every response generated from the given source text"""
+        if not text:
+            return 0
+        tag = content_tag(text)
+        try:
+            keys = self.shared.get(tag) or []
+            self.shared.delete_many(keys + [tag])
+        except Exception as e:
+            logger.warning("AI cache invalidation failed: %s", e)
+            return 0
+        for key in keys:
+            self.local.delete(key)
+        return len(keys)
+
+    def clear_local(self):
+        self.local.clear()
+
+    def _count(self, name):
+        with self._counts_lock:
+            self._counts[name] += 1
+        record_cache('ai_response', name)
+        counter_key = f'{KEY_PREFIX}:stats:{name}'
+        try:
+            try:
+                self.shared.incr(counter_key)
+            except ValueError:
+                self.shared.add(counter_key, 0, None)
+                self.shared.incr(counter_key)
+        except Exception as e:
+            logger.debug("AI cache counter update failed: %s", e)
+
+    def stats(self):
+        """
+        Hit/miss counters for this process and across all workers
+        """
+        with self._counts_lock:
+            process = dict(self._counts)
+
+        try:
+            shared = self.shared.get_many([f'{KEY_PREFIX}:stats:{name}' for name in COUNTERS])
+            cluster = {name: shared.get(f'{KEY_PREFIX}:stats:{name}', 0) for name in COUNTERS}
+        except Exception as e:
+            logger.warning("AI cache stats read failed: %s", e)
+            cluster = None
+
+        return {
+            'process': _with_ratio(process),
+            'global': _with_ratio(cluster) if cluster is not None else None,
+            'local_entries': len(self.local),
+        }
+
+    def reset_stats(self):
+        with self._counts_lock:
+            self._counts = dict.fromkeys(COUNTERS, 0)
+        try:
+            self.shared.delete_many([f'{KEY_PREFIX}:stats:{name}' for name in COUNTERS])
+        except Exception as e:
+            logger.warning("AI cache stats reset failed: %s", e)
+
+
+def _with_ratio(counts):
+    hits = counts['local_hits'] + counts['shared_hits']
+    lookups = hits + counts['misses']
+    return {
+        **counts,
+        'hits': hits,
+        'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+    }
+
+
+response_cache = AIResponseCache()
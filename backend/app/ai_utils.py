@@ -1,40 +1,236 @@
 import google.generativeai as genai
+import itertools
 import json
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .ai_cache import content_tag, make_key, response_cache
+from .chunking import balance, chunk_counts, content_chunks, estimate_tokens
+from .gemini_client import GeminiUnavailable, gemini
+from .metrics import record_gemini_tokens, CHARS_PER_TOKEN
+from .rate_limit import RateLimited, consume
+from .streaming import failed_stream
+
+logger = logging.getLogger(__name__)
 
 # Configure Gemini API
 GEMINI_API_KEY = os.getenv('GOOGLE_GEMINI_API_KEY')
 if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
 
+MODEL_NAME = 'gemini-pro'
 
-def generate_summary(text, bullet_points=10):
+# Raised to the caller instead of being turned into an error message:
+# views answer 429/503 with Retry-After and jobs re-queue themselves
+UNAVAILABLE_ERRORS = (RateLimited, GeminiUnavailable)
+
+
+def _reserve_tokens(prompt):
+    """Charge the prompt's estimated tokens to the shared budget; the client charges each request"""
+    consume('gemini_tokens', len(prompt) // CHARS_PER_TOKEN)
+
+
+def _generate(function, prompt, params=None, source_text=None, parse=None, use_cache=True):
     """
-    Generate AI summary from chapter content using Google Gemini
+    Call Gemini through the response cache.
+
+    Only successfully parsed responses are cached, so a malformed reply is
+    retried on the next call instead of being served until it expires.
+    use_cache=False skips the lookup (to get a fresh response) but still
+    stores the result.
     """
-    if not GEMINI_API_KEY:
-        return "Google Gemini API key not configured"
-    
+    key = make_key(function, MODEL_NAME, prompt, params)
+    cached = response_cache.get(key) if use_cache else None
+    if cached is not None:
+        return cached
+
+    _reserve_tokens(prompt)
+    response = gemini.generate(function, MODEL_NAME, prompt)
+    text = response.text
+    record_gemini_tokens(function, prompt, text, getattr(response, 'usage_metadata', None))
+    result = parse(text) if parse else text
+
+    tags = [content_tag(source_text)] if source_text else []
+    response_cache.set(key, result, tags=tags)
+    return result
+
+
+def _stream(function, prompt, params=None, source_text=None):
+    """
+    Return an iterator over Gemini's response text as it is generated.
+
+    A cached response comes back as a single chunk; otherwise the full text is
+    written to the response cache once the stream completes. The cache
+    lookup, budget check and the call up to the first chunk happen
+    immediately, so RateLimited and GeminiUnavailable are raised to the
+    caller before any response has started. Any other error up to the first
+    chunk (a bad request, a blocked prompt) is logged and sent as the
+    stream's error message, like the non-streaming calls' error text.
+    """
+    key = make_key(function, MODEL_NAME, prompt, params)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return iter([cached])
+
+    _reserve_tokens(prompt)
     try:
-        model = genai.GenerativeModel('gemini-pro')
-        prompt = f"Summarize the following text into {bullet_points} bullet points:\n\n{text}"
-        response = model.generate_content(prompt)
-        return response.text
+        chunks = gemini.stream(function, MODEL_NAME, prompt)
+        first = next(chunks, None)
+    except UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
-        print(f"Gemini Error: {e}")
-        return f"Error generating summary: {str(e)}"
+        logger.warning("Streaming Generation Error: %s", e, exc_info=True)
+        return failed_stream(e)
+    if first is not None:
+        chunks = itertools.chain([first], chunks)
+    return _stream_chunks(function, key, prompt, source_text, chunks)
+
+
+def _stream_chunks(function, key, prompt, source_text, chunks):
+    parts = []
+    for text in chunks:
+        parts.append(text)
+        yield text
+    record_gemini_tokens(function, prompt, ''.join(parts))
 
+    tags = [content_tag(source_text)] if source_text else []
+    response_cache.set(key, ''.join(parts), tags=tags)
 
-def generate_mcq_quiz(chapter_content, num_questions=10):
+
+def _cached(function, prompt, params, source_text, compute, use_cache=True):
     """
-    Auto-generate Multiple Choice Questions from chapter content using Google Gemini
+    Cache the result of a map-reduce generation under the key a single call
+    with the full prompt would use, tagged with the full source text
     """
-    if not GEMINI_API_KEY:
+    key = make_key(function, MODEL_NAME, prompt, params)
+    cached = response_cache.get(key) if use_cache else None
+    if cached is not None:
+        return cached
+    result = compute()
+    response_cache.set(key, result, tags=[content_tag(source_text)])
+    return result
+
+
+def _fits_one_call(text):
+    return estimate_tokens(text or '') <= settings.AI_CHUNK_TOKENS
+
+
+def _map_chunks(call, chunks, counts):
+    """
+    Run call(chunk, count) in parallel for every chunk with a non-zero count.
+
+    Each chunk is cached on its own text (see _per_chunk), so after an edit
+    only the changed sections reach Gemini. A failed chunk is logged and
+    skipped; an exhausted budget or open circuit fails the whole generation.
+    """
+    jobs = [(chunk, count) for chunk, count in zip(chunks, counts) if count]
+    if not jobs:
         return []
-    
-    try:
-        model = genai.GenerativeModel('gemini-pro')
-        prompt = f"""
+    with ThreadPoolExecutor(max_workers=min(settings.AI_CHUNK_WORKERS, len(jobs))) as pool:
+        futures = [pool.submit(call, chunk, count) for chunk, count in jobs]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except UNAVAILABLE_ERRORS:
+            raise
+        except Exception as e:
+            logger.warning("Chunk Generation Error: %s", e, exc_info=True)
+    return results
+
+
+def _per_chunk(function, chunk, counts, generate, trim=None, use_cache=True):
+    """
+    generate() for one chunk of long content, cached on the chunk's text
+    with the counts it was asked for. Counts are the chunk's share of the
+    chapter's total and can move when another section is edited; a chunk
+    asked for no more than its cached result was made for reuses it, cut
+    down to counts by trim.
+    """
+    key = make_key(function, MODEL_NAME, chunk, {'per_chunk': sorted(counts)})
+    cached = response_cache.get(key) if use_cache else None
+    if cached is not None and all(cached['counts'].get(name, 0) >= count for name, count in counts.items()):
+        return trim(cached['result'], counts) if trim else cached['result']
+    result = generate()
+    response_cache.set(key, {'counts': counts, 'result': result}, tags=[content_tag(chunk)])
+    return result
+
+
+def _trim_items(items, counts):
+    (count,) = counts.values()
+    return items[:count] if isinstance(items, list) else items
+
+
+def _trim_chapter_content(content, counts):
+    return {
+        **content,
+        'quiz': content['quiz'][:counts['num_questions']],
+        'flashcards': content['flashcards'][:counts['num_cards']],
+    }
+
+
+def _with_surplus(count):
+    """Ask sections for a few extra items so duplicates dropped in the merge don't leave a shortfall"""
+    return count + max(1, count // 5)
+
+
+def _merge_items(results, count):
+    """
+    count items from the per-chunk item lists, without duplicates; chunks
+    contribute in proportion to what they produced
+    """
+    items = balance(results, count)
+    if not items:
+        raise ValueError('no chunk produced any items')
+    return items
+
+
+def _parse_json(response_text):
+    """Extract a JSON payload from a response, ignoring markdown code fences"""
+    response_text = response_text.strip()
+    # Remove markdown code blocks if present
+    if response_text.startswith('```json'):
+        response_text = response_text[7:]
+    if response_text.startswith('```'):
+        response_text = response_text[3:]
+    if response_text.endswith('```'):
+        response_text = response_text[:-3]
+    return json.loads(response_text.strip())
+
+
+def _summary_prompt(text, bullet_points):
+    return f"Summarize the following text into {bullet_points} bullet points:\n\n{text}"
+
+
+def _summary_reduce_prompt(section_summaries, bullet_points):
+    sections = '\n\n'.join(section_summaries)
+    return (
+        f"The following are summaries of consecutive sections of one chapter. Combine them into "
+        f"{bullet_points} bullet points covering the whole chapter, without repeating points:\n\n{sections}"
+    )
+
+
+def _summarize_sections(text, bullet_points):
+    """Per-chunk summaries of long content, in chapter order"""
+    chunks = content_chunks(text)
+    summaries = _map_chunks(
+        lambda chunk, points: _per_chunk('generate_summary', chunk, {'bullet_points': points}, lambda: _generate(
+            'generate_summary', _summary_prompt(chunk, points),
+            params={'bullet_points': points}, source_text=chunk,
+        )),
+        chunks, chunk_counts(bullet_points, chunks, minimum=2),
+    )
+    summaries = [summary for summary in summaries if summary]
+    if not summaries:
+        raise ValueError('no section could be summarized')
+    return summaries
+
+
+def _quiz_prompt(chapter_content, num_questions):
+    return f"""
         Generate {num_questions} multiple choice questions based on the following chapter content.
         Format the response as a JSON array with the following structure:
         [
@@ -47,26 +243,101 @@ def generate_mcq_quiz(chapter_content, num_questions=10):
         ]
         
         Chapter Content:
-        {chapter_content[:2000]}
+        {chapter_content}
+        
+        Return ONLY the JSON array, no additional text.
+        """
+
+
+def _flashcards_prompt(chapter_content, num_cards):
+    return f"""
+        Generate {num_cards} flashcard pairs (question-answer) based on the following chapter content.
+        Format as JSON array:
+        [
+            {{
+                "question": "What is...",
+                "answer": "The answer is..."
+            }}
+        ]
+        
+        Chapter Content:
+        {chapter_content}
         
         Return ONLY the JSON array, no additional text.
         """
+
+
+def _doubt_prompt(problem_description):
+    return f"""
+        A student has the following doubt/problem:
         
-        response = model.generate_content(prompt)
-        # Extract JSON from response
-        response_text = response.text.strip()
-        # Remove markdown code blocks if present
-        if response_text.startswith('```json'):
-            response_text = response_text[7:]
-        if response_text.startswith('```'):
-            response_text = response_text[3:]
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]
+        {problem_description}
         
-        quiz_data = json.loads(response_text.strip())
-        return quiz_data
+        Please provide a detailed step-by-step solution with explanation.
+        Make it clear and educational for students.
+        """
+
+
+def _concept_prompt(concept_name, grade_level):
+    return f"Explain the concept of '{concept_name}' for Class {grade_level} students in simple terms with examples. Make it easy to understand and educational."
+
+
+def generate_summary(text, bullet_points=10):
+    """
+    Generate AI summary from chapter content using Google Gemini
+    """
+    if not GEMINI_API_KEY:
+        return "Google Gemini API key not configured"
+    
+    try:
+        prompt = _summary_prompt(text, bullet_points)
+        params = {'bullet_points': bullet_points}
+        if _fits_one_call(text):
+            return _generate('generate_summary', prompt, params=params, source_text=text)
+        # Long content: summarize sections in parallel, then combine them
+        return _cached('generate_summary', prompt, params, text, lambda: _generate(
+            'reduce_summary', _summary_reduce_prompt(_summarize_sections(text, bullet_points), bullet_points),
+            params=params, source_text=text,
+        ))
+    except UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
-        print(f"Quiz Generation Error: {e}")
+        logger.warning("Gemini Error: %s", e, exc_info=True)
+        return f"Error generating summary: {str(e)}"
+
+
+def generate_mcq_quiz(chapter_content, num_questions=10, use_cache=True):
+    """
+    Auto-generate Multiple Choice Questions from chapter content using Google Gemini.
+    use_cache=False asks Gemini again even if the content was seen before.
+    """
+    if not GEMINI_API_KEY:
+        return []
+    
+    try:
+        params = {'num_questions': num_questions}
+        if _fits_one_call(chapter_content):
+            return _generate(
+                'generate_mcq_quiz', _quiz_prompt(chapter_content, num_questions),
+                params=params, source_text=chapter_content, parse=_parse_json, use_cache=use_cache,
+            )
+        # Long content: questions from each section in proportion to its length
+        chunks = content_chunks(chapter_content)
+        return _cached(
+            'generate_mcq_quiz', _quiz_prompt(chapter_content, num_questions), params, chapter_content,
+            lambda: _merge_items(_map_chunks(
+                lambda chunk, count: _per_chunk('generate_mcq_quiz', chunk, {'num_questions': count}, lambda: _generate(
+                    'generate_mcq_quiz', _quiz_prompt(chunk, count),
+                    params={'num_questions': count}, source_text=chunk, parse=_parse_json, use_cache=use_cache,
+                ), trim=_trim_items, use_cache=use_cache),
+                chunks, chunk_counts(_with_surplus(num_questions), chunks),
+            ), num_questions),
+            use_cache=use_cache,
+        )
+    except UNAVAILABLE_ERRORS:
+        raise
+    except Exception as e:
+        logger.warning("Quiz Generation Error: %s", e, exc_info=True)
         return []
 
 
@@ -78,63 +349,46 @@ def solve_doubt(problem_description, problem_image=None):
         return "Google Gemini API key not configured"
     
     try:
-        model = genai.GenerativeModel('gemini-pro')
-        prompt = f"""
-        A student has the following doubt/problem:
-        
-        {problem_description}
-        
-        Please provide a detailed step-by-step solution with explanation.
-        Make it clear and educational for students.
-        """
-        
-        response = model.generate_content(prompt)
-        return response.text
+        return _generate('solve_doubt', _doubt_prompt(problem_description))
+    except UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
-        print(f"Doubt Solver Error: {e}")
+        logger.warning("Doubt Solver Error: %s", e, exc_info=True)
         return f"Error solving doubt: {str(e)}"
 
 
-def generate_flashcards(chapter_content, num_cards=20):
+def generate_flashcards(chapter_content, num_cards=20, use_cache=True):
     """
-    Auto-generate flashcards from chapter content using Google Gemini
+    Auto-generate flashcards from chapter content using Google Gemini.
+    use_cache=False asks Gemini again even if the content was seen before.
     """
     if not GEMINI_API_KEY:
         return []
     
     try:
-        model = genai.GenerativeModel('gemini-pro')
-        prompt = f"""
-        Generate {num_cards} flashcard pairs (question-answer) based on the following chapter content.
-        Format as JSON array:
-        [
-            {{
-                "question": "What is...",
-                "answer": "The answer is..."
-            }}
-        ]
-        
-        Chapter Content:
-        {chapter_content[:2000]}
-        
-        Return ONLY the JSON array, no additional text.
-        """
-        
-        response = model.generate_content(prompt)
-        # Extract JSON from response
-        response_text = response.text.strip()
-        # Remove markdown code blocks if present
-        if response_text.startswith('```json'):
-            response_text = response_text[7:]
-        if response_text.startswith('```'):
-            response_text = response_text[3:]
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]
-        
-        flashcards = json.loads(response_text.strip())
-        return flashcards
+        params = {'num_cards': num_cards}
+        if _fits_one_call(chapter_content):
+            return _generate(
+                'generate_flashcards', _flashcards_prompt(chapter_content, num_cards),
+                params=params, source_text=chapter_content, parse=_parse_json, use_cache=use_cache,
+            )
+        # Long content: cards from each section in proportion to its length
+        chunks = content_chunks(chapter_content)
+        return _cached(
+            'generate_flashcards', _flashcards_prompt(chapter_content, num_cards), params, chapter_content,
+            lambda: _merge_items(_map_chunks(
+                lambda chunk, count: _per_chunk('generate_flashcards', chunk, {'num_cards': count}, lambda: _generate(
+                    'generate_flashcards', _flashcards_prompt(chunk, count),
+                    params={'num_cards': count}, source_text=chunk, parse=_parse_json, use_cache=use_cache,
+                ), trim=_trim_items, use_cache=use_cache),
+                chunks, chunk_counts(_with_surplus(num_cards), chunks),
+            ), num_cards),
+            use_cache=use_cache,
+        )
+    except UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
-        print(f"Flashcard Generation Error: {e}")
+        logger.warning("Flashcard Generation Error: %s", e, exc_info=True)
         return []
 
 
@@ -146,11 +400,163 @@ def explain_concept(concept_name, grade_level):
         return "Google Gemini API key not configured"
     
     try:
-        model = genai.GenerativeModel('gemini-pro')
-        prompt = f"Explain the concept of '{concept_name}' for Class {grade_level} students in simple terms with examples. Make it easy to understand and educational."
-        
-        response = model.generate_content(prompt)
-        return response.text
+        return _generate('explain_concept', _concept_prompt(concept_name, grade_level))
+    except UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
-        print(f"Concept Explanation Error: {e}")
+        logger.warning("Concept Explanation Error: %s", e, exc_info=True)
         return f"Error explaining concept: {str(e)}"
+
+
+def _chapter_content_prompt(chapter_content, bullet_points, num_questions, num_cards):
+    return f"""
+        Create study material for the following chapter content:
+        - a summary in {bullet_points} bullet points
+        - {num_questions} multiple choice questions
+        - {num_cards} flashcard pairs (question-answer)
+        Format the response as a JSON object with the following structure:
+        {{
+            "summary": ["Bullet point", "..."],
+            "quiz": [
+                {{
+                    "question": "Question text here?",
+                    "options": ["Option A", "Option B", "Option C", "Option D"],
+                    "correct_answer": 0,
+                    "difficulty": "easy"
+                }}
+            ],
+            "flashcards": [
+                {{
+                    "question": "What is...",
+                    "answer": "The answer is..."
+                }}
+            ]
+        }}
+        
+        Chapter Content:
+        {chapter_content}
+        
+        Return ONLY the JSON object, no additional text.
+        """
+
+
+def _parse_chapter_content(response_text):
+    data = _parse_json(response_text)
+    if not isinstance(data, dict):
+        raise ValueError('expected a JSON object')
+    summary = data.get('summary')
+    if isinstance(summary, list):
+        summary = '\n'.join(f'* {str(point).strip()}' for point in summary if str(point).strip())
+    return {
+        'summary': (summary or '').strip() if isinstance(summary, str) else '',
+        'quiz': data.get('quiz') if isinstance(data.get('quiz'), list) else [],
+        'flashcards': data.get('flashcards') if isinstance(data.get('flashcards'), list) else [],
+    }
+
+
+def _chapter_content_from_sections(chapter_content, bullet_points, num_questions, num_cards):
+    chunks = content_chunks(chapter_content)
+    counts = [
+        {'bullet_points': points, 'num_questions': questions, 'num_cards': cards}
+        for points, questions, cards in zip(
+            chunk_counts(bullet_points, chunks, minimum=2),
+            chunk_counts(_with_surplus(num_questions), chunks), chunk_counts(_with_surplus(num_cards), chunks),
+        )
+    ]
+    parts = _map_chunks(
+        lambda chunk, count: _per_chunk('generate_chapter_content', chunk, count, lambda: _generate(
+            'generate_chapter_content', _chapter_content_prompt(chunk, **count),
+            params=count, source_text=chunk, parse=_parse_chapter_content,
+        ), trim=_trim_chapter_content),
+        chunks, counts,
+    )
+    summaries = [part['summary'] for part in parts if part['summary']]
+    if not summaries:
+        raise ValueError('no section could be summarized')
+    return {
+        'summary': _generate(
+            'reduce_summary', _summary_reduce_prompt(summaries, bullet_points),
+            params={'bullet_points': bullet_points}, source_text=chapter_content,
+        ),
+        'quiz': balance([part['quiz'] for part in parts], num_questions),
+        'flashcards': balance([part['flashcards'] for part in parts], num_cards),
+    }
+
+
+def generate_chapter_content(chapter_content, bullet_points=10, num_questions=10, num_cards=20):
+    """
+    Generate summary, MCQ quiz and flashcards for a chapter with one Gemini
+    call (one per section, plus one combining the summaries, for long content).
+
+    Returns {'summary': str, 'quiz': [...], 'flashcards': [...]}, or None if
+    the call failed or the reply couldn't be parsed.
+    """
+    if not GEMINI_API_KEY:
+        return None
+    
+    try:
+        prompt = _chapter_content_prompt(chapter_content, bullet_points, num_questions, num_cards)
+        params = {'bullet_points': bullet_points, 'num_questions': num_questions, 'num_cards': num_cards}
+        if _fits_one_call(chapter_content):
+            return _generate(
+                'generate_chapter_content', prompt, params=params,
+                source_text=chapter_content, parse=_parse_chapter_content,
+            )
+        return _cached('generate_chapter_content', prompt, params, chapter_content,
+                       lambda: _chapter_content_from_sections(chapter_content, bullet_points, num_questions, num_cards))
+    except UNAVAILABLE_ERRORS:
+        raise
+    except Exception as e:
+        logger.warning("Chapter Content Generation Error: %s", e, exc_info=True)
+        return None
+
+
+def prime_summary_cache(text, summary, bullet_points=10):
+    """
+    Store a summary produced elsewhere (e.g. by a batch run) as the cached
+    generate_summary response for text
+    """
+    key = make_key('generate_summary', MODEL_NAME, _summary_prompt(text, bullet_points), {'bullet_points': bullet_points})
+    response_cache.set(key, summary, tags=[content_tag(text)])
+
+
+def stream_summary(text, bullet_points=10):
+    """
+    Streaming variant of generate_summary; returns an iterator of text chunks
+    """
+    if not GEMINI_API_KEY:
+        return iter(["Google Gemini API key not configured"])
+    prompt = _summary_prompt(text, bullet_points)
+    params = {'bullet_points': bullet_points}
+    if _fits_one_call(text):
+        return _stream('generate_summary', prompt, params=params, source_text=text)
+
+    # Long content: section summaries are generated up front, the combining call is streamed
+    cached = response_cache.get(make_key('generate_summary', MODEL_NAME, prompt, params))
+    if cached is not None:
+        return iter([cached])
+    try:
+        sections = _summarize_sections(text, bullet_points)
+    except ValueError as e:
+        return iter([f"Error generating summary: {e}"])
+    return _stream(
+        'reduce_summary', _summary_reduce_prompt(sections, bullet_points), params=params, source_text=text,
+    )
+
+
+def stream_doubt_solution(problem_description):
+    """
+    Streaming variant of solve_doubt; returns an iterator of text chunks
+    """
+    if not GEMINI_API_KEY:
+        return iter(["Google Gemini API key not configured"])
+    return _stream('solve_doubt', _doubt_prompt(problem_description))
+
+
+def stream_concept_explanation(concept_name, grade_level):
+    """
+    Streaming variant of explain_concept; returns an iterator of text chunks
+    """
+    if not GEMINI_API_KEY:
+        return iter(["Google Gemini API key not configured"])
+    return _stream('explain_concept', _concept_prompt(concept_name, grade_level))
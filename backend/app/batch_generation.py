@@ -0,0 +1,242 @@
+"""
+Batch generation of summaries, quizzes and flashcards for a grade or subject.
+
+Each chapter costs one Gemini call (generate_chapter_content) instead of one
+per content type. Chapters are processed in groups: a group's chapters are
+generated concurrently, then everything the group produced is written in one
+transaction of bulk inserts together with the group's checkpoint. Gemini
+replies are cached, so a group interrupted before its write doesn't pay for
+its chapters again when the batch is resumed.
+
+Chapters whose summary, quiz and flashcards were all generated from their
+current content (see fingerprints) are left out of new batches unless
+regenerate is set; stale=True limits a batch to chapters with artifacts
+generated from older content. A chapter's new output replaces everything
+previously generated for it.
+
+The generate_content command runs groups in-process; with --queue each group
+becomes a Celery task (see tasks.run_generation_batch_task). Either way every
+Gemini call draws from the shared rate limit budgets.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .ai_utils import generate_chapter_content, prime_summary_cache, UNAVAILABLE_ERRORS
+from .ingestion import (
+    validate_items, validate_question, validate_flashcard, bulk_create_quizzes, bulk_create_flashcards
+)
+from .catalog_cache import catalog_cache
+from .fingerprints import GENERATED_SUMMARY_SOURCE, backfill_fingerprints, dirty_chapters, remove_generated
+from .models import Chapter, GenerationBatch, GenerationBatchItem, Quiz, Flashcard, StudyMaterial
+from .search import index_objects
+
+logger = logging.getLogger(__name__)
+
+QUIZ_TITLE = 'AI Generated Quiz - {title}'
+SUMMARY_TITLE = 'AI Summary - {title}'
+
+
+def _current(model, **filters):
+    return Exists(model.objects.filter(chapter=OuterRef('pk'), source_hash=OuterRef('content_hash'), **filters))
+
+
+def create_batch(grade=None, subject=None, bullet_points=10, num_questions=10, num_cards=20,
+                 regenerate=False, stale=False):
+    """
+    Create a batch with one pending item per chapter (with content) in scope
+    that needs generating: chapters missing a current summary, quiz or
+    flashcards; with stale=True only chapters with stale artifacts; with
+    regenerate=True every chapter
+    """
+    # Chapter hashes may be out of date after queryset.update() or raw SQL
+    backfill_fingerprints()
+    chapters = Chapter.objects.exclude(content__isnull=True).exclude(content='')
+    if subject is not None:
+        chapters = chapters.filter(subject=subject)
+    elif grade is not None:
+        chapters = chapters.filter(subject__grade=grade)
+    if stale:
+        chapters = dirty_chapters(chapters)
+    elif not regenerate:
+        chapters = chapters.exclude(
+            _current(Quiz) & _current(Flashcard)
+            & _current(StudyMaterial, source=GENERATED_SUMMARY_SOURCE, material_type='note')
+        )
+    chapter_ids = chapters.order_by('subject_id', 'chapter_number').values_list('pk', flat=True)
+
+    with transaction.atomic():
+        batch = GenerationBatch.objects.create(
+            grade=grade, subject=subject, bullet_points=bullet_points,
+            num_questions=num_questions, num_cards=num_cards,
+        )
+        GenerationBatchItem.objects.bulk_create(
+            [GenerationBatchItem(batch=batch, chapter_id=chapter_id) for chapter_id in chapter_ids]
+        )
+    return batch
+
+
+def pending_groups(batch, group_size):
+    """Ids of items still to generate (pending, or failed with attempts left), in groups"""
+    item_ids = list(
+        batch.items.exclude(status='done')
+        .filter(attempts__lt=settings.GENERATION_BATCH_MAX_ATTEMPTS)
+        .order_by('pk').values_list('pk', flat=True)
+    )
+    return [item_ids[i:i + group_size] for i in range(0, len(item_ids), group_size)]
+
+
+def start_batch(batch):
+    GenerationBatch.objects.filter(pk=batch.pk).update(status='running', finished_at=None)
+    batch.status = 'running'
+
+
+def finish_batch(batch):
+    """Mark the batch completed, or incomplete if some chapters never succeeded"""
+    batch.status = 'incomplete' if batch.items.exclude(status='done').exists() else 'completed'
+    batch.finished_at = timezone.now()
+    batch.save(update_fields=['status', 'finished_at'])
+    return batch
+
+
+def process_group(batch, item_ids, max_workers=1):
+    """
+    Generate and store content for a group of batch items.
+
+    Returns counts of chapters done/failed/postponed. If a Gemini budget is
+    exhausted or the circuit is open, what was generated is still written and
+    the exception is re-raised; the remaining items stay pending.
+    """
+    items = list(
+        GenerationBatchItem.objects.filter(batch=batch, pk__in=item_ids)
+        .exclude(status='done').select_related('chapter')
+    )
+    if not items:
+        return {'done': 0, 'failed': 0, 'postponed': 0}
+
+    generated, failed, unavailable = [], [], None
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as pool:
+        futures = {
+            pool.submit(
+                generate_chapter_content, item.chapter.content,
+                bullet_points=batch.bullet_points, num_questions=batch.num_questions,
+                num_cards=batch.num_cards,
+            ): item
+            for item in items
+        }
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                content = future.result()
+            except UNAVAILABLE_ERRORS as e:
+                unavailable = e
+                continue
+            except Exception as e:
+                logger.exception("Generating content for chapter %s failed", item.chapter_id)
+                failed.append((item, str(e)))
+                continue
+            if content is None:
+                failed.append((item, 'Gemini returned no usable content'))
+                continue
+            generated.append((item, content))
+
+    _store_results(batch, generated, failed)
+    if unavailable is not None:
+        raise unavailable
+    done = sum(1 for item, _ in generated if item.status == 'done')
+    postponed = len(items) - len(generated) - len(failed)
+    return {'done': done, 'failed': len(items) - done - postponed, 'postponed': postponed}
+
+
+def _store_results(batch, generated, failed):
+    """Bulk-write a group's quizzes, flashcards and summaries and checkpoint its items"""
+    now = timezone.now()
+    quiz_specs, card_specs, summaries = [], [], []
+    for item, content in generated:
+        chapter = item.chapter
+        questions, _ = validate_items(content['quiz'], validate_question)
+        cards, _ = validate_items(content['flashcards'], validate_flashcard)
+        item.attempts += 1
+        item.finished_at = now
+        if not (questions or cards or content['summary']):
+            item.status, item.error = 'failed', 'Gemini returned no usable content'
+            continue
+        if questions:
+            quiz_specs.append((chapter, QUIZ_TITLE.format(title=chapter.title), questions))
+        card_specs.extend((chapter, card) for card in cards)
+        if content['summary']:
+            summaries.append((chapter, content['summary']))
+        item.status, item.error = 'done', ''
+        item.questions_created, item.flashcards_created = len(questions), len(cards)
+
+    for item, error in failed:
+        item.attempts += 1
+        item.finished_at = now
+        item.status, item.error = 'failed', error
+
+    with transaction.atomic():
+        remove_generated([item.chapter for item, _ in generated if item.status == 'done'], stale_only=False)
+        if quiz_specs:
+            bulk_create_quizzes(quiz_specs, generated=True)
+        if card_specs:
+            bulk_create_flashcards(card_specs, generated=True)
+        if summaries:
+            _create_summaries(summaries)
+        GenerationBatchItem.objects.bulk_update(
+            [item for item, _ in generated] + [item for item, _ in failed],
+            ['status', 'attempts', 'error', 'questions_created', 'flashcards_created', 'finished_at'],
+        )
+
+    for chapter, summary in summaries:
+        prime_summary_cache(chapter.content, summary, bullet_points=batch.bullet_points)
+
+
+def _create_summaries(summaries):
+    """Store summaries as notes fingerprinted with their chapter's content"""
+    notes = StudyMaterial.objects.bulk_create([
+        StudyMaterial(
+            chapter=chapter, title=SUMMARY_TITLE.format(title=chapter.title)[:200],
+            material_type='note', content=summary, source=GENERATED_SUMMARY_SOURCE,
+            source_hash=chapter.content_hash,
+        )
+        for chapter, summary in summaries
+    ])
+    index_objects(notes)
+    catalog_cache.invalidate_objects(notes)
+
+
+def run_batch(batch, group_size=None, max_workers=None, log=None, sleep=None):
+    """
+    Process every pending group of a batch in this process. When Gemini is
+    unavailable, waits as long as it asks before retrying the group, up to
+    AI_JOB_MAX_RETRIES times in a row; then stops and leaves the batch
+    incomplete so it can be resumed.
+    """
+    log = log or (lambda message: None)
+    sleep = sleep or time.sleep
+    group_size = group_size or settings.GENERATION_BATCH_GROUP_SIZE
+    max_workers = max_workers or settings.GENERATION_BATCH_WORKERS
+
+    start_batch(batch)
+    groups = pending_groups(batch, group_size)
+    for number, group in enumerate(groups, 1):
+        waits = 0
+        while True:
+            try:
+                counts = process_group(batch, group, max_workers)
+            except UNAVAILABLE_ERRORS as e:
+                waits += 1
+                if waits > settings.AI_JOB_MAX_RETRIES:
+                    log(f'Gemini still unavailable, stopping: {e.detail}')
+                    return finish_batch(batch)
+                log(f'  group {number}/{len(groups)}: Gemini unavailable, retrying in {e.wait}s')
+                sleep(e.wait)
+                continue
+            log(f"  group {number}/{len(groups)}: {counts['done']} done, {counts['failed']} failed")
+            break
+    return finish_batch(batch)
@@ -0,0 +1,182 @@
+"""
+Offline content bundles: one gzipped JSON file per subject with its grade,
+chapters, materials, quizzes and flashcards, so a client loads a subject
+with one request instead of walking the catalog endpoints.
+
+build_bundles serializes each subject and hashes the data. A subject whose
+hash matches its ContentBundle.version is left alone; otherwise the bundle
+is written to MEDIA_ROOT/<BUNDLE_DIR>/<grade>/<subject>.<version>.json.gz
+and the row is pointed at it. File names change with the content, so files
+are immutable and served with a year-long max-age; clients find the current
+file through /api/bundles/.
+
+Replaced files are kept for BUNDLE_FILE_GRACE seconds, for clients holding
+a manifest from before the rebuild, and then pruned by the next build.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.http import FileResponse, Http404
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import require_GET
+
+from .models import Subject, Chapter, Quiz, ContentBundle
+from .serializers import (
+    GradeSerializer, SubjectSerializer, ChapterSerializer, QuizSerializer, FlashcardSerializer
+)
+
+FORMAT_VERSION = 1
+# <grade id>/<subject id>.<version>.json.gz
+FILE_PATTERN = re.compile(r'^(\d+)/(\d+)\.([0-9a-f]{16})\.json\.gz$')
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+def bundle_root():
+    return os.path.join(settings.MEDIA_ROOT, settings.BUNDLE_DIR)
+
+
+def _subjects(grade=None, subject=None):
+    subjects = Subject.objects.select_related('grade').order_by('grade_id', 'id')
+    if subject is not None:
+        return subjects.filter(pk=subject.pk)
+    if grade is not None:
+        return subjects.filter(grade=grade)
+    return subjects
+
+
+def _chapters(subject):
+    return (
+        Chapter.objects.filter(subject=subject)
+        .order_by('chapter_number', 'id')
+        .prefetch_related(
+            'materials',
+            Prefetch('quizzes', queryset=Quiz.objects.order_by('id').prefetch_related('questions__choices')),
+            'flashcards',
+        )
+    )
+
+
+def bundle_data(subject):
+    """The bundle contents of a subject"""
+    chapters = []
+    for chapter in _chapters(subject):
+        data = ChapterSerializer(chapter).data
+        data['quizzes'] = QuizSerializer(chapter.quizzes.all(), many=True).data
+        data['flashcards'] = FlashcardSerializer(
+            sorted(chapter.flashcards.all(), key=lambda card: (card.created_at, card.id)), many=True
+        ).data
+        chapters.append(data)
+    return {
+        'format': FORMAT_VERSION,
+        'grade': GradeSerializer(subject.grade).data,
+        'subject': SubjectSerializer(subject).data,
+        'chapters': chapters,
+    }
+
+
+def _write_atomic(path, payload):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as compressed:
+            compressed.write(payload)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return os.path.getsize(path)
+
+
+def build_bundle(subject, force=False):
+    """Write the subject's bundle if its content changed; returns the bundle and whether it was built"""
+    data = bundle_data(subject)
+    payload = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    version = hashlib.sha256(payload).hexdigest()
+
+    bundle = ContentBundle.objects.filter(subject=subject).first()
+    if bundle is not None and not force and bundle.version == version and os.path.exists(
+        os.path.join(bundle_root(), bundle.file)
+    ):
+        return bundle, False
+
+    name = f'{subject.grade_id}/{subject.pk}.{version[:16]}.json.gz'
+    size = _write_atomic(os.path.join(bundle_root(), name), payload)
+    bundle, _ = ContentBundle.objects.update_or_create(subject=subject, defaults={
+        'grade_id': subject.grade_id, 'version': version, 'file': name, 'size': size,
+        'raw_size': len(payload), 'chapters': len(data['chapters']), 'built_at': timezone.now(),
+    })
+    return bundle, True
+
+
+def prune_files(grace=None):
+    """Delete bundle files that are neither current nor younger than the grace period"""
+    grace = grace if grace is not None else settings.BUNDLE_FILE_GRACE
+    root = bundle_root()
+    if not os.path.isdir(root):
+        return 0
+    current = set(ContentBundle.objects.values_list('file', flat=True))
+    cutoff = time.time() - grace
+    removed = 0
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            if name in current or os.path.getmtime(path) > cutoff:
+                continue
+            try:
+                os.unlink(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def build_bundles(grade=None, subject=None, force=False, log=None):
+    """
+    Rebuild the bundles of changed subjects (all, a grade's or one subject's);
+    returns counts of built, unchanged and pruned files
+    """
+    built = unchanged = 0
+    for item in _subjects(grade, subject):
+        bundle, changed = build_bundle(item, force=force)
+        if changed:
+            built += 1
+            if log:
+                log(f'{item}: {bundle.chapters} chapters, {bundle.size} bytes ({bundle.version[:12]})')
+        else:
+            unchanged += 1
+    pruned = prune_files()
+    return {'built': built, 'unchanged': unchanged, 'pruned': pruned}
+
+
+@require_GET
+def bundle_file_view(request, name):
+    """
+    Serve a bundle file. The gzip bytes are sent as is to clients accepting
+    gzip and decompressed for the rest.
+    """
+    if not FILE_PATTERN.match(name):
+        raise Http404
+    path = os.path.join(bundle_root(), name)
+    if not os.path.isfile(path):
+        raise Http404
+
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = FileResponse(open(path, 'rb'), content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = FileResponse(gzip.open(path, 'rb'), content_type='application/json')
+    # The version is in the name, so the file never changes
+    patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
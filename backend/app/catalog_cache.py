@@ -0,0 +1,253 @@
+"""
+Read-through cache and HTTP validators for the catalog endpoints (grades,
+subjects, chapters, materials, quizzes).
+
+Every cached response depends on version tags: the route's list tag
+('chapter') for list responses and the object's tag ('chapter:12') for
+detail responses. A tag's version is the time its data last changed, so:
+
+- cache keys include the versions of their tags, and bumping a tag makes
+  every entry that depends on it unreachable (it ages out via TTL);
+- the newest version of a response's tags is its Last-Modified time;
+- the ETag is a hash of the serialized data.
+
+Saves and deletes bump the tags of the changed object and of the responses
+it is nested in (a material's chapter, a question's quiz) through the
+signals in signals.py, after the transaction commits. Bulk writes don't send
+signals; they call invalidate_objects themselves.
+
+Chapter tags missing from the cache (first use, eviction) start at
+Chapter.updated_at, other tags at the current time. The cache is best
+effort: if Redis is unreachable responses are built as if it were disabled.
+"""
+import hashlib
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Max
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from .metrics import record_cache
+from .models import Grade, Subject, Chapter, StudyMaterial, Quiz, Question, QuestionChoice
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'catalog'
+LIST_TAGS = {Grade: 'grade', Subject: 'subject', Chapter: 'chapter', StudyMaterial: 'material', Quiz: 'quiz'}
+
+
+def _version_key(tag):
+    return f'{KEY_PREFIX}:version:{tag}'
+
+
+def _tags(name, pk, parent=None):
+    tags = [name, f'{name}:{pk}']
+    if parent is not None:
+        tags += [parent[0], f'{parent[0]}:{parent[1]}']
+    return tags
+
+
+def object_tags(objects):
+    """Version tags of the responses that serialize the given objects"""
+    tags = set()
+    choice_question_ids = set()
+    for obj in objects:
+        if isinstance(obj, Grade):
+            tags.update(_tags('grade', obj.pk))
+        elif isinstance(obj, Subject):
+            tags.update(_tags('subject', obj.pk))
+        elif isinstance(obj, Chapter):
+            tags.update(_tags('chapter', obj.pk))
+        elif isinstance(obj, StudyMaterial):
+            # Chapters embed their materials
+            tags.update(_tags('material', obj.pk, parent=('chapter', obj.chapter_id)))
+        elif isinstance(obj, Quiz):
+            tags.update(_tags('quiz', obj.pk))
+        elif isinstance(obj, Question):
+            tags.update(_tags('quiz', obj.quiz_id))
+        elif isinstance(obj, QuestionChoice):
+            choice_question_ids.add(obj.question_id)
+    if choice_question_ids:
+        tags.add('quiz')
+        # A choice deleted along with its quiz has no question left to look up
+        quiz_ids = Question.objects.filter(pk__in=choice_question_ids).values_list('quiz_id', flat=True)
+        tags.update(f'quiz:{quiz_id}' for quiz_id in quiz_ids)
+    return tags
+
+
+def _initial_version(tag):
+    if tag == 'chapter':
+        updated_at = Chapter.objects.aggregate(latest=Max('updated_at'))['latest']
+    elif tag.startswith('chapter:'):
+        updated_at = Chapter.objects.filter(pk=tag.split(':', 1)[1]).values_list('updated_at', flat=True).first()
+    else:
+        updated_at = None
+    return updated_at.timestamp() if updated_at else time.time()
+
+
+def _etag(data):
+    payload = json.dumps(data, sort_keys=True, default=str)
+    # Weak: the same data is rendered differently by each renderer
+    return 'W/"%s"' % hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+class CatalogCache:
+    def __init__(self, alias=None, ttl=None):
+        self._alias = alias
+        self._ttl = ttl
+
+    @property
+    def shared(self):
+        return caches[self._alias or settings.CATALOG_CACHE_ALIAS]
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else settings.CATALOG_CACHE_TTL
+
+    @property
+    def version_ttl(self):
+        # Versions outlive the entries keyed on them, so an expired version is
+        # never re-initialized to a value an older entry is still stored under
+        return 2 * self.ttl
+
+    def versions(self, tags):
+        """Current version of each tag, initializing missing ones"""
+        keys = {tag: _version_key(tag) for tag in tags}
+        stored = self.shared.get_many(keys.values())
+        versions = {}
+        for tag, key in keys.items():
+            version = stored.get(key)
+            if version is None:
+                version = _initial_version(tag)
+                # Another worker may have initialized or bumped it meanwhile
+                if not self.shared.add(key, version, self.version_ttl):
+                    version = self.shared.get(key, version)
+            versions[tag] = version
+        return versions
+
+    def bump(self, tags):
+        """Record a change to the data behind tags"""
+        if not tags:
+            return
+        keys = [_version_key(tag) for tag in tags]
+        now = time.time()
+        try:
+            stored = self.shared.get_many(keys)
+            # Versions only move forward, even across workers with skewed clocks
+            self.shared.set_many(
+                {key: max(now, stored.get(key, 0) + 0.001) for key in keys}, self.version_ttl
+            )
+        except Exception as e:
+            logger.warning("Catalog cache invalidation failed: %s", e)
+
+    def invalidate_objects(self, objects):
+        """Bump the tags of saved or deleted objects once the transaction commits"""
+        if not settings.CATALOG_CACHE_ENABLED:
+            return
+        tags = object_tags(objects)
+        if tags:
+            transaction.on_commit(lambda: self.bump(tags))
+
+    def invalidate_models(self, *models):
+        """Bump the list tags of whole models, e.g. after seeding"""
+        if settings.CATALOG_CACHE_ENABLED:
+            tags = {LIST_TAGS[model] for model in models}
+            transaction.on_commit(lambda: self.bump(tags))
+
+    def respond(self, request, route, tags, build):
+        """
+        Serve a GET from the cache, or call build() and cache its response;
+        answers 304 when the client's copy is current
+        """
+        if not settings.CATALOG_CACHE_ENABLED:
+            return build()
+        try:
+            versions = self.versions(tags)
+            key = self._key(request, route, versions)
+            entry = self.shared.get(key)
+        except Exception as e:
+            logger.warning("Catalog cache read failed: %s", e)
+            return build()
+
+        if entry is not None:
+            record_cache('catalog', 'hits')
+            response = Response(entry['data'])
+        else:
+            record_cache('catalog', 'misses')
+            response = build()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = {
+                'data': response.data,
+                'etag': _etag(response.data),
+                'last_modified': max(versions.values()),
+            }
+            try:
+                self.shared.set(key, entry, self.ttl)
+            except Exception as e:
+                logger.warning("Catalog cache write failed: %s", e)
+
+        if _not_modified(request, entry):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        return _with_validators(response, entry)
+
+    def _key(self, request, route, versions):
+        payload = json.dumps({
+            'url': request.build_absolute_uri(),
+            'format': getattr(request, 'accepted_media_type', ''),
+            'versions': versions,
+        }, sort_keys=True)
+        digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        return f'{KEY_PREFIX}:{route}:{digest}'
+
+
+def _not_modified(request, entry):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        # Weak comparison, and If-None-Match takes precedence over If-Modified-Since
+        if if_none_match.strip() == '*':
+            return True
+        etag = entry['etag'].removeprefix('W/')
+        return any(tag.removeprefix('W/') == etag for tag in parse_etags(if_none_match))
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return if_modified_since is not None and int(entry['last_modified']) <= if_modified_since
+
+
+def _with_validators(response, entry):
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    # Shared caches may store the response but must revalidate it
+    patch_cache_control(response, public=True, max_age=settings.CATALOG_CACHE_MAX_AGE)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+catalog_cache = CatalogCache()
+
+
+class CatalogCacheMixin:
+    """
+    Serve list and retrieve of a read-only viewset through the catalog
+    cache. The viewset's basename is its list tag.
+    """
+
+    def list(self, request, *args, **kwargs):
+        build = super().list
+        return catalog_cache.respond(
+            request, self.basename, [self.basename], lambda: build(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        build = super().retrieve
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        return catalog_cache.respond(
+            request, self.basename, [f'{self.basename}:{pk}'], lambda: build(request, *args, **kwargs)
+        )
+
@@ -0,0 +1,177 @@
+"""
+Splitting long chapter content into token-bounded chunks for Gemini.
+
+Content is first cut at section headings and then packed paragraph by
+paragraph into chunks of at most AI_CHUNK_TOKENS. Because packing restarts
+at every heading, editing one section only changes that section's chunks.
+Which chunks are sent (within_budget) is decided by each chunk's own text
+except at the edge of the budget, and a chunk whose share of the items
+(chunk_counts) moved after an edit elsewhere reuses its cached result when
+it was already asked for at least as many (see ai_utils._per_chunk).
+
+Token counts are estimated at CHARS_PER_TOKEN characters per token, the same
+estimate the Gemini token budget uses.
+"""
+import hashlib
+import re
+
+from django.conf import settings
+
+from .metrics import CHARS_PER_TOKEN
+
+# Markdown headings and numbered headings such as "2.3 Acids and Bases"
+HEADING_RE = re.compile(r'^\s*(#{1,6}\s+\S|\d+(\.\d+)*\.?\s+[A-Z])')
+PARAGRAPH_RE = re.compile(r'\n\s*\n')
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN
+
+
+def _sections(text):
+    sections, current = [], []
+    for line in text.splitlines():
+        if HEADING_RE.match(line) and any(part.strip() for part in current):
+            sections.append('\n'.join(current))
+            current = []
+        current.append(line)
+    sections.append('\n'.join(current))
+    return [section.strip() for section in sections if section.strip()]
+
+
+def _pieces(section, max_chars):
+    """Paragraphs of a section, with oversized ones split by sentence and then by length"""
+    for paragraph in PARAGRAPH_RE.split(section):
+        paragraph = paragraph.strip()
+        if len(paragraph) <= max_chars:
+            if paragraph:
+                yield paragraph
+            continue
+        for sentence in SENTENCE_RE.split(paragraph):
+            for start in range(0, len(sentence), max_chars):
+                yield sentence[start:start + max_chars]
+
+
+def _pack(pieces, max_chars):
+    chunks, current = [], ''
+    for piece in pieces:
+        if current and len(current) + 2 + len(piece) > max_chars:
+            chunks.append(current)
+            current = ''
+        current = f'{current}\n\n{piece}' if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_content(text, max_tokens=None):
+    """Split text into chunks of at most max_tokens (default AI_CHUNK_TOKENS)"""
+    max_chars = (max_tokens or settings.AI_CHUNK_TOKENS) * CHARS_PER_TOKEN
+    chunks = []
+    for section in _sections(text or ''):
+        chunks.extend(_pack(_pieces(section, max_chars), max_chars))
+    return chunks
+
+
+def _sample_point(chunk):
+    """A stable pseudo-random point in [0, 1) derived from the chunk's text"""
+    digest = hashlib.sha256(chunk.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') / 2 ** 64
+
+
+def within_budget(chunks, budget_tokens):
+    """
+    Chunks whose total estimated tokens fit budget_tokens, in chapter order.
+
+    Over budget, chunks are taken in the order of their sample points
+    (derived from their text, so spread over the whole chapter) while they
+    fit, which fills the budget. Whether a chunk is kept depends on its own
+    point, so an edit to one section moves at most the chunks at the edge of
+    the budget.
+    """
+    if sum(estimate_tokens(chunk) for chunk in chunks) <= budget_tokens:
+        return chunks
+    kept, used = set(), 0
+    for i in sorted(range(len(chunks)), key=lambda i: _sample_point(chunks[i])):
+        tokens = estimate_tokens(chunks[i])
+        if used + tokens <= budget_tokens:
+            kept.add(i)
+            used += tokens
+    if not kept:
+        kept.add(min(range(len(chunks)), key=lambda i: _sample_point(chunks[i])))
+    return [chunk for i, chunk in enumerate(chunks) if i in kept]
+
+
+def content_chunks(text):
+    """Chunks of a chapter's content to send to Gemini, within AI_CONTENT_TOKEN_BUDGET"""
+    return within_budget(split_content(text), settings.AI_CONTENT_TOKEN_BUDGET)
+
+
+def chunk_counts(total, chunks, minimum=0):
+    """
+    Split a requested item count (questions, cards, bullet points) across
+    chunks in proportion to their estimated tokens, the remainder going to
+    the largest chunks, so the counts add up to total (before minimum)
+    """
+    tokens = [max(1, estimate_tokens(chunk)) for chunk in chunks]
+    size = sum(tokens)
+    counts = [total * chunk_tokens // size for chunk_tokens in tokens]
+    for i in sorted(range(len(chunks)), key=lambda i: tokens[i], reverse=True)[:total - sum(counts)]:
+        counts[i] += 1
+    return [max(minimum, count) for count in counts]
+
+
+def allocate(total, groups, minimum=0):
+    """
+    Split a count across groups (chunks, or per-chunk item lists) in
+    proportion to their length, using largest remainders
+    """
+    lengths = [len(group) for group in groups]
+    size = sum(lengths) or 1
+    shares = [total * length / size for length in lengths]
+    counts = [int(share) for share in shares]
+    by_remainder = sorted(range(len(groups)), key=lambda i: shares[i] - counts[i], reverse=True)
+    for i in by_remainder[:total - sum(counts)]:
+        counts[i] += 1
+    return [max(minimum, count) for count in counts]
+
+
+def _normalize(text):
+    return ' '.join(re.findall(r'\w+', str(text).lower()))
+
+
+def dedupe(items, field='question'):
+    """Drop items whose field repeats an earlier one, ignoring case and punctuation"""
+    seen, unique = set(), []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        key = _normalize(item.get(field, ''))
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(item)
+    return unique
+
+
+def balance(groups, count, field='question'):
+    """
+    Up to count items from per-chunk item lists, with duplicates dropped and
+    each chunk contributing in proportion to what it produced; in chapter
+    order
+    """
+    seen, unique_groups = set(), []
+    for group in groups:
+        unique = []
+        for item in dedupe(group if isinstance(group, list) else [], field):
+            key = _normalize(item.get(field, ''))
+            if key not in seen:
+                seen.add(key)
+                unique.append(item)
+        unique_groups.append(unique)
+    if sum(len(group) for group in unique_groups) <= count:
+        return [item for group in unique_groups for item in group]
+    return [
+        item for group, take in zip(unique_groups, allocate(count, unique_groups))
+        for item in group[:take]
+    ]
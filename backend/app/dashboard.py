@@ -0,0 +1,237 @@
+"""
+Student dashboard: completion per subject and grade, status counts and
+recent activity.
+
+SubjectProgress holds one aggregate row per student and subject. Every
+progress write goes through record_progress or the progress_buffer flush,
+which update the aggregate in the same transaction with F() increments, so
+concurrent writes for the same subject don't lose updates. Deleted progress
+rows (directly or through a cascade) are subtracted in bulk by delete signals.
+Bulk writers call rebuild_subject_progress afterwards; manage.py
+rebuild_subject_progress repairs aggregates after raw SQL or chapters moving
+between subjects.
+
+A subject's completion is the average progress over all of its chapters, so
+chapters a student hasn't opened count as 0%.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Chapter, StudentProgress, SubjectProgress
+
+STATUSES = [status for status, _ in StudentProgress.STATUS_CHOICES]
+RECENT_ACTIVITY_LIMIT = 10
+
+
+def _changes(previous, current):
+    """Column increments for a progress row going from previous to current (status, percentage)"""
+    changes = dict.fromkeys(['chapters_started', 'progress_total', *STATUSES], 0)
+    if previous is not None:
+        changes['chapters_started'] -= 1
+        changes['progress_total'] -= previous[1]
+        changes[previous[0]] -= 1
+    if current is not None:
+        changes['chapters_started'] += 1
+        changes['progress_total'] += current[1]
+        changes[current[0]] += 1
+    return {field: amount for field, amount in changes.items() if amount}
+
+
+def _update_aggregate(student_id, chapter, changes, studied_at=None, deleted=False):
+    """Add column increments to the student's aggregate for the chapter's subject"""
+    updates = {field: F(field) + amount for field, amount in changes.items()}
+    if not deleted and studied_at is not None:
+        updates['last_studied'] = studied_at
+    if not updates:
+        return
+    aggregate = SubjectProgress.objects.filter(student_id=student_id, subject_id=chapter.subject_id)
+    if deleted:
+        # Nothing to subtract from when the aggregate is already gone
+        if aggregate.update(**updates):
+            aggregate.filter(chapters_started__lte=0).delete()
+        return
+    if aggregate.update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            SubjectProgress.objects.create(
+                student_id=student_id, subject_id=chapter.subject_id, grade_id=chapter.subject.grade_id,
+                last_studied=studied_at, **changes,
+            )
+    except IntegrityError:
+        # Created concurrently by another write for the same subject
+        aggregate.update(**updates)
+
+
+def apply_progress_change(student_id, chapter, previous, current, studied_at=None):
+    """
+    Update the subject aggregate for a progress row that changed from
+    previous to current; either may be None for a created/deleted row
+    """
+    _update_aggregate(student_id, chapter, _changes(previous, current), studied_at, deleted=current is None)
+
+
+def apply_progress_changes(rows, studied_at):
+    """
+    apply_progress_change for bulk writes: rows of (student_id, chapter,
+    previous, current) written at studied_at, with one update per subject
+    """
+    groups = {}
+    for student_id, chapter, previous, current in rows:
+        _, totals = groups.setdefault((student_id, chapter.subject_id), (chapter, Counter()))
+        totals.update(_changes(previous, current))
+    for (student_id, _), (chapter, totals) in groups.items():
+        _update_aggregate(student_id, chapter, {field: amount for field, amount in totals.items() if amount}, studied_at)
+
+
+def subtract_progress(rows):
+    """
+    Remove deleted progress rows, (student_id, subject_id, status,
+    percentage), from their aggregates with one update per aggregate
+    """
+    groups = {}
+    for student_id, subject_id, status, percentage in rows:
+        groups.setdefault((student_id, subject_id), Counter()).update(_changes((status, percentage), None))
+    if not groups:
+        return
+    for (student_id, subject_id), totals in groups.items():
+        SubjectProgress.objects.filter(student_id=student_id, subject_id=subject_id).update(
+            **{field: F(field) + amount for field, amount in totals.items()}
+        )
+    # Aggregates left with no progress rows, in one delete
+    SubjectProgress.objects.filter(
+        student_id__in={student_id for student_id, _ in groups},
+        subject_id__in={subject_id for _, subject_id in groups},
+        chapters_started__lte=0,
+    ).delete()
+
+
+def _locked_progress(student, chapter, status, progress_percentage):
+    """The student's progress row for chapter, locked, and its values before this write (None if created)"""
+    progress = StudentProgress.objects.select_for_update().filter(student=student, chapter=chapter).first()
+    if progress is None:
+        try:
+            with transaction.atomic():
+                return StudentProgress.objects.create(
+                    student=student, chapter=chapter, status=status, progress_percentage=progress_percentage
+                ), None
+        except IntegrityError:
+            # Created concurrently by another request
+            progress = StudentProgress.objects.select_for_update().get(student=student, chapter=chapter)
+    return progress, (progress.status, progress.progress_percentage)
+
+
+def record_progress(student, chapter, status, progress_percentage):
+    """Create or update a student's progress on a chapter together with its aggregate"""
+    with transaction.atomic():
+        progress, previous = _locked_progress(student, chapter, status, progress_percentage)
+        if previous is not None:
+            progress.status = status
+            progress.progress_percentage = progress_percentage
+            progress.save()
+        apply_progress_change(student.pk, chapter, previous, (status, progress_percentage), progress.last_studied)
+    return progress
+
+
+def rebuild_subject_progress(students=None):
+    """Recompute the aggregates of the given students (a queryset or list; default all) from their progress rows"""
+    progress = StudentProgress.objects.all()
+    aggregates = SubjectProgress.objects.all()
+    if students is not None:
+        progress = progress.filter(student__in=students)
+        aggregates = aggregates.filter(student__in=students)
+
+    rows = progress.values('student_id', 'chapter__subject_id', 'chapter__subject__grade_id').annotate(
+        chapters_started=Count('pk'),
+        progress_total=Sum('progress_percentage'),
+        last_studied=Max('last_studied'),
+        **{status: Count('pk', filter=Q(status=status)) for status in STATUSES},
+    ).order_by()
+
+    with transaction.atomic():
+        aggregates.delete()
+        created = SubjectProgress.objects.bulk_create([
+            SubjectProgress(
+                student_id=row.pop('student_id'), subject_id=row.pop('chapter__subject_id'),
+                grade_id=row.pop('chapter__subject__grade_id'), **row,
+            )
+            for row in rows
+        ], batch_size=1000)
+    return len(created)
+
+
+def _completion(progress_total, chapters):
+    return round(progress_total / chapters, 1) if chapters else 0.0
+
+
+def _chapter_count(field, outer_field):
+    """Subquery counting the chapters whose field matches the outer row's outer_field"""
+    chapters = (
+        Chapter.objects.filter(**{field: OuterRef(outer_field)}).order_by()
+        .values(field).annotate(count=Count('pk')).values('count')
+    )
+    return Coalesce(Subquery(chapters), 0)
+
+
+def student_dashboard(student, recent_limit=RECENT_ACTIVITY_LIMIT):
+    """Completion per grade and subject and the most recently studied chapters"""
+    aggregates = (
+        SubjectProgress.objects.filter(student=student)
+        .select_related('subject', 'grade')
+        .annotate(
+            subject_chapters=_chapter_count('subject', 'subject_id'),
+            grade_chapters=_chapter_count('subject__grade', 'grade_id'),
+        )
+        .order_by('grade_id', 'subject__name')
+    )
+
+    grades = {}
+    for aggregate in aggregates:
+        grade = grades.setdefault(aggregate.grade_id, {
+            'grade_id': aggregate.grade_id,
+            'level': aggregate.grade.level,
+            'total_chapters': aggregate.grade_chapters,
+            'chapters_started': 0,
+            'progress_total': 0,
+            **dict.fromkeys(STATUSES, 0),
+            'subjects': [],
+        })
+        grade['chapters_started'] += aggregate.chapters_started
+        grade['progress_total'] += aggregate.progress_total
+        for status in STATUSES:
+            grade[status] += getattr(aggregate, status)
+        grade['subjects'].append({
+            'subject_id': aggregate.subject_id,
+            'name': aggregate.subject.name,
+            'total_chapters': aggregate.subject_chapters,
+            'chapters_started': aggregate.chapters_started,
+            'completion_percentage': _completion(aggregate.progress_total, aggregate.subject_chapters),
+            **{status: getattr(aggregate, status) for status in STATUSES},
+            'last_studied': aggregate.last_studied,
+        })
+    for grade in grades.values():
+        grade['completion_percentage'] = _completion(grade.pop('progress_total'), grade['total_chapters'])
+
+    recent = (
+        StudentProgress.objects.filter(student=student)
+        .select_related('chapter__subject')
+        .order_by('-last_studied')[:recent_limit]
+    )
+    return {
+        'grades': list(grades.values()),
+        'recent_activity': [
+            {
+                'chapter_id': progress.chapter_id,
+                'chapter_title': progress.chapter.title,
+                'subject_id': progress.chapter.subject_id,
+                'subject': progress.chapter.subject.name,
+                'status': progress.status,
+                'progress_percentage': progress.progress_percentage,
+                'last_studied': progress.last_studied,
+            }
+            for progress in recent
+        ],
+    }
@@ -0,0 +1,122 @@
+"""
+Content fingerprints for chapters and the artifacts generated from them.
+
+Chapter.content_hash is a hash of the chapter's content. Every quiz,
+flashcard and summary note generated by Gemini records the hash it was
+generated from in source_hash, so:
+
+- a generate_* call whose chapter already has current artifacts returns them
+  instead of calling Gemini again;
+- an artifact whose source_hash no longer matches its chapter is stale and is
+  replaced when the chapter is regenerated;
+- dirty_chapters() finds every chapter with stale artifacts for the bulk
+  refresh (generate_content --stale / refresh_stale_content_task).
+
+Imported and hand-written content has an empty source_hash and is never
+treated as stale. Question.text_hash and Flashcard.question_hash fingerprint
+question text so ingestion can skip questions a chapter already has.
+"""
+import hashlib
+import re
+
+from django.db.models import Exists, OuterRef, Q
+
+from .models import Chapter, Quiz, Question, Flashcard, StudyMaterial
+
+BATCH_SIZE = 1000
+
+GENERATED_SUMMARY_SOURCE = 'Gemini'
+
+
+def content_fingerprint(text):
+    """Hash of content, ignoring whitespace-only changes"""
+    normalized = ' '.join((text or '').split())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def text_fingerprint(text):
+    """Hash of question text, ignoring case, punctuation and spacing"""
+    normalized = ' '.join(re.findall(r'\w+', (text or '').lower()))
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+def _stale(chapter_ref):
+    # Generated from some content, but not the chapter's current content
+    return Q(chapter=chapter_ref) & ~Q(source_hash='') & ~Q(source_hash=OuterRef('content_hash'))
+
+
+def dirty_chapters(chapters=None):
+    """Chapters (of the given queryset) with at least one stale generated artifact"""
+    chapters = Chapter.objects.all() if chapters is None else chapters
+    ref = OuterRef('pk')
+    return chapters.filter(
+        Exists(Quiz.objects.filter(_stale(ref)))
+        | Exists(Flashcard.objects.filter(_stale(ref)))
+        | Exists(StudyMaterial.objects.filter(_stale(ref), source=GENERATED_SUMMARY_SOURCE))
+    )
+
+
+def remove_generated(chapters, kinds=('quiz', 'flashcards', 'summary'), stale_only=True):
+    """
+    Delete Gemini-generated artifacts of chapters: only those generated from
+    older content, or all of them with stale_only=False
+    """
+    querysets = {
+        'quiz': Quiz.objects.all(),
+        'flashcards': Flashcard.objects.all(),
+        'summary': StudyMaterial.objects.filter(source=GENERATED_SUMMARY_SOURCE, material_type='note'),
+    }
+    removed = 0
+    for chapter in chapters:
+        for kind in kinds:
+            queryset = querysets[kind].filter(chapter=chapter).exclude(source_hash='')
+            if stale_only:
+                queryset = queryset.exclude(source_hash=chapter.content_hash)
+            removed += queryset.delete()[0]
+    return removed
+
+
+def current_quiz(chapter):
+    """The newest quiz generated from the chapter's current content, if any"""
+    return (
+        Quiz.objects.filter(chapter=chapter, source_hash=chapter.content_hash)
+        .exclude(source_hash='').prefetch_related('questions__choices').order_by('-pk').first()
+    )
+
+
+def current_flashcards(chapter):
+    """Flashcards generated from the chapter's current content"""
+    return list(
+        Flashcard.objects.filter(chapter=chapter, source_hash=chapter.content_hash)
+        .exclude(source_hash='').order_by('pk')
+    )
+
+
+def backfill_fingerprints(batch_size=BATCH_SIZE):
+    """
+    Compute hashes missing from rows written before fingerprints existed, or
+    whose content changed through queryset.update(). Returns {model: rows updated}.
+    """
+    counts = {'chapters': 0, 'questions': 0, 'flashcards': 0}
+
+    changed = []
+    for chapter in Chapter.objects.only('id', 'content', 'content_hash').iterator(chunk_size=batch_size):
+        fingerprint = content_fingerprint(chapter.content)
+        if chapter.content_hash != fingerprint:
+            chapter.content_hash = fingerprint
+            changed.append(chapter)
+    Chapter.objects.bulk_update(changed, ['content_hash'], batch_size=batch_size)
+    counts['chapters'] = len(changed)
+
+    questions = list(Question.objects.filter(text_hash='').only('id', 'question_text'))
+    for question in questions:
+        question.text_hash = text_fingerprint(question.question_text)
+    Question.objects.bulk_update(questions, ['text_hash'], batch_size=batch_size)
+    counts['questions'] = len(questions)
+
+    flashcards = list(Flashcard.objects.filter(question_hash='').only('id', 'question'))
+    for flashcard in flashcards:
+        flashcard.question_hash = text_fingerprint(flashcard.question)
+    Flashcard.objects.bulk_update(flashcards, ['question_hash'], batch_size=batch_size)
+    counts['flashcards'] = len(flashcards)
+    return counts
@@ -0,0 +1,241 @@
+"""
+Shared, fault-tolerant access to Gemini for ai_utils.
+
+- One GenerativeModel per model name and process, instead of one per call.
+- Per-attempt deadlines. google-generativeai 0.3 takes no timeout, so calls
+  run on a bounded thread pool and the caller stops waiting when the
+  deadline passes. A hung call keeps its pool thread until it returns, and
+  the pool size caps how many can pile up.
+- Retries with full-jitter exponential backoff on transient errors
+  (timeouts, 5xx, 429), within GEMINI_TOTAL_DEADLINE.
+- A per-process circuit breaker that fails fast while Gemini is degraded
+  and lets a single trial call through once the cooldown has passed.
+
+Every attempt is recorded in the external call metrics and logged.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import google.generativeai as genai
+from django.conf import settings
+from google.api_core import exceptions as google_exceptions
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .metrics import record_circuit_state, record_gemini_outcome, track_external
+from .rate_limit import consume
+
+logger = logging.getLogger(__name__)
+
+RETRIABLE_ERRORS = (
+    google_exceptions.ServerError,
+    google_exceptions.TooManyRequests,
+    google_exceptions.Aborted,
+    ConnectionError,
+)
+
+
+class GeminiTimeout(Exception):
+    """A Gemini call did not finish within its deadline"""
+
+
+class GeminiUnavailable(APIException):
+    """The circuit breaker is open; wait is the seconds until the next trial call"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'The AI service is temporarily unavailable. Try again later.'
+    default_code = 'ai_unavailable'
+
+    def __init__(self, wait):
+        super().__init__()
+        # DRF's exception handler turns `wait` into a Retry-After header
+        self.wait = max(1, int(wait))
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive transient failures;
+    open -> half-open after `reset_timeout` seconds, letting one call through;
+    half-open -> closed on success, open again on failure
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise GeminiUnavailable unless a call may go ahead"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if self.state == self.OPEN and remaining <= 0:
+                self._set_state(self.HALF_OPEN)
+                return
+            # Open, or half-open with the trial call still in flight
+            raise GeminiUnavailable(remaining if remaining > 0 else self.reset_timeout)
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                logger.info("Gemini circuit closed")
+                self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.error("Gemini circuit opened after %d failures", self.failures)
+                self.opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+    def reset(self):
+        with self._lock:
+            self.failures = 0
+            self._set_state(self.CLOSED)
+
+    def _set_state(self, state):
+        self.state = state
+        record_circuit_state(state == self.OPEN)
+
+
+class GeminiClient:
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self.breaker = CircuitBreaker(
+            settings.GEMINI_CIRCUIT_FAILURE_THRESHOLD, settings.GEMINI_CIRCUIT_RESET_TIMEOUT
+        )
+
+    def model(self, model_name):
+        with self._lock:
+            model = self._models.get(model_name)
+            if model is None:
+                model = self._models[model_name] = genai.GenerativeModel(model_name)
+            return model
+
+    def _get_executor(self):
+        # Created lazily so each forked worker gets its own threads
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.GEMINI_MAX_CONCURRENCY, thread_name_prefix='gemini'
+                )
+            return self._executor
+
+    def reset(self):
+        """Drop cached models and close the circuit (after reconfiguring genai)"""
+        with self._lock:
+            self._models.clear()
+        self.breaker.reset()
+
+    def generate(self, function, model_name, prompt):
+        """Return the response of a non-streaming call"""
+        return self._call(function, model_name, prompt, stream=False)
+
+    def stream(self, function, model_name, prompt):
+        """
+        Return an iterator of chunk texts. Deadlines and retries cover the
+        call up to the first chunk; once text has been sent to the client a
+        failure can't be retried and is raised to the caller. Every later
+        chunk must arrive within GEMINI_TIMEOUT of the previous one.
+        """
+        response = self._call(function, model_name, prompt, stream=True)
+        return self._read_with_deadline(function, iter(response))
+
+    def _read_with_deadline(self, function, chunks):
+        executor = self._get_executor()
+        while True:
+            future = executor.submit(_next_text, chunks)
+            try:
+                text = future.result(timeout=settings.GEMINI_TIMEOUT)
+            except FutureTimeoutError:
+                future.cancel()
+                record_gemini_outcome(function, 'timeout')
+                logger.error("Gemini %s stream stalled for %ss", function, settings.GEMINI_TIMEOUT)
+                raise GeminiTimeout(f'no chunk within {settings.GEMINI_TIMEOUT}s')
+            if text is _END:
+                return
+            yield text
+
+    def _call(self, function, model_name, prompt, stream):
+        model = self.model(model_name)
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                self.breaker.before_call()
+            except GeminiUnavailable:
+                record_gemini_outcome(function, 'circuit_open')
+                raise
+            consume('gemini_requests')
+            try:
+                with track_external('gemini', function):
+                    response = self._run_with_deadline(model, prompt, stream)
+            except (GeminiTimeout, *RETRIABLE_ERRORS) as e:
+                self.breaker.record_failure()
+                delay = self._backoff(attempt)
+                elapsed = time.monotonic() - started
+                if attempt >= settings.GEMINI_MAX_RETRIES or elapsed + delay > settings.GEMINI_TOTAL_DEADLINE:
+                    record_gemini_outcome(function, 'timeout' if isinstance(e, GeminiTimeout) else 'error')
+                    logger.error("Gemini %s failed after %d attempts: %s", function, attempt + 1, e)
+                    raise
+                record_gemini_outcome(function, 'retry')
+                logger.warning("Gemini %s attempt %d failed, retrying in %.1fs: %s",
+                               function, attempt + 1, delay, e)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            except Exception as e:
+                # Bad request, blocked prompt, etc.: Gemini itself is healthy
+                self.breaker.record_success()
+                record_gemini_outcome(function, 'error')
+                logger.warning("Gemini %s failed: %s", function, e)
+                raise
+            self.breaker.record_success()
+            record_gemini_outcome(function, 'success')
+            return response
+
+    def _run_with_deadline(self, model, prompt, stream):
+        future = self._get_executor().submit(_generate_content, model, prompt, stream)
+        try:
+            return future.result(timeout=settings.GEMINI_TIMEOUT)
+        except FutureTimeoutError:
+            future.cancel()
+            raise GeminiTimeout(f'no response within {settings.GEMINI_TIMEOUT}s')
+
+    def _backoff(self, attempt):
+        """Full jitter: uniform between 0 and the exponential step"""
+        ceiling = min(settings.GEMINI_BACKOFF_MAX, settings.GEMINI_BACKOFF_BASE * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+
+_END = object()
+
+
+def _next_text(chunks):
+    """Text of the next streamed chunk, or _END; reading .text raises on blocked chunks"""
+    chunk = next(chunks, None)
+    return _END if chunk is None else chunk.text
+
+
+def _generate_content(model, prompt, stream):
+    response = model.generate_content(prompt, stream=stream)
+    if not stream:
+        # Reading .text raises on blocked/empty responses; do it inside the deadline
+        response.text
+    return response
+
+
+gemini = GeminiClient()
@@ -0,0 +1,267 @@
+"""
+Validation and bulk persistence of quizzes and flashcards.
+
+Used for Gemini output and for question bank imports. Every write goes
+through bulk_create inside a single transaction, and the returned objects
+have their related questions/choices attached so serializing them doesn't
+re-read the rows just written.
+
+Questions and flashcards whose text a chapter already has (compared by
+text fingerprint) are skipped, as are repeats within the same payload.
+"""
+from django.db import transaction
+
+from . import question_pools
+from .catalog_cache import catalog_cache
+from .fingerprints import text_fingerprint
+from .models import Quiz, Question, QuestionChoice, Flashcard
+from .search import index_objects
+
+DIFFICULTY_LEVELS = {'easy': 1, 'medium': 2, 'hard': 3}
+BATCH_SIZE = 1000
+
+CHOICE_TEXT_MAX_LENGTH = QuestionChoice._meta.get_field('choice_text').max_length
+FLASHCARD_QUESTION_MAX_LENGTH = Flashcard._meta.get_field('question').max_length
+
+
+class InvalidPayload(ValueError):
+    """A question or flashcard payload failed validation"""
+
+
+def parse_difficulty(value):
+    """Map 'easy'/'medium'/'hard' or 1-3 to Question.difficulty"""
+    if value in (None, ''):
+        return 1
+    if isinstance(value, str):
+        value = value.strip().lower()
+        if value in DIFFICULTY_LEVELS:
+            return DIFFICULTY_LEVELS[value]
+    try:
+        level = int(value)
+    except (TypeError, ValueError):
+        raise InvalidPayload(f"unknown difficulty {value!r}")
+    if level not in DIFFICULTY_LEVELS.values():
+        raise InvalidPayload(f"difficulty must be 1-3, got {level}")
+    return level
+
+
+def validate_question(item):
+    """
+    Normalize one MCQ payload:
+    {"question": str, "options": [str, ...], "correct_answer": int, "difficulty": ...}
+    """
+    if not isinstance(item, dict):
+        raise InvalidPayload("question must be an object")
+
+    text = str(item.get('question') or '').strip()
+    if not text:
+        raise InvalidPayload("question text is required")
+
+    options = item.get('options')
+    if not isinstance(options, (list, tuple)) or len(options) < 2:
+        raise InvalidPayload("at least two options are required")
+    options = [str(option).strip() for option in options]
+    if any(not option for option in options):
+        raise InvalidPayload("options must not be empty")
+    if any(len(option) > CHOICE_TEXT_MAX_LENGTH for option in options):
+        raise InvalidPayload(f"options must be at most {CHOICE_TEXT_MAX_LENGTH} characters")
+
+    try:
+        correct_answer = int(item.get('correct_answer'))
+    except (TypeError, ValueError):
+        raise InvalidPayload("correct_answer must be an option index")
+    if not 0 <= correct_answer < len(options):
+        raise InvalidPayload("correct_answer is out of range")
+
+    return {
+        'question': text,
+        'options': options,
+        'correct_answer': correct_answer,
+        'difficulty': parse_difficulty(item.get('difficulty')),
+    }
+
+
+def validate_flashcard(item):
+    """Normalize one flashcard payload: {"question": str, "answer": str}"""
+    if not isinstance(item, dict):
+        raise InvalidPayload("flashcard must be an object")
+
+    question = str(item.get('question') or '').strip()
+    answer = str(item.get('answer') or '').strip()
+    if not question or not answer:
+        raise InvalidPayload("flashcard question and answer are required")
+    if len(question) > FLASHCARD_QUESTION_MAX_LENGTH:
+        raise InvalidPayload(f"flashcard question must be at most {FLASHCARD_QUESTION_MAX_LENGTH} characters")
+
+    return {'question': question, 'answer': answer}
+
+
+def validate_items(items, validator, strict=False):
+    """
+    Validate a list of payloads.
+
+    Returns (valid, errors) where errors is a list of (index, message). With
+    strict=True the first invalid item raises instead.
+    """
+    if not isinstance(items, list):
+        if strict:
+            raise InvalidPayload("expected a JSON array")
+        return [], [(None, "expected a JSON array")]
+
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append(validator(item))
+        except InvalidPayload as e:
+            if strict:
+                raise InvalidPayload(f"item {index}: {e}")
+            errors.append((index, str(e)))
+    return valid, errors
+
+
+def _existing_hashes(queryset, chapter_field, hash_field, chapters):
+    """{chapter_id: set of text hashes} already stored for chapters"""
+    existing = {chapter.pk: set() for chapter in chapters}
+    rows = queryset.filter(**{f'{chapter_field}__in': list(existing)}).values_list(chapter_field, hash_field)
+    for chapter_id, text_hash in rows:
+        existing[chapter_id].add(text_hash)
+    return existing
+
+
+def _skip_duplicates(chapter, items, field, existing):
+    """Items whose text isn't in existing[chapter.pk]; records the kept hashes"""
+    seen = existing.setdefault(chapter.pk, set())
+    kept = []
+    for item in items:
+        text_hash = text_fingerprint(item[field])
+        if text_hash not in seen:
+            seen.add(text_hash)
+            kept.append((item, text_hash))
+    return kept
+
+
+def bulk_create_quizzes(quiz_specs, batch_size=BATCH_SIZE, generated=False, skip_duplicates=True):
+    """
+    Create quizzes with their questions and choices.
+
+    quiz_specs is a list of (chapter, title, questions) with questions already
+    validated. Issues one INSERT batch per table regardless of quiz count.
+    Quizzes left without questions after duplicates are skipped aren't
+    created. generated=True records the chapters' content hashes on the
+    quizzes (see fingerprints).
+    """
+    chapters = {chapter.pk: chapter for chapter, _, _ in quiz_specs}.values()
+    existing = (
+        _existing_hashes(Question.objects.all(), 'quiz__chapter_id', 'text_hash', chapters)
+        if skip_duplicates else {}
+    )
+    specs = []
+    for chapter, title, items in quiz_specs:
+        if skip_duplicates:
+            kept = _skip_duplicates(chapter, items, 'question', existing)
+        else:
+            kept = [(item, text_fingerprint(item['question'])) for item in items]
+        if kept:
+            specs.append((chapter, title, kept))
+    quiz_specs = specs
+
+    with transaction.atomic():
+        quizzes = Quiz.objects.bulk_create(
+            [
+                Quiz(chapter=chapter, title=title, source_hash=chapter.content_hash if generated else '')
+                for chapter, title, _ in quiz_specs
+            ],
+            batch_size=batch_size,
+        )
+
+        questions = []
+        for quiz, (_, _, items) in zip(quizzes, quiz_specs):
+            for item, text_hash in items:
+                questions.append(Question(
+                    quiz=quiz,
+                    question_text=item['question'],
+                    text_hash=text_hash,
+                    question_type='mcq',
+                    difficulty=item['difficulty'],
+                ))
+        Question.objects.bulk_create(questions, batch_size=batch_size)
+
+        choices = []
+        question_iter = iter(questions)
+        for _, _, items in quiz_specs:
+            for item, _ in items:
+                question = next(question_iter)
+                question_choices = [
+                    QuestionChoice(
+                        question=question,
+                        choice_text=option,
+                        is_correct=(i == item['correct_answer']),
+                        order=i,
+                    )
+                    for i, option in enumerate(item['options'])
+                ]
+                _attach_related(question, 'choices', question_choices)
+                choices.extend(question_choices)
+        QuestionChoice.objects.bulk_create(choices, batch_size=batch_size)
+        index_objects(questions, batch_size=batch_size)
+        catalog_cache.invalidate_objects(quizzes)
+        question_pools.invalidate_chapters(chapter.pk for chapter, _, _ in quiz_specs)
+
+    question_iter = iter(questions)
+    for quiz, (_, _, items) in zip(quizzes, quiz_specs):
+        _attach_related(quiz, 'questions', [next(question_iter) for _ in items])
+    return quizzes
+
+
+def create_quiz(chapter, title, questions, generated=False):
+    """Create a single quiz from validated questions; None if they were all duplicates"""
+    quizzes = bulk_create_quizzes([(chapter, title, questions)], generated=generated)
+    return quizzes[0] if quizzes else None
+
+
+def bulk_create_flashcards(chapter_cards, batch_size=BATCH_SIZE, generated=False, skip_duplicates=True):
+    """
+    Create flashcards from a list of (chapter, validated card), skipping
+    duplicates; generated=True records the chapters' content hashes
+    """
+    chapters = {chapter.pk: chapter for chapter, _ in chapter_cards}.values()
+    existing = (
+        _existing_hashes(Flashcard.objects.all(), 'chapter_id', 'question_hash', chapters)
+        if skip_duplicates else {}
+    )
+    flashcards = []
+    for chapter, card in chapter_cards:
+        if skip_duplicates:
+            kept = _skip_duplicates(chapter, [card], 'question', existing)
+            if not kept:
+                continue
+            question_hash = kept[0][1]
+        else:
+            question_hash = text_fingerprint(card['question'])
+        flashcards.append(Flashcard(
+            chapter=chapter, question=card['question'], answer=card['answer'],
+            question_hash=question_hash, source_hash=chapter.content_hash if generated else '',
+        ))
+
+    with transaction.atomic():
+        flashcards = Flashcard.objects.bulk_create(flashcards, batch_size=batch_size)
+        index_objects(flashcards, batch_size=batch_size)
+    return flashcards
+
+
+def create_flashcards(chapter, cards, generated=False):
+    """Create flashcards for one chapter from validated cards"""
+    return bulk_create_flashcards([(chapter, card) for card in cards], generated=generated)
+
+
+def _attach_related(instance, related_name, objects):
+    """
+    Populate the prefetch cache of a reverse relation with objects we just
+    built, so instance.<related_name>.all() doesn't query the database
+    """
+    queryset = getattr(instance, related_name).all()
+    queryset._result_cache = list(objects)
+    queryset._prefetch_done = True
+    if not hasattr(instance, '_prefetched_objects_cache'):
+        instance._prefetched_objects_cache = {}
+    instance._prefetched_objects_cache[related_name] = queryset
@@ -0,0 +1,100 @@
+"""
+Submission, deduplication and status lookup for background AI jobs.
+
+Each job is keyed on (task, chapter, parameters); while one is in flight an
+identical submission returns the existing job id instead of paying for a
+second Gemini call.
+"""
+import hashlib
+import json
+import uuid
+from contextlib import contextmanager
+
+from celery.result import AsyncResult
+from django.conf import settings
+from django.core.cache import cache
+
+from .gemini_client import GeminiUnavailable
+from .rate_limit import RateLimited
+
+
+class GenerationError(Exception):
+    """Gemini returned nothing usable for a generation job"""
+
+
+def job_lock_key(task_name, chapter_id, params):
+    encoded = json.dumps(params, sort_keys=True, default=str).encode('utf-8')
+    return f'ai-job:{task_name}:{chapter_id}:{hashlib.sha1(encoded).hexdigest()}'
+
+
+def submit_job(task, chapter_id, **params):
+    """
+    Enqueue task for a chapter unless an identical job is already in flight.
+
+    Returns (job_id, created).
+    """
+    key = job_lock_key(task.name, chapter_id, params)
+    job_id = str(uuid.uuid4())
+
+    if not cache.add(key, job_id, settings.AI_JOB_LOCK_TTL):
+        existing = cache.get(key)
+        if existing:
+            return existing, False
+        # The lock expired between add() and get()
+        cache.set(key, job_id, settings.AI_JOB_LOCK_TTL)
+
+    try:
+        task.apply_async(kwargs={'chapter_id': chapter_id, **params}, task_id=job_id)
+    except Exception:
+        cache.delete(key)
+        raise
+    return job_id, True
+
+
+def run_job(task, chapter_id, **params):
+    """
+    Run task in-process and return its result (AI_JOBS_SYNC mode)
+    """
+    return task.apply(kwargs={'chapter_id': chapter_id, **params}, throw=True).get()
+
+
+def release_job_lock(task, chapter_id, **params):
+    """Called by a finishing task so the next identical submission runs again"""
+    key = job_lock_key(task.name, chapter_id, params)
+    if cache.get(key) == task.request.id:
+        cache.delete(key)
+
+
+@contextmanager
+def job_lock_held(task, chapter_id, **params):
+    """
+    Release the job's lock when the task body finishes. If the Gemini budget
+    is exhausted or its circuit breaker is open, the task is re-queued for
+    when it refills/closes and keeps the lock, so identical submissions still
+    attach to it. Inline (eager) runs raise to the caller instead of retrying.
+    """
+    try:
+        yield
+    except (RateLimited, GeminiUnavailable) as e:
+        if not task.request.is_eager and task.request.retries < settings.AI_JOB_MAX_RETRIES:
+            raise task.retry(countdown=e.wait)
+        release_job_lock(task, chapter_id, **params)
+        raise
+    except BaseException:
+        release_job_lock(task, chapter_id, **params)
+        raise
+    else:
+        release_job_lock(task, chapter_id, **params)
+
+
+def get_job(job_id):
+    """
+    Status and, once finished, result or error of a job
+    """
+    result = AsyncResult(job_id)
+    data = {'job_id': job_id, 'status': result.status}
+    if result.successful():
+        data['result'] = result.result
+    elif result.failed():
+        data['error'] = str(result.result)
+    return data
@@ -0,0 +1,412 @@
+import json
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+)
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from app.ai_cache import response_cache
+from app.bundles import build_bundle
+from app.dashboard import record_progress
+from app.gemini_client import gemini
+from app.models import (
+    Grade, Subject, Chapter, StudyMaterial, Quiz, StudentProgress, Flashcard
+)
+from app.quiz_sessions import QuizSessionError, start_session
+from app.seeding import SyntheticDataGenerator
+from study_hub.urls import router
+
+BENCHMARK_USERNAME = 'benchmark_user'
+
+# route name -> (method, path template, request body). Templates are filled from
+# sample ids picked from the database; every router route must be listed here.
+# Writes go to a second chapter so they don't grow the lists being read.
+ROUTES = {
+    'grade-list': ('get', '/api/grades/', None),
+    'grade-detail': ('get', '/api/grades/{grade}/', None),
+    'subject-list': ('get', '/api/subjects/?grade_id={grade}', None),
+    'subject-detail': ('get', '/api/subjects/{subject}/', None),
+    'chapter-list': ('get', '/api/chapters/?subject_id={subject}', None),
+    'chapter-detail': ('get', '/api/chapters/{chapter}/', None),
+    'chapter-fetch-videos': ('get', '/api/chapters/{chapter}/fetch_videos/', None),
+    'chapter-generate-summary': ('post', '/api/chapters/{write_chapter}/generate_summary/', {}),
+    'chapter-generate-quiz': ('post', '/api/chapters/{write_chapter}/generate_quiz/', {'num_questions': 10}),
+    'chapter-generate-flashcards': ('post', '/api/chapters/{write_chapter}/generate_flashcards/', {'num_cards': 10}),
+    'material-list': ('get', '/api/materials/?chapter_id={chapter}', None),
+    'material-detail': ('get', '/api/materials/{material}/', None),
+    'quiz-list': ('get', '/api/quizzes/?chapter_id={chapter}', None),
+    'quiz-detail': ('get', '/api/quizzes/{quiz}/', None),
+    'quiz-session-list': ('get', '/api/quiz-sessions/', None),
+    'quiz-session-start': ('post', '/api/quiz-sessions/', {'chapter_id': '{quiz_chapter}', 'num_questions': 10}),
+    'quiz-session-detail': ('get', '/api/quiz-sessions/{quiz_session}/', None),
+    'progress-list': ('get', '/api/progress/', None),
+    'progress-detail': ('get', '/api/progress/{progress}/', None),
+    'progress-update-progress': ('post', '/api/progress/update_progress/',
+                                 {'chapter_id': '{write_chapter}', 'status': 'in_progress', 'progress_percentage': 40}),
+    'progress-dashboard': ('get', '/api/progress/dashboard/', None),
+    'progress-heartbeat': ('post', '/api/progress/heartbeat/',
+                           {'chapter_id': '{write_chapter}', 'status': 'in_progress', 'progress_percentage': 40}),
+    'doubt-solver-ask-doubt': ('post', '/api/doubt-solver/ask_doubt/',
+                               {'problem_description': 'How do I solve x^2 - 5x + 6 = 0?'}),
+    'explain-explain': ('post', '/api/explain/explain/', {'concept': 'Photosynthesis', 'grade': '9'}),
+    'flashcard-list': ('get', '/api/flashcards/?chapter_id={chapter}', None),
+    'flashcard-detail': ('get', '/api/flashcards/{flashcard}/', None),
+    'flashcard-review-list': ('get', '/api/flashcard-reviews/', None),
+    'flashcard-review-submit': ('post', '/api/flashcard-reviews/', {'flashcard_id': '{flashcard}', 'quality': 4}),
+    'flashcard-review-due': ('get', '/api/flashcard-reviews/due/?chapter_id={chapter}', None),
+    'search-list': ('get', '/api/search/?q=energy&grade_id={grade}', None),
+    'ai-cache-list': ('get', '/api/ai-cache/', None),
+    'job-detail': ('get', '/api/jobs/{job}/', None),
+    'bundle-list': ('get', '/api/bundles/?grade_id={grade}', None),
+    'bundle-detail': ('get', '/api/bundles/{subject}/', None),
+}
+
+# Routes that need services the benchmark doesn't stub (Celery result backend)
+EXTERNAL_ROUTES = {'job-detail'}
+
+# Routes whose requests can't be replayed: each quiz answer must be for the
+# session's next question
+UNREPEATABLE_ROUTES = {'quiz-session-answer'}
+
+LOCAL_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class StubGenerativeModel:
+    """Stands in for genai.GenerativeModel with canned, well-formed responses"""
+
+    latency = 0.0
+
+    def __init__(self, model_name, *args, **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, prompt, *args, stream=False, **kwargs):
+        time.sleep(self.latency)
+        if 'multiple choice' in prompt:
+            text = json.dumps([
+                {'question': f'Stub question {i}?', 'options': ['A', 'B', 'C', 'D'],
+                 'correct_answer': i % 4, 'difficulty': 'medium'}
+                for i in range(10)
+            ])
+        elif 'flashcard' in prompt:
+            text = json.dumps([{'question': f'Stub card {i}', 'answer': 'Stub answer'} for i in range(10)])
+        else:
+            text = '* Stub point one\n* Stub point two'
+        if stream:
+            return [SimpleNamespace(text=line + '\n') for line in text.split('\n')]
+        return SimpleNamespace(text=text)
+
+
+class StubRequest:
+    def __init__(self, payload, latency):
+        self.payload = payload
+        self.latency = latency
+
+    def execute(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return self.payload
+
+
+class StubYouTube:
+    """Stands in for the YouTube discovery client"""
+
+    latency = 0.0
+
+    def search(self):
+        return self
+
+    def videos(self):
+        return self
+
+    def list(self, part, **kwargs):
+        if 'id' in kwargs:
+            ids = kwargs['id'].split(',')
+            return StubRequest({'items': [
+                {'id': video_id, 'statistics': {'viewCount': '150000', 'likeCount': '900', 'commentCount': '40'}}
+                for video_id in ids
+            ]}, self.latency)
+        return StubRequest({'items': [
+            {
+                'id': {'videoId': f'stub{uuid.uuid4().hex[:8]}'},
+                'snippet': {
+                    'title': f"{kwargs.get('q', '')} #{i}", 'channelTitle': 'Khan Academy',
+                    'description': 'Stub video', 'thumbnails': {'high': {'url': 'https://example.com/t.jpg'}},
+                },
+            }
+            for i in range(kwargs.get('maxResults', 5))
+        ]}, self.latency)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every router route: p50/p95 latency, throughput and SQL query '
+        'counts, with Gemini and YouTube replaced by local stubs. Writes JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true',
+                            help='Create the synthetic benchmark dataset first (see seed_data --synthetic)')
+        parser.add_argument('--subjects-per-grade', type=int, default=4)
+        parser.add_argument('--chapters-per-subject', type=int, default=5)
+        parser.add_argument('--quizzes-per-chapter', type=int, default=2)
+        parser.add_argument('--questions-per-quiz', type=int, default=20)
+        parser.add_argument('--flashcards-per-chapter', type=int, default=40)
+        parser.add_argument('--students', type=int, default=100)
+        parser.add_argument('--chapters-per-student', type=int, default=300)
+        parser.add_argument('--requests', type=int, default=50, help='Measured requests per route')
+        parser.add_argument('--warmup', type=int, default=3, help='Unmeasured requests per route')
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument('--stub-latency-ms', type=float, default=0.0,
+                            help='Simulated latency of each stubbed Gemini/YouTube call')
+        parser.add_argument('--routes', nargs='*', help='Only benchmark these route names')
+        parser.add_argument('--include-external', action='store_true',
+                            help=f'Also benchmark routes needing real services: {sorted(EXTERNAL_ROUTES)}')
+        parser.add_argument('--use-configured-cache', action='store_true',
+                            help='Use CACHES from settings instead of a local memory cache')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+        parser.add_argument('--compare', help='Previous JSON report to print deltas against')
+        parser.add_argument('--random-seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.check_route_coverage()
+        if options['seed']:
+            self.seed(options)
+
+        samples = self.sample_ids()
+        route_names = options['routes'] or [
+            name for name in ROUTES if options['include_external'] or name not in EXTERNAL_ROUTES
+        ]
+        unknown = set(route_names) - set(ROUTES)
+        if unknown:
+            raise CommandError(f'Unknown routes: {sorted(unknown)}')
+
+        StubGenerativeModel.latency = StubYouTube.latency = options['stub_latency_ms'] / 1000
+        # Measure the code paths, not the rate limits
+        overrides = {
+            'AI_JOBS_SYNC': True,
+            'RATE_LIMIT_ENABLED': False,
+            'AI_THROTTLE_RATE': None,
+            'VIDEO_THROTTLE_RATE': None,
+        }
+        if not options['use_configured_cache']:
+            overrides['CACHES'] = LOCAL_CACHES
+
+        setup_test_environment()
+        try:
+            with override_settings(**overrides), \
+                    mock.patch('google.generativeai.GenerativeModel', StubGenerativeModel), \
+                    mock.patch('app.ai_utils.GEMINI_API_KEY', 'benchmark'), \
+                    mock.patch('app.youtube_utils.get_youtube_client', return_value=StubYouTube()):
+                response_cache.clear_local()
+                gemini.reset()
+                results = [self.benchmark_route(name, samples, options) for name in route_names]
+        finally:
+            # Don't leave stub models cached in the shared client
+            gemini.reset()
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'requests_per_route': options['requests'],
+                'concurrency': options['concurrency'],
+                'stub_latency_ms': options['stub_latency_ms'],
+                'row_counts': self.row_counts(),
+            },
+            'results': results,
+        }
+
+        encoded = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(encoded + '\n')
+            self.stderr.write(f"Wrote {options['output']}")
+        else:
+            self.stdout.write(encoded)
+
+        if options['compare']:
+            self.print_comparison(options['compare'], results)
+
+    def check_route_coverage(self):
+        registered = set()
+        for prefix, viewset, basename in router.registry:
+            for route in router.get_routes(viewset):
+                if router.get_method_map(viewset, route.mapping):
+                    registered.add(route.name.format(basename=basename))
+        # List routes of ViewSets without list() are not served
+        missing = sorted(
+            name for name in registered - set(ROUTES) - UNREPEATABLE_ROUTES if not self.is_unserved(name)
+        )
+        if missing:
+            self.stderr.write(self.style.WARNING(f'Routes without a benchmark spec: {missing}'))
+
+    def is_unserved(self, name):
+        return name in ('doubt-solver-list', 'doubt-solver-detail', 'explain-list', 'explain-detail',
+                        'ai-cache-detail', 'job-list')
+
+    def sample_ids(self):
+        chapter, write_chapter = (list(Chapter.objects.filter(content__isnull=False).order_by('id')[:2]) + [None])[:2]
+        if write_chapter is None:
+            raise CommandError('Need at least two chapters with content; run with --seed')
+        user, _ = User.objects.get_or_create(
+            username=BENCHMARK_USERNAME, defaults={'is_staff': True}
+        )
+        # Through record_progress so the dashboard aggregates stay consistent
+        progress = (
+            StudentProgress.objects.filter(student=user, chapter=chapter).first()
+            or record_progress(user, chapter, 'not_started', 0)
+        )
+        # Unchanged bundles aren't rewritten
+        build_bundle(chapter.subject)
+        quiz_chapter = (
+            Chapter.objects.filter(quizzes__questions__question_type='mcq').order_by('id').first() or chapter
+        )
+        try:
+            quiz_session = start_session(user, quiz_chapter).pk
+        except QuizSessionError:
+            quiz_session = 0
+        return {
+            'user': user,
+            'grade': chapter.subject.grade_id,
+            'subject': chapter.subject_id,
+            'chapter': chapter.id,
+            'write_chapter': write_chapter.id,
+            'material': StudyMaterial.objects.values_list('id', flat=True).first() or 0,
+            'quiz': Quiz.objects.filter(chapter=chapter).values_list('id', flat=True).first() or 0,
+            'progress': progress.id,
+            'flashcard': Flashcard.objects.values_list('id', flat=True).first() or 0,
+            'job': uuid.uuid4(),
+            'quiz_chapter': quiz_chapter.id,
+            'quiz_session': quiz_session,
+        }
+
+    def benchmark_route(self, name, samples, options):
+        method, template, body = ROUTES[name]
+        path = template.format(**samples)
+        if body is not None:
+            body = {key: value.format(**samples) if isinstance(value, str) else value
+                    for key, value in body.items()}
+
+        def run(count, measured):
+            client = APIClient()
+            client.raise_request_exception = False
+            client.force_authenticate(user=samples['user'])
+            timings = []
+            try:
+                for _ in range(count):
+                    with CaptureQueriesContext(connections['default']) as queries:
+                        started = time.perf_counter()
+                        if method == 'get':
+                            response = client.get(path, secure=True)
+                        else:
+                            response = client.post(path, body, format='json', secure=True)
+                        elapsed = time.perf_counter() - started
+                    timings.append((elapsed, len(queries.captured_queries), response.status_code))
+            finally:
+                if threading.current_thread() is not threading.main_thread():
+                    connections.close_all()
+            return timings if measured else []
+
+        run(options['warmup'], measured=False)
+
+        concurrency = max(1, options['concurrency'])
+        per_worker = [options['requests'] // concurrency] * concurrency
+        for i in range(options['requests'] % concurrency):
+            per_worker[i] += 1
+
+        started = time.perf_counter()
+        if concurrency == 1:
+            timings = run(per_worker[0], measured=True)
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                timings = [t for batch in pool.map(lambda n: run(n, True), per_worker) for t in batch]
+        wall = time.perf_counter() - started
+
+        latencies = sorted(t[0] * 1000 for t in timings)
+        query_counts = [t[1] for t in timings]
+        statuses = sorted({t[2] for t in timings})
+        result = {
+            'route': name,
+            'method': method.upper(),
+            'path': path,
+            'status_codes': statuses,
+            'requests': len(timings),
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'mean_ms': round(statistics.fmean(latencies), 3) if latencies else 0.0,
+            'max_ms': round(latencies[-1], 3) if latencies else 0.0,
+            'throughput_rps': round(len(timings) / wall, 2) if wall else 0.0,
+            'queries_min': min(query_counts, default=0),
+            'queries_max': max(query_counts, default=0),
+            'queries_mean': round(statistics.fmean(query_counts), 2) if query_counts else 0.0,
+        }
+        self.stderr.write(
+            f"{name:<30} p50 {result['p50_ms']:>9.2f}ms  p95 {result['p95_ms']:>9.2f}ms  "
+            f"{result['throughput_rps']:>8.1f} req/s  queries {result['queries_max']:>3}  {statuses}"
+        )
+        return result
+
+    def row_counts(self):
+        return {
+            model.__name__: model.objects.count()
+            for model in (Grade, Subject, Chapter, StudyMaterial, Quiz, Flashcard, StudentProgress)
+        }
+
+    def print_comparison(self, path, results):
+        try:
+            with open(path, encoding='utf-8') as f:
+                previous = {r['route']: r for r in json.load(f)['results']}
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f'Could not read {path}: {e}')
+
+        self.stderr.write(f'\nCompared with {path}:')
+        for result in results:
+            before = previous.get(result['route'])
+            if before is None:
+                continue
+            self.stderr.write(
+                f"{result['route']:<30} p50 {delta(before['p50_ms'], result['p50_ms'])}  "
+                f"p95 {delta(before['p95_ms'], result['p95_ms'])}  "
+                f"queries {before['queries_max']} -> {result['queries_max']}"
+            )
+
+    def seed(self, options):
+        generator = SyntheticDataGenerator(seed=options['random_seed'], log=self.stderr.write)
+        counts = generator.run(
+            subjects_per_grade=options['subjects_per_grade'],
+            chapters_per_subject=options['chapters_per_subject'],
+            quizzes_per_chapter=options['quizzes_per_chapter'],
+            questions_per_quiz=options['questions_per_quiz'],
+            flashcards_per_chapter=options['flashcards_per_chapter'],
+            students=options['students'],
+            chapters_per_student=options['chapters_per_student'],
+        )
+        self.stderr.write(f"Seeded {counts['chapters']} chapters for {counts['students']} students "
+                          f"in {counts['seconds']}s")
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = (len(sorted_values) - 1) * pct / 100
+    lower = int(index)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (index - lower)
+
+
+def delta(before, after):
+    if not before:
+        return f'{after:.2f}ms'
+    return f'{before:.2f} -> {after:.2f}ms ({(after - before) / before * 100:+.0f}%)'
+
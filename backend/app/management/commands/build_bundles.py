@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.bundles import build_bundles
+from app.models import Grade, Subject
+
+
+class Command(BaseCommand):
+    help = (
+        'Build the offline bundle (chapters, materials, quizzes and flashcards in one '
+        'gzipped JSON file) of every subject, or of one grade or subject. Subjects '
+        'whose content is unchanged since their last bundle are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grade', help='Grade level, e.g. class_10')
+        parser.add_argument('--subject', help='Subject name within --grade, e.g. science')
+        parser.add_argument('--force', action='store_true', help='Rewrite unchanged bundles too')
+        parser.add_argument('--queue', action='store_true',
+                            help='Build on a Celery worker instead of in this process')
+
+    def handle(self, *args, **options):
+        grade, subject = self.resolve_scope(options['grade'], options['subject'])
+
+        if options['queue']:
+            from app.tasks import build_bundles_task
+            build_bundles_task.delay(grade_id=grade and grade.pk, subject_id=subject and subject.pk)
+            self.stdout.write(self.style.SUCCESS('Queued bundle build'))
+            return
+
+        started = time.perf_counter()
+        result = build_bundles(grade=grade, subject=subject, force=options['force'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            f"Built {result['built']} bundles, {result['unchanged']} unchanged, "
+            f"{result['pruned']} old files removed in {time.perf_counter() - started:.1f}s"
+        ))
+
+    def resolve_scope(self, level, subject_name):
+        if subject_name and not level:
+            raise CommandError('--subject requires --grade')
+        if not level:
+            return None, None
+        try:
+            grade = Grade.objects.get(level=level)
+        except Grade.DoesNotExist:
+            raise CommandError(f'Unknown grade {level}')
+        if not subject_name:
+            return grade, None
+        try:
+            return grade, Subject.objects.get(grade=grade, name=subject_name)
+        except Subject.DoesNotExist:
+            raise CommandError(f'Unknown subject {subject_name} in {level}')
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.question_pools import build_all_pools
+
+
+class Command(BaseCommand):
+    help = (
+        'Precompute the per-chapter, per-difficulty question id pools that adaptive '
+        'quiz sessions draw from. Pools are otherwise built on first use and dropped '
+        'when a chapter\'s questions change.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chapter', type=int, action='append', dest='chapters', metavar='CHAPTER_ID',
+                            help='Only these chapters (repeatable)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        built = build_all_pools(options['chapters'])
+        if not built and options['chapters'] is None:
+            raise CommandError('No pools built: QUIZ_POOL_ALIAS is not a Redis cache or there are no quizzes')
+        self.stdout.write(self.style.SUCCESS(
+            f'Built question pools of {built} chapters in {time.perf_counter() - started:.2f}s'
+        ))
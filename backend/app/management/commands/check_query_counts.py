@@ -0,0 +1,146 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+)
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from app.dashboard import record_progress
+from app.ingestion import create_quiz
+from app.models import (
+    Grade, Subject, Chapter, StudyMaterial, Flashcard
+)
+from app.spaced_repetition import submit_reviews
+
+# (name, path template, max queries). Templates are filled from the fixture.
+ENDPOINTS = [
+    ('grade-list', '/api/grades/', 2),
+    ('grade-detail', '/api/grades/{grade}/', 1),
+    ('subject-list', '/api/subjects/?grade_id={grade}', 2),
+    ('subject-detail', '/api/subjects/{subject}/', 1),
+    ('chapter-list', '/api/chapters/?subject_id={subject}', 1),
+    ('chapter-list-expanded', '/api/chapters/?subject_id={subject}&expand=content,materials', 2),
+    ('chapter-detail', '/api/chapters/{chapter}/', 2),
+    ('chapter-fetch-videos', '/api/chapters/{chapter}/fetch_videos/', 2),
+    ('material-list', '/api/materials/?chapter_id={chapter}', 1),
+    ('quiz-list', '/api/quizzes/?chapter_id={chapter}', 3),
+    ('quiz-list-sparse', '/api/quizzes/?chapter_id={chapter}&fields=id,title', 1),
+    ('quiz-detail', '/api/quizzes/{quiz}/', 3),
+    ('flashcard-list', '/api/flashcards/?chapter_id={chapter}', 1),
+    ('flashcard-due', '/api/flashcard-reviews/due/?chapter_id={chapter}&limit=100', 2),
+    ('flashcard-review-list', '/api/flashcard-reviews/', 1),
+    ('progress-list', '/api/progress/', 1),
+    ('progress-dashboard', '/api/progress/dashboard/', 2),
+    ('search-list', '/api/search/?q=query+check&grade_id={grade}', 2),
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Check SQL query counts of the read endpoints against fixed budgets and '
+        'verify they do not grow with the amount of nested data (N+1 detection). '
+        'Fixture rows are created in a transaction that is rolled back. The catalog '
+        'cache is disabled so uncached responses are measured.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=3,
+                            help='Multiplier for nested rows in the second pass')
+
+    def handle(self, *args, **options):
+        failures = []
+        # Allows the test client's host and keeps side effects in memory
+        setup_test_environment()
+        try:
+            with override_settings(CATALOG_CACHE_ENABLED=False), transaction.atomic():
+                fixture = self.build_fixture(scale=1)
+                small = self.measure(fixture)
+
+                self.add_nested_rows(fixture, extra=options['scale'] - 1)
+                large = self.measure(fixture)
+
+                for name, path, budget in ENDPOINTS:
+                    status_code, count = large[name]
+                    line = f'{name:<24} {small[name][1]:>3} -> {count:>3} queries (budget {budget})'
+                    if status_code != 200:
+                        failures.append(f'{name} returned HTTP {status_code}')
+                        self.stdout.write(self.style.ERROR(line))
+                    elif count > budget or count != small[name][1]:
+                        failures.append(f'{name} ran {count} queries (budget {budget}, {small[name][1]} before scaling)')
+                        self.stdout.write(self.style.ERROR(line))
+                    else:
+                        self.stdout.write(line)
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            teardown_test_environment()
+
+        if failures:
+            raise CommandError('Query budget exceeded:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS('All endpoints within query budget'))
+
+    def build_fixture(self, scale):
+        subject = Subject.objects.create(
+            grade=Grade.objects.create(level='query_check', description='Query check'),
+            name='science', description='Query check subject'
+        )
+        chapter = Chapter.objects.create(
+            subject=subject, title='Query Check', description='Query check chapter',
+            chapter_number=1, content='Query check content', videos_fetched_at=timezone.now()
+        )
+        user = User.objects.create_user(username='query_check_user')
+        fixture = {
+            'grade': subject.grade_id, 'subject': subject.id, 'chapter': chapter.id,
+            'chapter_obj': chapter, 'subject_obj': subject, 'user': user,
+        }
+        self.add_nested_rows(fixture, extra=scale)
+        fixture['quiz'] = chapter.quizzes.order_by('id').values_list('id', flat=True).first()
+        return fixture
+
+    def add_nested_rows(self, fixture, extra):
+        chapter = fixture['chapter_obj']
+        user = fixture['user']
+        for i in range(extra):
+            sibling = Chapter.objects.create(
+                subject=fixture['subject_obj'], title=f'Query Check {i}', description='Sibling',
+                chapter_number=Chapter.objects.filter(subject=fixture['subject_obj']).count() + 1,
+            )
+            record_progress(user, sibling, 'in_progress', 50)
+            for target in (chapter, sibling):
+                StudyMaterial.objects.bulk_create([
+                    StudyMaterial(
+                        chapter=target, title=f'Video {n}', material_type='video',
+                        video_id=f'qc{target.id}x{i}x{n}', quality_score=n, fetched_at=timezone.now()
+                    )
+                    for n in range(3)
+                ])
+                create_quiz(target, f'Quiz {i}', [
+                    {'question': f'Question {n}', 'options': ['A', 'B', 'C', 'D'],
+                     'correct_answer': n % 4, 'difficulty': 1 + n % 3}
+                    for n in range(5)
+                ])
+                cards = Flashcard.objects.bulk_create([
+                    Flashcard(chapter=target, question=f'Card {n}', answer='Answer') for n in range(3)
+                ])
+                # Two cards of each batch are due again, one is new
+                submit_reviews(user, [(card.pk, 4, timezone.now() - timedelta(days=2)) for card in cards[:2]])
+
+    def measure(self, fixture):
+        client = APIClient()
+        client.force_authenticate(user=fixture['user'])
+        results = {}
+        for name, path, _ in ENDPOINTS:
+            url = path.format(**fixture)
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url, secure=True)
+            results[name] = (response.status_code, len(queries.captured_queries))
+        return results
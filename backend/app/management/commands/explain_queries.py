@@ -0,0 +1,115 @@
+import re
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+)
+from rest_framework.test import APIClient
+
+from app.models import Subject, Chapter, Quiz
+
+from .check_query_counts import ENDPOINTS
+
+# Table a sequential scan reads, per backend
+SEQ_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    # "SCAN t" reads the table; "SCAN t USING [COVERING] INDEX i" walks an
+    # index and "SCAN t VIRTUAL TABLE INDEX" queries the full-text index
+    'sqlite': re.compile(r'^SCAN (\w+)(?!\w| USING| VIRTUAL TABLE)'),
+}
+# A sort the plan can't take from an index; reported, not flagged
+SORT_PATTERNS = {
+    'postgresql': re.compile(r'^\s*(->\s*)?(Incremental )?Sort\b'),
+    'sqlite': re.compile(r'USE TEMP B-TREE'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN on the SQL each read endpoint executes and flag sequential '
+        'scans of large tables; sorts not served by an index are reported. Run it against a large seeded database (manage.py '
+        'seed_data --synthetic); on small tables the planner rightly prefers scans. '
+        'Endpoints are requested for the subject, chapter and quiz with the most '
+        'rows and the student with the most progress.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-rows', type=int, default=1000,
+                            help='Only flag scans of tables with at least this many rows')
+        parser.add_argument('--endpoint', action='append', dest='endpoints', metavar='NAME',
+                            help='Only explain these endpoints (repeatable)')
+        parser.add_argument('--plans', action='store_true', help='Print every query plan')
+
+    def handle(self, *args, **options):
+        pattern = SEQ_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f'EXPLAIN output of {connection.vendor} is not supported')
+        fixture = self.pick_fixture()
+        endpoints = [e for e in ENDPOINTS if not options['endpoints'] or e[0] in options['endpoints']]
+
+        # Plans also scan subqueries and temporary b-trees
+        tables = set(connection.introspection.table_names())
+        table_rows = {}
+        flagged = []
+        setup_test_environment()
+        try:
+            with override_settings(CATALOG_CACHE_ENABLED=False):
+                for name, path, _ in endpoints:
+                    already_flagged = len(flagged)
+                    sorts = 0
+                    for sql in self.capture(path.format(**fixture), fixture['user']):
+                        plan = self.explain(sql)
+                        if options['plans']:
+                            self.stdout.write(f'{name}: {sql}\n  ' + '\n  '.join(plan))
+                        sorts += sum(1 for line in plan if SORT_PATTERNS[connection.vendor].search(line))
+                        scanned = {match.group(1) for match in map(pattern.search, plan) if match}
+                        for table in sorted(scanned & tables):
+                            if table not in table_rows:
+                                table_rows[table] = self.count_rows(table)
+                            if table_rows[table] >= options['min_rows']:
+                                flagged.append((name, table, table_rows[table], sql))
+                    if len(flagged) > already_flagged:
+                        self.stdout.write(self.style.ERROR(f'{name:<24} sequential scan'))
+                    else:
+                        self.stdout.write(f'{name:<24} ok' + (f' (sorts: {sorts})' if sorts else ''))
+        finally:
+            teardown_test_environment()
+
+        if flagged:
+            raise CommandError('Sequential scans of large tables:\n  ' + '\n  '.join(
+                f'{name}: {table} ({rows} rows) in {sql[:200]}' for name, table, rows, sql in flagged
+            ))
+        self.stdout.write(self.style.SUCCESS('No sequential scans of large tables'))
+
+    def pick_fixture(self):
+        subject = Subject.objects.annotate(n=Count('chapters')).order_by('-n').first()
+        chapter = Chapter.objects.annotate(n=Count('materials')).order_by('-n').first()
+        quiz = Quiz.objects.annotate(n=Count('questions')).order_by('-n').first()
+        user = User.objects.annotate(n=Count('progress')).order_by('-n').first()
+        if None in (subject, chapter, quiz, user):
+            raise CommandError('No data to explain; run manage.py seed_data --synthetic first')
+        return {'grade': subject.grade_id, 'subject': subject.id, 'chapter': chapter.id, 'quiz': quiz.id, 'user': user}
+
+    def capture(self, url, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, secure=True)
+        if response.status_code != 200:
+            raise CommandError(f'{url} returned HTTP {response.status_code}')
+        return [query['sql'] for query in queries.captured_queries if query['sql'].lstrip().upper().startswith('SELECT')]
+
+    def explain(self, sql):
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql)
+            # SQLite rows are (id, parent, notused, detail), PostgreSQL rows one plan line
+            return [row[-1] for row in cursor.fetchall()]
+
+    def count_rows(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+            return cursor.fetchone()[0]
@@ -0,0 +1,91 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app import ai_utils
+from app.batch_generation import create_batch, run_batch
+from app.models import Grade, Subject, GenerationBatch
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a summary, MCQ quiz and flashcards for every chapter of a grade '
+        'or subject, with one Gemini call per chapter. Chapters whose content was '
+        'already generated from their current text are skipped. Progress is '
+        'checkpointed per chapter group; pass --resume BATCH_ID to continue an '
+        'interrupted or incomplete batch.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grade', help='Grade level, e.g. class_10')
+        parser.add_argument('--subject', help='Subject name within --grade, e.g. science')
+        parser.add_argument('--resume', type=int, metavar='BATCH_ID', help='Continue an existing batch')
+        parser.add_argument('--stale', action='store_true',
+                            help='Only chapters whose generated content is older than their text '
+                                 '(all grades unless --grade is given)')
+        parser.add_argument('--regenerate', action='store_true',
+                            help='Include chapters whose generated content is current')
+        parser.add_argument('--queue', action='store_true',
+                            help='Run the batch on Celery workers instead of in this process')
+        parser.add_argument('--group-size', type=int, default=settings.GENERATION_BATCH_GROUP_SIZE)
+        parser.add_argument('--workers', type=int, default=settings.GENERATION_BATCH_WORKERS,
+                            help='Concurrent Gemini calls per group')
+        parser.add_argument('--bullet-points', type=int, default=10)
+        parser.add_argument('--questions', type=int, default=10)
+        parser.add_argument('--cards', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if not ai_utils.GEMINI_API_KEY:
+            raise CommandError('GOOGLE_GEMINI_API_KEY is not configured')
+
+        if options['resume']:
+            try:
+                batch = GenerationBatch.objects.get(pk=options['resume'])
+            except GenerationBatch.DoesNotExist:
+                raise CommandError(f"Unknown batch {options['resume']}")
+        else:
+            grade, subject = self.resolve_scope(options['grade'], options['subject'], options['stale'])
+            batch = create_batch(
+                grade=grade, subject=subject, bullet_points=options['bullet_points'],
+                num_questions=options['questions'], num_cards=options['cards'],
+                regenerate=options['regenerate'], stale=options['stale'],
+            )
+        chapters = batch.items.count()
+        self.stdout.write(f'Batch {batch.pk}: {chapters} chapters')
+
+        if options['queue']:
+            from app.tasks import run_generation_batch_task
+            run_generation_batch_task.delay(batch.pk)
+            self.stdout.write(self.style.SUCCESS(f'Queued batch {batch.pk}'))
+            return
+
+        started = time.perf_counter()
+        batch = run_batch(
+            batch, group_size=options['group_size'], max_workers=options['workers'],
+            log=self.stdout.write,
+        )
+        done = batch.items.filter(status='done').count()
+        style = self.style.SUCCESS if batch.status == 'completed' else self.style.WARNING
+        self.stdout.write(style(
+            f'Batch {batch.pk} {batch.status}: {done}/{chapters} chapters in '
+            f'{time.perf_counter() - started:.1f}s'
+        ))
+        if batch.status != 'completed':
+            self.stdout.write(f'Resume with: manage.py generate_content --resume {batch.pk}')
+
+    def resolve_scope(self, level, subject_name, stale=False):
+        if not level:
+            if stale and not subject_name:
+                return None, None
+            raise CommandError('--grade is required unless resuming or refreshing stale content')
+        try:
+            grade = Grade.objects.get(level=level)
+        except Grade.DoesNotExist:
+            raise CommandError(f'Unknown grade {level}')
+        if not subject_name:
+            return grade, None
+        try:
+            return grade, Subject.objects.get(grade=grade, name=subject_name)
+        except Subject.DoesNotExist:
+            raise CommandError(f'Unknown subject {subject_name} in {level}')
@@ -0,0 +1,108 @@
+import csv
+import json
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from app.ingestion import (
+    InvalidPayload, validate_items, validate_question, validate_flashcard,
+    bulk_create_quizzes, bulk_create_flashcards, BATCH_SIZE
+)
+from app.models import Chapter
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk import questions or flashcards from a JSON array or CSV file. '
+        'Rows may carry chapter_id and quiz columns; --chapter and --quiz-title '
+        'provide defaults. CSV question rows list answers in option_* columns '
+        'and correct_answer is the 0-based index of the right option.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSON or CSV file')
+        parser.add_argument('--type', choices=['questions', 'flashcards'], default='questions')
+        parser.add_argument('--chapter', type=int, help='Chapter id for rows without chapter_id')
+        parser.add_argument('--quiz-title', default='Imported Question Bank',
+                            help='Quiz title for rows without a quiz column')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--strict', action='store_true',
+                            help='Abort on the first invalid row instead of skipping it')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = self.read_rows(options['path'])
+
+        chapter_ids = {self.row_value(row, 'chapter_id', options['chapter']) for row in rows}
+        if None in chapter_ids:
+            raise CommandError('Rows without chapter_id need --chapter')
+        try:
+            chapters = Chapter.objects.in_bulk({int(chapter_id) for chapter_id in chapter_ids})
+        except (TypeError, ValueError):
+            raise CommandError('chapter_id must be an integer')
+        missing = {int(chapter_id) for chapter_id in chapter_ids} - set(chapters)
+        if missing:
+            raise CommandError(f'Unknown chapter ids: {sorted(missing)}')
+
+        validator = validate_question if options['type'] == 'questions' else validate_flashcard
+        try:
+            valid, errors = validate_items(rows, validator, strict=options['strict'])
+        except InvalidPayload as e:
+            raise CommandError(str(e))
+        for index, message in errors:
+            self.stderr.write(f'Skipped row {index}: {message}')
+
+        invalid_rows = {index for index, _ in errors}
+        valid_rows = [row for index, row in enumerate(rows) if index not in invalid_rows]
+
+        if options['type'] == 'questions':
+            grouped = defaultdict(list)
+            for row, item in zip(valid_rows, valid):
+                chapter_id = int(self.row_value(row, 'chapter_id', options['chapter']))
+                grouped[(chapter_id, self.row_value(row, 'quiz', options['quiz_title']))].append(item)
+            quizzes = bulk_create_quizzes(
+                [(chapters[chapter_id], title, items) for (chapter_id, title), items in grouped.items()],
+                batch_size=options['batch_size'],
+            )
+            imported = sum(len(quiz.questions.all()) for quiz in quizzes)
+            created = f'{imported} questions in {len(quizzes)} quizzes'
+        else:
+            imported = len(bulk_create_flashcards(
+                [
+                    (chapters[int(self.row_value(row, 'chapter_id', options['chapter']))], item)
+                    for row, item in zip(valid_rows, valid)
+                ],
+                batch_size=options['batch_size'],
+            ))
+            created = f'{imported} flashcards'
+
+        elapsed = time.perf_counter() - started
+        rate = len(valid) / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {created} in {elapsed:.2f}s ({rate:.0f} rows/s), skipped {len(errors)} invalid '
+            f'and {len(valid) - imported} duplicate rows'
+        ))
+
+    def row_value(self, row, key, default):
+        value = row.get(key) if isinstance(row, dict) else None
+        return value or default
+
+    def read_rows(self, path):
+        try:
+            if path.lower().endswith('.csv'):
+                with open(path, newline='', encoding='utf-8') as f:
+                    return [self.parse_csv_row(row) for row in csv.DictReader(f)]
+            with open(path, encoding='utf-8') as f:
+                rows = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Could not read {path}: {e}')
+        if not isinstance(rows, list):
+            raise CommandError('JSON file must contain an array of rows')
+        return rows
+
+    def parse_csv_row(self, row):
+        option_columns = [column for column in row if column and column.startswith('option')]
+        parsed = {key: value for key, value in row.items() if key not in option_columns}
+        if option_columns:
+            parsed['options'] = [row[column] for column in option_columns if row[column]]
+        return parsed
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.search import rebuild_search_index, BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        'Create the full-text search index if needed and re-index every chapter, '
+        'study material, flashcard and question. Saves keep the index current; '
+        'run this after loading data with raw SQL or fixtures.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        counts = rebuild_search_index(batch_size=options['batch_size'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {sum(counts.values())} documents in {time.perf_counter() - started:.2f}s'
+        ))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.dashboard import rebuild_subject_progress
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the per-subject progress aggregates behind the student dashboard '
+        'from StudentProgress. Progress writes keep them current; run this after '
+        'loading progress with raw SQL or moving chapters between subjects.'
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        created = rebuild_subject_progress()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {created} subject aggregates in {time.perf_counter() - started:.2f}s'
+        ))
@@ -1,34 +1,35 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from app.models import Grade, Subject, Chapter
+from app.seeding import GRADES, ensure_grades, SyntheticDataGenerator
 
 
 class Command(BaseCommand):
-    help = 'Seeds the database with initial data'
+    help = (
+        'Seeds the database with initial data. With --synthetic, also generates '
+        'a parametrized synthetic curriculum with students for load testing.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--synthetic', action='store_true',
+                            help='Generate synthetic subjects, chapters, content and students')
+        parser.add_argument('--subjects-per-grade', type=int, default=4)
+        parser.add_argument('--chapters-per-subject', type=int, default=5)
+        parser.add_argument('--materials-per-chapter', type=int, default=3)
+        parser.add_argument('--quizzes-per-chapter', type=int, default=2)
+        parser.add_argument('--questions-per-quiz', type=int, default=20)
+        parser.add_argument('--flashcards-per-chapter', type=int, default=40)
+        parser.add_argument('--students', type=int, default=100)
+        parser.add_argument('--chapters-per-student', type=int, default=50,
+                            help='Chapters each synthetic student has progress on')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for reproducible data')
     
     def handle(self, *args, **options):
         self.stdout.write('Seeding database...')
         
         # Create grades
-        grades_data = [
-            ('nursery', 'Early childhood education'),
-            ('ukg', 'Upper Kindergarten'),
-            ('kg', 'Kindergarten'),
-            ('class_1', 'Elementary School - Grade 1'),
-            ('class_2', 'Elementary School - Grade 2'),
-            ('class_3', 'Elementary School - Grade 3'),
-            ('class_4', 'Elementary School - Grade 4'),
-            ('class_5', 'Elementary School - Grade 5'),
-            ('class_6', 'Middle School - Grade 6'),
-            ('class_7', 'Middle School - Grade 7'),
-            ('class_8', 'Middle School - Grade 8'),
-            ('class_9', 'Secondary School - Grade 9'),
-            ('class_10', 'Secondary School - Grade 10'),
-            ('class_11', 'Senior Secondary - Grade 11'),
-            ('class_12', 'Senior Secondary - Grade 12'),
-        ]
-        
-        for level, desc in grades_data:
-            Grade.objects.get_or_create(level=level, defaults={'description': desc})
+        ensure_grades()
+        for level, _ in GRADES:
             self.stdout.write(f'✓ Created grade: {level}')
         
         # Create subjects for Class 9
@@ -72,4 +73,27 @@ class Command(BaseCommand):
                 )
                 self.stdout.write(f'✓ Created chapter: {title}')
         
+        if options['synthetic']:
+            self.stdout.write('Generating synthetic data...')
+            generator = SyntheticDataGenerator(
+                seed=options['seed'],
+                batch_size=options['batch_size'],
+                log=self.stdout.write,
+            )
+            try:
+                counts = generator.run(
+                    subjects_per_grade=options['subjects_per_grade'],
+                    chapters_per_subject=options['chapters_per_subject'],
+                    materials_per_chapter=options['materials_per_chapter'],
+                    quizzes_per_chapter=options['quizzes_per_chapter'],
+                    questions_per_quiz=options['questions_per_quiz'],
+                    flashcards_per_chapter=options['flashcards_per_chapter'],
+                    students=options['students'],
+                    chapters_per_student=options['chapters_per_student'],
+                )
+            except ValueError as e:
+                raise CommandError(str(e))
+            summary = ', '.join(f'{value} {name}' for name, value in counts.items() if name != 'seconds')
+            self.stdout.write(f'✓ Generated {summary} in {counts["seconds"]}s')
+        
         self.stdout.write(self.style.SUCCESS('Database seeding complete!'))
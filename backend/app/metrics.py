@@ -0,0 +1,242 @@
+"""
+Prometheus metrics for the API, external services and caches.
+
+Served at /metrics to holders of METRICS_TOKEN or clients in
+METRICS_ALLOWED_IPS. Under gunicorn each worker writes its samples to
+PROMETHEUS_MULTIPROC_DIR (see gunicorn.conf.py) and the endpoint merges
+them, so a scrape sees the whole server rather than whichever worker
+answered. Without the variable metrics live in process memory, which is
+what runserver and the Celery worker use.
+
+Request metrics are labelled by URL name (e.g. chapter-generate-summary),
+which identifies the viewset action while keeping label cardinality fixed.
+"""
+import hmac
+import ipaddress
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from prometheus_client.core import GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+EXTERNAL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+REQUEST_LATENCY = Histogram(
+    'studyhub_http_request_duration_seconds',
+    'HTTP request latency by route',
+    ['route', 'method', 'status'],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    'studyhub_http_request_db_queries',
+    'Database queries executed per request',
+    ['route'],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_QUERY_TIME = Histogram(
+    'studyhub_http_request_db_duration_seconds',
+    'Time spent in database queries per request',
+    ['route'],
+    buckets=LATENCY_BUCKETS,
+)
+EXTERNAL_LATENCY = Histogram(
+    'studyhub_external_call_duration_seconds',
+    'Latency of Gemini and YouTube API calls',
+    ['service', 'function'],
+    buckets=EXTERNAL_BUCKETS,
+)
+EXTERNAL_ERRORS = Counter(
+    'studyhub_external_call_errors_total',
+    'Failed Gemini and YouTube API calls',
+    ['service', 'function'],
+)
+GEMINI_TOKENS = Counter(
+    'studyhub_gemini_tokens_total',
+    'Gemini tokens by direction; estimated at 4 characters per token when the SDK reports no usage',
+    ['function', 'direction'],
+)
+CACHE_REQUESTS = Counter(
+    'studyhub_cache_requests_total',
+    'Cache lookups by cache and result',
+    ['cache', 'result'],
+)
+RATE_LIMITED = Counter(
+    'studyhub_rate_limited_total',
+    'Calls refused because an external API budget was exhausted',
+    ['budget'],
+)
+GEMINI_CALLS = Counter(
+    'studyhub_gemini_calls_total',
+    'Gemini call attempts by outcome (success, retry, timeout, error, circuit_open)',
+    ['function', 'outcome'],
+)
+GEMINI_CIRCUIT_OPEN = Gauge(
+    'studyhub_gemini_circuit_open',
+    '1 while the Gemini circuit breaker is open',
+    multiprocess_mode='livemax',
+)
+PROGRESS_EVENTS = Counter(
+    'studyhub_progress_events_total',
+    'Progress heartbeats received and progress rows written by the buffer flush',
+    ['stage'],
+)
+
+CHARS_PER_TOKEN = 4
+BROKER_TRANSPORT_OPTIONS = {'socket_connect_timeout': 1, 'socket_timeout': 1}
+
+
+@contextmanager
+def track_external(service, function):
+    """Time an external API call and count it as an error if it raises"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        EXTERNAL_ERRORS.labels(service, function).inc()
+        raise
+    finally:
+        EXTERNAL_LATENCY.labels(service, function).observe(time.perf_counter() - started)
+
+
+def record_gemini_tokens(function, prompt, response_text, usage=None):
+    if usage is not None:
+        prompt_tokens = getattr(usage, 'prompt_token_count', 0)
+        completion_tokens = getattr(usage, 'candidates_token_count', 0)
+    else:
+        prompt_tokens = len(prompt) // CHARS_PER_TOKEN
+        completion_tokens = len(response_text or '') // CHARS_PER_TOKEN
+    GEMINI_TOKENS.labels(function, 'prompt').inc(prompt_tokens)
+    GEMINI_TOKENS.labels(function, 'completion').inc(completion_tokens)
+
+
+def record_cache(cache_name, result, amount=1):
+    if amount:
+        CACHE_REQUESTS.labels(cache_name, result).inc(amount)
+
+
+def record_rate_limited(budget):
+    RATE_LIMITED.labels(budget).inc()
+
+
+def record_gemini_outcome(function, outcome):
+    GEMINI_CALLS.labels(function, outcome).inc()
+
+
+def record_circuit_state(is_open):
+    GEMINI_CIRCUIT_OPEN.set(1 if is_open else 0)
+
+
+def record_progress_events(stage, amount):
+    PROGRESS_EVENTS.labels(stage).inc(amount)
+
+
+class QueryTracker:
+    """connection.execute_wrapper hook counting queries and their time"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class PrometheusMiddleware:
+    """Record latency and database usage for every request"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        tracker = QueryTracker()
+        started = time.perf_counter()
+        with connection.execute_wrapper(tracker):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        route = (match.url_name or match.view_name) if match else 'unmatched'
+        if route == 'metrics':
+            return response
+        REQUEST_LATENCY.labels(route, request.method, str(response.status_code)).observe(elapsed)
+        REQUEST_QUERIES.labels(route).observe(tracker.count)
+        REQUEST_QUERY_TIME.labels(route).observe(tracker.duration)
+        return response
+
+
+class CeleryQueueCollector:
+    """Reads Celery queue lengths from the broker at scrape time"""
+
+    def collect(self):
+        gauge = GaugeMetricFamily(
+            'studyhub_celery_queue_length', 'Messages waiting in a Celery queue', labels=['queue']
+        )
+        try:
+            from study_hub.celery import app as celery_app
+            # Fail fast so a broker outage doesn't stall the scrape
+            with celery_app.connection_for_read(transport_options=BROKER_TRANSPORT_OPTIONS) as conn:
+                conn.ensure_connection(max_retries=1, interval_start=0, interval_step=0, timeout=1)
+                channel = conn.default_channel
+                for queue in settings.METRICS_CELERY_QUEUES:
+                    gauge.add_metric([queue], channel.queue_declare(queue=queue, passive=True).message_count)
+        except Exception as e:
+            logger.debug("Celery queue length unavailable: %s", e)
+        yield gauge
+
+
+QUEUE_COLLECTOR = CeleryQueueCollector()
+MULTIPROCESS = 'PROMETHEUS_MULTIPROC_DIR' in os.environ
+if not MULTIPROCESS:
+    REGISTRY.register(QUEUE_COLLECTOR)
+
+
+def _registry():
+    if not MULTIPROCESS:
+        return REGISTRY
+    # Merge the per-worker sample files on every scrape
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(QUEUE_COLLECTOR)
+    return registry
+
+
+def _may_scrape(request):
+    """Whether request has the METRICS_TOKEN bearer token or comes from METRICS_ALLOWED_IPS"""
+    token = settings.METRICS_TOKEN
+    if token and hmac.compare_digest(
+        request.META.get('HTTP_AUTHORIZATION', '').encode(), f'Bearer {token}'.encode()
+    ):
+        return True
+    if settings.METRICS_ALLOWED_IPS:
+        try:
+            address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+        except ValueError:
+            return False
+        return any(
+            address in ipaddress.ip_network(allowed, strict=False) for allowed in settings.METRICS_ALLOWED_IPS
+        )
+    # Neither configured: open for local development only
+    return not token and settings.DEBUG
+
+
+def metrics_view(request):
+    """Prometheus exposition endpoint"""
+    if not _may_scrape(request):
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(_registry()), content_type=CONTENT_TYPE_LATEST)
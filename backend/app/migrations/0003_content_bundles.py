@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-18 18:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_access_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentBundle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(max_length=64)),
+                ('file', models.CharField(max_length=255)),
+                ('size', models.IntegerField(help_text='Compressed bytes')),
+                ('raw_size', models.IntegerField(help_text='Uncompressed bytes')),
+                ('chapters', models.IntegerField(default=0)),
+                ('built_at', models.DateTimeField()),
+                ('grade', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bundles', to='app.grade')),
+                ('subject', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='bundle', to='app.subject')),
+            ],
+        ),
+    ]
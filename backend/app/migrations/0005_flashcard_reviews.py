@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-18 18:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('app', '0004_quiz_sessions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlashcardReview',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ease_factor', models.FloatField(default=2.5)),
+                ('interval_days', models.IntegerField(default=0)),
+                ('repetitions', models.IntegerField(default=0)),
+                ('lapses', models.IntegerField(default=0)),
+                ('last_quality', models.IntegerField(default=0)),
+                ('last_reviewed_at', models.DateTimeField()),
+                ('due_at', models.DateTimeField()),
+                ('flashcard', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='app.flashcard')),
+                ('student', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='flashcard_reviews', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='flashcardreview',
+            index=models.Index(fields=['student', 'due_at', 'id'], name='review_student_due_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='flashcardreview',
+            unique_together={('student', 'flashcard')},
+        ),
+    ]
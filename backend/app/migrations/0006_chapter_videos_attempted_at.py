@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_flashcard_reviews'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapter',
+            name='videos_attempted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -48,12 +48,29 @@ class Chapter(models.Model):
     description = models.TextField()
     chapter_number = models.IntegerField()
     content = models.TextField(null=True, blank=True)
+    # Fingerprint of content; generated artifacts record the one they came from
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    videos_fetched_at = models.DateTimeField(null=True, blank=True)
+    # Last YouTube fetch, successful or not; fetch_videos tries a chapter only once
+    videos_attempted_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['chapter_number']
         unique_together = ('subject', 'chapter_number')
+        indexes = [
+            # Latest change, the initial catalog cache version
+            models.Index(fields=['updated_at'], name='chapter_updated_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        from .fingerprints import content_fingerprint
+        self.content_hash = content_fingerprint(self.content)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'content' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'content_hash'}
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return f"Chapter {self.chapter_number}: {self.title}"
@@ -75,8 +92,19 @@ class StudyMaterial(models.Model):
     video_url = models.URLField(null=True, blank=True)
     video_id = models.CharField(max_length=100, null=True, blank=True)
     source = models.CharField(max_length=100, default='YouTube')
+    # Chapter.content_hash a generated summary was made from; empty otherwise
+    source_hash = models.CharField(max_length=64, blank=True, default='')
+    channel = models.CharField(max_length=200, blank=True, default='')
+    quality_score = models.IntegerField(default=0)
+    fetched_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            # A chapter's videos by rank, notes by source
+            models.Index(fields=['chapter', 'material_type', '-quality_score'], name='material_chapter_type_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.title} ({self.material_type})"
 
@@ -84,6 +112,8 @@ class StudyMaterial(models.Model):
 class Quiz(models.Model):
     chapter = models.ForeignKey(Chapter, on_delete=models.CASCADE, related_name='quizzes')
     title = models.CharField(max_length=200)
+    # Chapter.content_hash the quiz was generated from; empty for imported quizzes
+    source_hash = models.CharField(max_length=64, blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
@@ -99,9 +129,23 @@ class Question(models.Model):
     
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='questions')
     question_text = models.TextField()
+    text_hash = models.CharField(max_length=40, blank=True, default='', db_index=True)
     question_type = models.CharField(max_length=20, choices=QUESTION_TYPE_CHOICES)
     difficulty = models.IntegerField(default=1, choices=[(1, 'Easy'), (2, 'Medium'), (3, 'Hard')])
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['quiz', 'difficulty'], name='question_quiz_difficulty_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        from .fingerprints import text_fingerprint
+        self.text_hash = text_fingerprint(self.question_text)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'question_text' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'text_hash'}
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return self.question_text[:50]
 
@@ -135,16 +179,242 @@ class StudentProgress(models.Model):
     
     class Meta:
         unique_together = ('student', 'chapter')
+        indexes = [
+            # Recent activity on the dashboard
+            models.Index(fields=['student', '-last_studied'], name='progress_recent_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.username} - {self.chapter.title}"
 
 
+class SubjectProgress(models.Model):
+    """
+    A student's StudentProgress rows of one subject, aggregated. Kept up to
+    date as progress is recorded (see dashboard) so the dashboard reads one
+    row per subject instead of every progress row.
+    """
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='subject_progress')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='+')
+    grade = models.ForeignKey(Grade, on_delete=models.CASCADE, related_name='+')
+    chapters_started = models.IntegerField(default=0)
+    # Sum of progress_percentage over the subject's progress rows
+    progress_total = models.IntegerField(default=0)
+    # Progress rows per status
+    not_started = models.IntegerField(default=0)
+    in_progress = models.IntegerField(default=0)
+    mastered = models.IntegerField(default=0)
+    difficult = models.IntegerField(default=0)
+    last_studied = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ('student', 'subject')
+    
+    def __str__(self):
+        return f"{self.student_id} - {self.subject_id}: {self.chapters_started} chapters"
+
+
+class QuizSession(models.Model):
+    """
+    An adaptive quiz on a chapter: questions are drawn one at a time from
+    the chapter's pool at the session's current difficulty, which moves with
+    the student's answers (see app.quiz_sessions).
+    """
+    STATUS_CHOICES = [
+        ('active', 'Active'),
+        ('completed', 'Completed'),
+    ]
+    
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='quiz_sessions')
+    chapter = models.ForeignKey(Chapter, on_delete=models.CASCADE, related_name='+')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    num_questions = models.IntegerField()
+    difficulty = models.IntegerField()
+    # Consecutive correct answers at the current difficulty
+    streak = models.IntegerField(default=0)
+    current_question = models.ForeignKey(Question, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    answered = models.IntegerField(default=0)
+    correct = models.IntegerField(default=0)
+    # Difficulty-weighted points scored and available over the answered questions
+    points = models.IntegerField(default=0)
+    max_points = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['student', '-created_at'], name='quiz_session_student_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student_id} - chapter {self.chapter_id} ({self.status})"
+
+
+class QuizSessionAnswer(models.Model):
+    session = models.ForeignKey(QuizSession, on_delete=models.CASCADE, related_name='answers')
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='+')
+    choice = models.ForeignKey(QuestionChoice, on_delete=models.SET_NULL, null=True, related_name='+')
+    difficulty = models.IntegerField()
+    is_correct = models.BooleanField()
+    answered_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ('session', 'question')
+    
+    def __str__(self):
+        return f"{self.session_id}/{self.question_id}: {'correct' if self.is_correct else 'wrong'}"
+
+
 class Flashcard(models.Model):
     chapter = models.ForeignKey(Chapter, on_delete=models.CASCADE, related_name='flashcards')
     question = models.CharField(max_length=500)
     answer = models.TextField()
+    question_hash = models.CharField(max_length=40, blank=True, default='', db_index=True)
+    # Chapter.content_hash the card was generated from; empty for imported cards
+    source_hash = models.CharField(max_length=64, blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            # A chapter's cards in the order the flashcard list pages them
+            models.Index(fields=['chapter', 'created_at', 'id'], name='flashcard_chapter_created_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        from .fingerprints import text_fingerprint
+        self.question_hash = text_fingerprint(self.question)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'question' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'question_hash'}
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return self.question[:50]
+
+
+class FlashcardReview(models.Model):
+    """
+    A student's spaced-repetition state of one flashcard, scheduled with
+    SM-2 (see app.spaced_repetition). Cards without a row are new to the
+    student.
+    """
+    # Indexed as the first column of the unique and due indexes
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='flashcard_reviews', db_index=False)
+    flashcard = models.ForeignKey(Flashcard, on_delete=models.CASCADE, related_name='reviews')
+    ease_factor = models.FloatField(default=2.5)
+    interval_days = models.IntegerField(default=0)
+    # Successful reviews in a row; a lapse starts the card over
+    repetitions = models.IntegerField(default=0)
+    lapses = models.IntegerField(default=0)
+    last_quality = models.IntegerField(default=0)
+    last_reviewed_at = models.DateTimeField()
+    due_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ('student', 'flashcard')
+        indexes = [
+            # The student's due cards, soonest first
+            models.Index(fields=['student', 'due_at', 'id'], name='review_student_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student_id} - card {self.flashcard_id} due {self.due_at:%Y-%m-%d}"
+
+
+class SearchDocument(models.Model):
+    """
+    Denormalized search row for a chapter, study material, flashcard or
+    question. Kept in sync by app.search; the full-text index over title and
+    body is backend specific (see app.search.ensure_search_index).
+    """
+    KIND_CHOICES = [
+        ('chapter', 'Chapter'),
+        ('material', 'Study Material'),
+        ('flashcard', 'Flashcard'),
+        ('question', 'Question'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    chapter = models.ForeignKey(Chapter, on_delete=models.CASCADE, related_name='search_documents')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='+')
+    grade = models.ForeignKey(Grade, on_delete=models.CASCADE, related_name='+')
+    title = models.TextField()
+    body = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ('kind', 'object_id')
+    
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.title[:50]}"
+
+
+class GenerationBatch(models.Model):
+    """
+    A run generating summaries, quizzes and flashcards for every chapter of
+    a grade or subject. Progress is checkpointed per chapter in
+    GenerationBatchItem, so an interrupted run resumes where it stopped.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('incomplete', 'Incomplete'),
+    ]
+    
+    grade = models.ForeignKey(Grade, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    bullet_points = models.IntegerField(default=10)
+    num_questions = models.IntegerField(default=10)
+    num_cards = models.IntegerField(default=20)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Generation batch {self.pk} ({self.status})"
+
+
+class GenerationBatchItem(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    batch = models.ForeignKey(GenerationBatch, on_delete=models.CASCADE, related_name='items')
+    chapter = models.ForeignKey(Chapter, on_delete=models.CASCADE, related_name='+')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    questions_created = models.IntegerField(default=0)
+    flashcards_created = models.IntegerField(default=0)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ('batch', 'chapter')
+    
+    def __str__(self):
+        return f"{self.batch_id}/{self.chapter_id}: {self.status}"
+
+
+class ContentBundle(models.Model):
+    """
+    The current offline bundle of a subject: every chapter with its
+    materials, quizzes and flashcards in one gzipped JSON file under
+    MEDIA_ROOT (see app.bundles). version is the hash of the bundle's data,
+    so unchanged subjects keep their file and clients their cached copy.
+    """
+    subject = models.OneToOneField(Subject, on_delete=models.CASCADE, related_name='bundle')
+    grade = models.ForeignKey(Grade, on_delete=models.CASCADE, related_name='bundles')
+    version = models.CharField(max_length=64)
+    # Path relative to MEDIA_ROOT
+    file = models.CharField(max_length=255)
+    size = models.IntegerField(help_text='Compressed bytes')
+    raw_size = models.IntegerField(help_text='Uncompressed bytes')
+    chapters = models.IntegerField(default=0)
+    built_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.subject} bundle {self.version[:12]}"
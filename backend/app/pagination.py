@@ -0,0 +1,142 @@
+"""
+Pagination for list endpoints.
+
+Small lists (grades, subjects, search) use page numbers. The large ones
+(chapters, materials, quizzes, flashcards, progress) use KeysetPagination:
+the cursor holds the values of every ordering field of the row a page ended
+on, and the next page is read with a tuple comparison against them, which an
+index on the ordering fields answers with a range scan. There is no COUNT(*)
+and no OFFSET, so late pages cost the same as the first one.
+"""
+import json
+from base64 import b64decode, b64encode
+from functools import reduce
+from operator import and_, or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+MAX_PAGE_SIZE = 100
+
+
+class StandardPagination(PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset pagination ordered by the view's cursor_ordering (default id),
+    which must be unique per row. Responses have next/previous links and no
+    count.
+
+    Requests with ?page= get page-number pagination in the same order, so
+    clients written against page numbers keep working.
+    """
+    ordering = ('id',)
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+    page_numbers = None
+
+    def get_ordering(self, request, queryset, view):
+        return tuple(getattr(view, 'cursor_ordering', self.ordering))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_numbers = None
+        self.ordering = self.get_ordering(request, queryset, view)
+        if StandardPagination.page_query_param in request.query_params:
+            self.page_numbers = StandardPagination()
+            return self.page_numbers.paginate_queryset(queryset.order_by(*self.ordering), request, view)
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_position(request, queryset.model)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(ordering, position))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if reverse:
+            self.page.reverse()
+        # Coming from a page means there is one in that direction
+        self.has_next = has_more if not reverse else True
+        self.has_previous = position is not None if not reverse else has_more
+        return self.page
+
+    @staticmethod
+    def after(ordering, position):
+        """
+        Rows after position in ordering: (a, b, c) > (x, y, z) spelled out as
+        a > x OR (a = x AND b > y) OR ..., plus a >= x so the index range
+        starts at the cursor
+        """
+        names = [field.lstrip('-') for field in ordering]
+        later = ['lt' if field.startswith('-') else 'gt' for field in ordering]
+        branches = []
+        for i, name in enumerate(names):
+            equal = {names[j]: position[j] for j in range(i)}
+            branches.append(Q(**equal, **{f'{name}__{later[i]}': position[i]}))
+        first = Q(**{f'{names[0]}__{later[0]}e': position[0]})
+        return reduce(and_, [first, reduce(or_, branches)])
+
+    def decode_position(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            data = json.loads(b64decode(encoded.encode('ascii')).decode('utf-8'))
+            values = data['p']
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+            return position, bool(data.get('r'))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_position(self, instance, reverse):
+        values = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip('-'))
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        data = {'p': values, 'r': 1} if reverse else {'p': values}
+        encoded = b64encode(json.dumps(data, separators=(',', ':')).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if self.page_numbers is not None:
+            return self.page_numbers.get_next_link()
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_position(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if self.page_numbers is not None:
+            return self.page_numbers.get_previous_link()
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_position(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if self.page_numbers is not None:
+            return self.page_numbers.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.page_numbers is not None:
+            return self.page_numbers.to_html()
+        return super().to_html()
@@ -0,0 +1,216 @@
+"""
+Write-behind buffer for progress heartbeats.
+
+POST /api/progress/heartbeat/ doesn't touch the database. Events are merged
+into a Redis hash per student (chapter -> "status:percentage") by a Lua
+script that keeps the event with the highest percentage (the latest one on
+ties), status and percentage together, and the student is added to a dirty
+set. flush_progress_buffer_task drains the dirty
+set every PROGRESS_FLUSH_INTERVAL seconds and writes each batch with one
+bulk upsert plus one aggregate update per subject (see dashboard). A
+heartbeat never lowers the stored percentage: a row already further along
+keeps its status and percentage, as quiz sessions do, so the outcome of two
+events doesn't depend on which side of a flush they land.
+
+Reads and synchronous writes of a student's progress first flush that
+student's buffer (flush_student), so a student always sees their own
+heartbeats and a later update_progress isn't overwritten by an older
+buffered event.
+
+Taking a student's events is atomic, so an event is flushed exactly once;
+if the database write fails the events are merged back into the buffer.
+Without Redis (local development) heartbeats are written immediately.
+"""
+import logging
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from .dashboard import apply_progress_changes
+from .metrics import record_progress_events
+from .models import Chapter, StudentProgress
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'progress-buffer'
+DIRTY_KEY = f'{KEY_PREFIX}:dirty'
+MAX_HEARTBEAT_EVENTS = 100
+
+# KEYS: student hash, dirty set. ARGV: student id, then (chapter, status,
+# percentage) per event. An event replaces the buffered one of its chapter
+# unless that one has a higher percentage. Returns the number of events merged.
+BUFFER_LUA = """
+for i = 2, #ARGV, 3 do
+    local percentage = tonumber(ARGV[i + 2])
+    local previous = redis.call('HGET', KEYS[1], ARGV[i])
+    if not previous or tonumber(string.match(previous, ':(%d+)$')) <= percentage then
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1] .. ':' .. percentage)
+    end
+end
+redis.call('SADD', KEYS[2], ARGV[1])
+return (#ARGV - 1) / 3
+"""
+
+# KEYS: student hash. Returns and deletes its fields.
+TAKE_LUA = """
+local events = redis.call('HGETALL', KEYS[1])
+redis.call('DEL', KEYS[1])
+return events
+"""
+
+_scripts = {}
+
+
+def _student_key(student_id):
+    return f'{KEY_PREFIX}:student:{student_id}'
+
+
+def _redis_client():
+    cache = caches[settings.PROGRESS_BUFFER_ALIAS]
+    backend = getattr(cache, '_cache', None)
+    if backend is None or not hasattr(backend, 'get_client'):
+        return None
+    return backend.get_client(write=True)
+
+
+def _script(client, source):
+    if source not in _scripts:
+        _scripts[source] = client.register_script(source)
+    return _scripts[source]
+
+
+def _coalesce(events):
+    """{chapter_id: (status, percentage)} of the event with the highest percentage, the latest on ties"""
+    merged = {}
+    for chapter_id, status, percentage in events:
+        if chapter_id not in merged or merged[chapter_id][1] <= percentage:
+            merged[chapter_id] = (status, percentage)
+    return merged
+
+
+def buffer_events(student_id, events):
+    """
+    Buffer (chapter_id, status, percentage) events of a student; written
+    immediately when Redis isn't available
+    """
+    if not events:
+        return 0
+    record_progress_events('received', len(events))
+    client = _redis_client()
+    if client is None:
+        write_events({student_id: _coalesce(events)})
+        return len(events)
+
+    args = [student_id]
+    for chapter_id, status, percentage in events:
+        args += [chapter_id, status, percentage]
+    try:
+        return int(_script(client, BUFFER_LUA)(keys=[_student_key(student_id), DIRTY_KEY], args=args, client=client))
+    except Exception as e:
+        # Losing heartbeats is worse than writing them synchronously
+        logger.warning("Progress buffer write failed, writing directly: %s", e)
+        write_events({student_id: _coalesce(events)})
+        return len(events)
+
+
+def _take(client, student_id):
+    values = _script(client, TAKE_LUA)(keys=[_student_key(student_id)], client=client)
+    events = {}
+    for chapter_id, value in zip(values[::2], values[1::2]):
+        if isinstance(value, bytes):
+            value = value.decode()
+        status, percentage = value.rsplit(':', 1)
+        events[int(chapter_id)] = (status, int(percentage))
+    return events
+
+
+def _restore(client, events):
+    for student_id, chapters in events.items():
+        _script(client, BUFFER_LUA)(
+            keys=[_student_key(student_id), DIRTY_KEY],
+            args=[student_id] + [value for chapter_id, (status, percentage) in chapters.items()
+                                 for value in (chapter_id, status, percentage)],
+            client=client,
+        )
+
+
+def _drain(client, student_ids):
+    events = {}
+    for student_id in student_ids:
+        chapters = _take(client, student_id)
+        if chapters:
+            events[student_id] = chapters
+    if not events:
+        return 0
+    try:
+        return write_events(events)
+    except Exception:
+        _restore(client, events)
+        raise
+
+
+def flush_student(student_id):
+    """Write a student's buffered events (read-your-writes); returns rows written"""
+    client = _redis_client()
+    if client is None:
+        return 0
+    try:
+        return _drain(client, [student_id])
+    except Exception as e:
+        logger.warning("Flushing buffered progress of student %s failed: %s", student_id, e)
+        return 0
+
+
+def flush(batch_size=None):
+    """Write the buffered events of up to batch_size students; returns rows written"""
+    client = _redis_client()
+    if client is None:
+        return 0
+    student_ids = [int(student_id) for student_id in
+                   client.spop(DIRTY_KEY, batch_size or settings.PROGRESS_FLUSH_BATCH_SIZE) or []]
+    return _drain(client, student_ids)
+
+
+def write_events(events):
+    """
+    Upsert {student_id: {chapter_id: (status, percentage)}} in bulk and
+    update the dashboard aggregates. An event below the stored percentage
+    only updates last_studied. Events of deleted students or chapters are
+    dropped.
+    """
+    chapter_ids = {chapter_id for chapters in events.values() for chapter_id in chapters}
+    with transaction.atomic():
+        students = set(User.objects.filter(pk__in=events.keys()).values_list('pk', flat=True))
+        chapters = Chapter.objects.select_related('subject').only(
+            'id', 'subject_id', 'subject__grade_id'
+        ).in_bulk(chapter_ids)
+        existing = {
+            (progress.student_id, progress.chapter_id): (progress.status, progress.progress_percentage)
+            for progress in StudentProgress.objects.select_for_update()
+            .filter(student_id__in=events.keys(), chapter_id__in=chapters.keys())
+            .only('student_id', 'chapter_id', 'status', 'progress_percentage')
+        }
+        rows, changes = [], []
+        for student_id, student_events in events.items():
+            for chapter_id, (status, percentage) in student_events.items():
+                if student_id not in students or chapter_id not in chapters:
+                    continue
+                previous = existing.get((student_id, chapter_id))
+                if previous is not None and previous[1] > percentage:
+                    status, percentage = previous
+                rows.append(StudentProgress(
+                    student_id=student_id, chapter_id=chapter_id, status=status, progress_percentage=percentage
+                ))
+                changes.append((
+                    student_id, chapters[chapter_id], previous, (status, percentage)
+                ))
+        StudentProgress.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['student', 'chapter'],
+            update_fields=['status', 'progress_percentage', 'last_studied'],
+        )
+        apply_progress_changes(changes, timezone.now())
+    record_progress_events('written', len(rows))
+    return len(rows)
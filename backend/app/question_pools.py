@@ -0,0 +1,202 @@
+"""
+Question id pools for adaptive quiz sessions.
+
+Each chapter has one Redis set of multiple choice question ids per
+difficulty. A session copies its chapter's pools into its own sets when it
+starts, and each question is drawn with SPOP: random, without repeats and
+O(1), instead of a random ORDER BY over the Question table.
+
+Chapter pools are built on first use (or ahead of time with manage.py
+build_question_pools) and dropped when the chapter's questions change:
+saves and deletes through the signals in signals.py, bulk imports by
+calling invalidate_chapters. A build that raced with an invalidation is
+discarded (the chapter's generation counter changed under WATCH), so a pool
+never outlives the data it was read from.
+
+Session sets expire QUIZ_SESSION_TTL after they were made. A session whose
+sets are gone is re-seeded from the chapter pools minus the questions it already asked.
+Without Redis questions are drawn from the database.
+"""
+import logging
+import random
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from redis.exceptions import WatchError
+
+from .models import Quiz, Question
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'question-pool'
+DIFFICULTIES = [value for value, _ in Question._meta.get_field('difficulty').choices]
+
+
+def _pool_key(chapter_id, difficulty):
+    return f'{KEY_PREFIX}:chapter:{chapter_id}:{difficulty}'
+
+
+def _built_key(chapter_id):
+    return f'{KEY_PREFIX}:chapter:{chapter_id}:built'
+
+
+def _generation_key(chapter_id):
+    return f'{KEY_PREFIX}:chapter:{chapter_id}:generation'
+
+
+def _session_key(session_id, difficulty):
+    return f'{KEY_PREFIX}:session:{session_id}:{difficulty}'
+
+
+def _seeded_key(session_id):
+    return f'{KEY_PREFIX}:session:{session_id}:seeded'
+
+
+def _redis_client():
+    cache = caches[settings.QUIZ_POOL_ALIAS]
+    backend = getattr(cache, '_cache', None)
+    if backend is None or not hasattr(backend, 'get_client'):
+        return None
+    return backend.get_client(write=True)
+
+
+def chapter_questions(chapter_id):
+    """Multiple choice questions of a chapter, for pools and database draws"""
+    return Question.objects.filter(quiz__chapter_id=chapter_id, question_type='mcq')
+
+
+def _pool_ids(chapter_id):
+    pools = {difficulty: [] for difficulty in DIFFICULTIES}
+    for difficulty, question_id in chapter_questions(chapter_id).values_list('difficulty', 'pk'):
+        pools.setdefault(difficulty, []).append(question_id)
+    return pools
+
+
+def build_pools(chapter_id, client=None):
+    """Write a chapter's pools from the database; False if invalidated meanwhile"""
+    client = client or _redis_client()
+    if client is None:
+        return False
+    with client.pipeline() as pipe:
+        try:
+            pipe.watch(_generation_key(chapter_id))
+            pools = _pool_ids(chapter_id)
+            pipe.multi()
+            for difficulty, question_ids in pools.items():
+                pipe.delete(_pool_key(chapter_id, difficulty))
+                if question_ids:
+                    pipe.sadd(_pool_key(chapter_id, difficulty), *question_ids)
+            pipe.set(_built_key(chapter_id), 1)
+            pipe.execute()
+        except WatchError:
+            return False
+    return True
+
+
+def _ensure_pools(client, chapter_id):
+    if client.exists(_built_key(chapter_id)):
+        return True
+    # A build that lost a race with an invalidation is retried once
+    return build_pools(chapter_id, client) or build_pools(chapter_id, client)
+
+
+def build_all_pools(chapter_ids=None):
+    """Build the pools of every chapter with quizzes (or the given ones); returns the number built"""
+    client = _redis_client()
+    if client is None:
+        return 0
+    if chapter_ids is None:
+        chapter_ids = Quiz.objects.order_by('chapter_id').values_list('chapter_id', flat=True).distinct()
+    return sum(1 for chapter_id in chapter_ids if build_pools(chapter_id, client))
+
+
+def invalidate_chapters(chapter_ids):
+    """Drop the pools of chapters whose questions changed, once the transaction commits"""
+    chapter_ids = set(chapter_ids) - {None}
+    if chapter_ids:
+        transaction.on_commit(lambda: _invalidate(chapter_ids))
+
+
+def invalidate_quizzes(quiz_ids):
+    invalidate_chapters(Quiz.objects.filter(pk__in=quiz_ids).values_list('chapter_id', flat=True))
+
+
+def _invalidate(chapter_ids):
+    client = _redis_client()
+    if client is None:
+        return
+    try:
+        with client.pipeline() as pipe:
+            for chapter_id in chapter_ids:
+                pipe.incr(_generation_key(chapter_id))
+                pipe.delete(_built_key(chapter_id), *[_pool_key(chapter_id, d) for d in DIFFICULTIES])
+            pipe.execute()
+    except Exception as e:
+        logger.warning("Question pool invalidation failed: %s", e)
+
+
+def _seed_session(client, session_id, chapter_id, asked):
+    if not _ensure_pools(client, chapter_id):
+        return False
+    ttl = settings.QUIZ_SESSION_TTL
+    with client.pipeline() as pipe:
+        for difficulty in DIFFICULTIES:
+            key = _session_key(session_id, difficulty)
+            pipe.sunionstore(key, [_pool_key(chapter_id, difficulty)])
+            if asked:
+                pipe.srem(key, *asked)
+            pipe.expire(key, ttl)
+        pipe.set(_seeded_key(session_id), 1, ex=ttl)
+        pipe.execute()
+    return True
+
+
+def _by_distance(difficulty):
+    """Difficulties nearest to difficulty first, easier before harder on ties"""
+    return sorted(DIFFICULTIES, key=lambda d: (abs(d - difficulty), d))
+
+
+def draw(session, asked):
+    """
+    Id of a random question of the session's chapter not in asked, at the
+    session's difficulty or the nearest one that has questions left; None
+    when the chapter has none left
+    """
+    client = _redis_client()
+    if client is not None:
+        try:
+            return _draw_redis(client, session, asked)
+        except Exception as e:
+            logger.warning("Question pool draw failed, drawing from the database: %s", e)
+    return _draw_database(session, asked)
+
+
+def _draw_redis(client, session, asked):
+    if not client.exists(_seeded_key(session.pk)):
+        if not _seed_session(client, session.pk, session.chapter_id, asked):
+            return _draw_database(session, asked)
+    for difficulty in _by_distance(session.difficulty):
+        question_id = client.spop(_session_key(session.pk, difficulty))
+        if question_id is not None:
+            return int(question_id)
+    return None
+
+
+def _draw_database(session, asked):
+    questions = chapter_questions(session.chapter_id).exclude(pk__in=asked)
+    for difficulty in _by_distance(session.difficulty):
+        question_ids = list(questions.filter(difficulty=difficulty).values_list('pk', flat=True))
+        if question_ids:
+            return random.choice(question_ids)
+    return None
+
+
+def end_session(session_id):
+    client = _redis_client()
+    if client is None:
+        return
+    try:
+        client.delete(_seeded_key(session_id), *[_session_key(session_id, d) for d in DIFFICULTIES])
+    except Exception as e:
+        logger.warning("Removing question pools of session %s failed: %s", session_id, e)
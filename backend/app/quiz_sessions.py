@@ -0,0 +1,153 @@
+"""
+Adaptive quiz sessions.
+
+A session asks num_questions multiple choice questions from one chapter,
+one at a time. Questions come from the chapter's pools (see question_pools)
+at the session's current difficulty: two correct answers in a row move it up
+a level, a wrong answer moves it down. Answers are graded on the server; the
+client only ever sees the choices, never which one is correct until it has
+answered.
+
+Each answer scores its question's difficulty in points. When the session
+ends (num_questions answered, or the chapter ran out of questions) the
+weighted score becomes the student's progress on the chapter through
+record_progress.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import question_pools
+from .dashboard import record_progress
+from .models import Question, QuizSession, QuizSessionAnswer, StudentProgress
+
+STEP_UP_STREAK = 2
+MASTERED_SCORE = 80
+DIFFICULT_SCORE = 40
+# Drawn ids whose question was deleted since the pools were built are skipped
+MAX_DRAW_ATTEMPTS = 5
+
+
+class QuizSessionError(Exception):
+    pass
+
+
+def score_percentage(session):
+    return round(100 * session.points / session.max_points) if session.max_points else 0
+
+
+def _asked(session):
+    asked = set(QuizSessionAnswer.objects.filter(session=session).values_list('question_id', flat=True))
+    if session.current_question_id:
+        asked.add(session.current_question_id)
+    return asked
+
+
+def _next_question(session):
+    asked = _asked(session)
+    for _ in range(MAX_DRAW_ATTEMPTS):
+        question_id = question_pools.draw(session, asked)
+        if question_id is None:
+            return None
+        question = question_pools.chapter_questions(session.chapter_id).filter(pk=question_id).first()
+        if question is not None:
+            return question
+        asked.add(question_id)
+    return None
+
+
+def start_session(student, chapter, num_questions=None):
+    """Create a session on chapter and draw its first question"""
+    num_questions = num_questions or settings.QUIZ_SESSION_DEFAULT_QUESTIONS
+    if not 1 <= num_questions <= settings.QUIZ_SESSION_MAX_QUESTIONS:
+        raise QuizSessionError(f'num_questions must be between 1 and {settings.QUIZ_SESSION_MAX_QUESTIONS}')
+
+    with transaction.atomic():
+        session = QuizSession.objects.create(
+            student=student, chapter=chapter, num_questions=num_questions,
+            difficulty=settings.QUIZ_START_DIFFICULTY,
+        )
+        session.current_question = _next_question(session)
+        if session.current_question is None:
+            question_pools.end_session(session.pk)
+            raise QuizSessionError('This chapter has no multiple choice questions')
+        session.save(update_fields=['current_question'])
+    return session
+
+
+def _adapt(session, is_correct):
+    if is_correct:
+        session.streak += 1
+        if session.streak >= STEP_UP_STREAK:
+            session.difficulty = min(session.difficulty + 1, max(question_pools.DIFFICULTIES))
+            session.streak = 0
+    else:
+        session.difficulty = max(session.difficulty - 1, min(question_pools.DIFFICULTIES))
+        session.streak = 0
+
+
+def _progress_status(score):
+    if score >= MASTERED_SCORE:
+        return 'mastered'
+    if score < DIFFICULT_SCORE:
+        return 'difficult'
+    return 'in_progress'
+
+
+def _complete(session):
+    session.status = 'completed'
+    session.current_question = None
+    session.completed_at = timezone.now()
+    score = score_percentage(session)
+    # A quiz doesn't take back reading progress
+    previous = (
+        StudentProgress.objects.filter(student_id=session.student_id, chapter_id=session.chapter_id)
+        .values_list('progress_percentage', flat=True).first()
+    ) or 0
+    record_progress(session.student, session.chapter, _progress_status(score), max(previous, score))
+    transaction.on_commit(lambda: question_pools.end_session(session.pk))
+
+
+def answer_question(session_id, student, question_id, choice_id):
+    """
+    Grade the answer to the session's current question and draw the next
+    one; returns the session and the recorded answer
+    """
+    with transaction.atomic():
+        session = (
+            QuizSession.objects.select_for_update()
+            .select_related('chapter__subject', 'student')
+            .filter(pk=session_id, student=student).first()
+        )
+        if session is None:
+            raise QuizSessionError('Quiz session not found')
+        if session.status != 'active':
+            raise QuizSessionError('This quiz session is already completed')
+        if question_id != session.current_question_id:
+            raise QuizSessionError('Answer the current question of the session')
+
+        question = Question.objects.prefetch_related('choices').get(pk=question_id)
+        choice = next((choice for choice in question.choices.all() if choice.pk == choice_id), None)
+        if choice is None:
+            raise QuizSessionError('choice_id is not a choice of this question')
+
+        answer = QuizSessionAnswer.objects.create(
+            session=session, question=question, choice=choice,
+            difficulty=question.difficulty, is_correct=choice.is_correct,
+        )
+        answer.correct_choice_id = next((c.pk for c in question.choices.all() if c.is_correct), None)
+
+        session.answered += 1
+        session.max_points += question.difficulty
+        if choice.is_correct:
+            session.correct += 1
+            session.points += question.difficulty
+        _adapt(session, choice.is_correct)
+
+        next_question = _next_question(session) if session.answered < session.num_questions else None
+        if next_question is None:
+            _complete(session)
+        else:
+            session.current_question = next_question
+        session.save()
+    return session, answer
@@ -0,0 +1,161 @@
+"""
+Shared budgets for external APIs and per-client throttles for AI endpoints.
+
+Budgets are token buckets stored in Redis and updated by a Lua script, so
+every gunicorn and Celery process draws from the same allowance:
+
+- gemini_requests: GEMINI_REQUESTS_PER_MINUTE calls per minute
+- gemini_tokens: GEMINI_TOKENS_PER_MINUTE prompt tokens per minute
+- youtube_quota: YOUTUBE_DAILY_QUOTA quota units per day, charged per call
+  type (search.list 100, videos.list 1)
+
+When the cache isn't Redis (local development) each process keeps its own
+buckets. consume() raises RateLimited, a DRF Throttled error, so views
+answer 429 with Retry-After; cached AI responses are served before any
+budget is touched and generation jobs re-queue themselves until it refills.
+"""
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import UserRateThrottle
+
+from .metrics import record_rate_limited
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'rate-limit'
+
+# Returns {allowed, seconds until `cost` tokens are available}
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+
+class RateLimited(Throttled):
+    """An external API budget is exhausted; wait is the seconds until it refills"""
+
+    def __init__(self, budget, wait):
+        self.budget = budget
+        super().__init__(
+            wait=math.ceil(wait),
+            detail=f'The {budget} budget is exhausted. Try again later.',
+        )
+
+
+def _budgets():
+    # name -> (capacity, refill period in seconds)
+    return {
+        'gemini_requests': (settings.GEMINI_REQUESTS_PER_MINUTE, 60),
+        'gemini_tokens': (settings.GEMINI_TOKENS_PER_MINUTE, 60),
+        'youtube_quota': (settings.YOUTUBE_DAILY_QUOTA, 60 * 60 * 24),
+    }
+
+
+class LocalTokenBucket:
+    """In-process fallback used when the cache backend isn't Redis"""
+
+    def __init__(self):
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def take(self, name, capacity, rate, cost):
+        with self._lock:
+            now = time.monotonic()
+            tokens, ts = self._state.get(name, (capacity, now))
+            tokens = min(capacity, tokens + (now - ts) * rate)
+            if tokens >= cost:
+                self._state[name] = (tokens - cost, now)
+                return True, 0.0
+            self._state[name] = (tokens, now)
+            return False, (cost - tokens) / rate
+
+    def reset(self):
+        with self._lock:
+            self._state.clear()
+
+
+_local_buckets = LocalTokenBucket()
+_script = None
+_script_lock = threading.Lock()
+
+
+def _redis_client():
+    cache = caches[settings.RATE_LIMIT_CACHE_ALIAS]
+    backend = getattr(cache, '_cache', None)
+    if backend is None or not hasattr(backend, 'get_client'):
+        return None
+    return backend.get_client(write=True)
+
+
+def _take(name, capacity, rate, cost):
+    global _script
+    client = _redis_client()
+    if client is None:
+        return _local_buckets.take(name, capacity, rate, cost)
+
+    with _script_lock:
+        if _script is None:
+            _script = client.register_script(TOKEN_BUCKET_LUA)
+    allowed, wait = _script(keys=[f'{KEY_PREFIX}:{name}'], args=[capacity, rate, cost], client=client)
+    return bool(allowed), float(wait)
+
+
+def consume(budget, cost=1):
+    """
+    Take cost tokens from a budget or raise RateLimited.
+
+    A failing Redis lets the call through: the budgets protect the external
+    APIs, they shouldn't become an outage of their own.
+    """
+    if not settings.RATE_LIMIT_ENABLED or cost <= 0:
+        return
+    capacity, period = _budgets()[budget]
+    cost = min(cost, capacity)
+    try:
+        allowed, wait = _take(budget, capacity, capacity / period, cost)
+    except Exception as e:
+        logger.warning("Rate limiter unavailable, allowing %s: %s", budget, e)
+        return
+    if not allowed:
+        record_rate_limited(budget)
+        raise RateLimited(budget, wait)
+
+
+class AIRateThrottle(UserRateThrottle):
+    """Per-user (or per-IP for anonymous clients) limit on AI endpoints"""
+    scope = 'ai'
+
+    def get_rate(self):
+        return settings.AI_THROTTLE_RATE
+
+
+class VideoRateThrottle(UserRateThrottle):
+    """Per-user (or per-IP) limit on video lookups that may call YouTube"""
+    scope = 'videos'
+
+    def get_rate(self):
+        return settings.VIDEO_THROTTLE_RATE
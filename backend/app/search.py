@@ -0,0 +1,264 @@
+"""
+Full-text search over chapters, study materials, flashcards and questions.
+
+Every searchable object has a SearchDocument row carrying its chapter,
+subject and grade, so results can be filtered without joins. The text index
+depends on the database backend:
+
+- PostgreSQL: a GIN index on a weighted tsvector expression over title and
+  body, queried with websearch_to_tsquery and ranked with ts_rank.
+- SQLite: an external-content FTS5 table kept in sync by triggers, ranked
+  with bm25.
+- Anything else falls back to unranked icontains matching.
+
+Documents are updated incrementally: signals cover single saves/deletes and
+the bulk writers in ingestion/video_catalog/seeding call index_objects.
+"""
+import re
+
+from django.db import connection, connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import (
+    Chapter, StudyMaterial, Quiz, Question, Flashcard, SearchDocument
+)
+
+TABLE = SearchDocument._meta.db_table
+FTS_TABLE = f'{TABLE}_fts'
+GIN_INDEX = f'{TABLE}_search_gin'
+SEARCH_CONFIG = 'english'
+BATCH_SIZE = 1000
+
+# Title matches count for more than body matches
+PG_VECTOR = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({TABLE}.title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({TABLE}.body, '')), 'B')"
+)
+FTS5_TITLE_WEIGHT = 10.0
+FTS5_BODY_WEIGHT = 1.0
+
+SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, body, content='{TABLE}', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_ai AFTER INSERT ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_ad AFTER DELETE ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_au AFTER UPDATE ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+]
+POSTGRES_DDL = [
+    f"CREATE INDEX IF NOT EXISTS {GIN_INDEX} ON {TABLE} USING gin (({PG_VECTOR}))",
+]
+
+DOCUMENT_FIELDS = ['chapter', 'subject', 'grade', 'title', 'body', 'updated_at']
+
+
+def ensure_search_index(using='default'):
+    """Create the backend-specific full-text index if it doesn't exist"""
+    conn = connections[using]
+    statements = {'postgresql': POSTGRES_DDL, 'sqlite': SQLITE_DDL}.get(conn.vendor, [])
+    if not statements:
+        return
+    new_fts_table = conn.vendor == 'sqlite' and FTS_TABLE not in conn.introspection.table_names()
+    with conn.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+        if new_fts_table:
+            # Pick up documents written before the FTS table existed
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+# Documents
+
+def _chapter_document(chapter):
+    return chapter.title, '\n'.join(filter(None, [chapter.description, chapter.content]))
+
+
+def _material_document(material):
+    return material.title, '\n'.join(filter(None, [material.content, material.channel]))
+
+
+def _flashcard_document(flashcard):
+    return flashcard.question, flashcard.answer
+
+
+def _question_document(question):
+    return question.question_text, ''
+
+
+DOCUMENTS = {
+    Chapter: ('chapter', _chapter_document),
+    StudyMaterial: ('material', _material_document),
+    Flashcard: ('flashcard', _flashcard_document),
+    Question: ('question', _question_document),
+}
+
+
+def _chapter_id(instance):
+    if isinstance(instance, Chapter):
+        return instance.pk
+    if isinstance(instance, Question):
+        return instance.quiz.chapter_id
+    return instance.chapter_id
+
+
+def index_objects(objects, batch_size=BATCH_SIZE):
+    """
+    Upsert SearchDocument rows for saved model instances of one type.
+
+    Chapter, subject and grade ids are looked up in one query, and rows are
+    written with a single INSERT ... ON CONFLICT per batch.
+    """
+    objects = [obj for obj in objects if obj.pk is not None]
+    if not objects:
+        return 0
+    kind, build = DOCUMENTS[type(objects[0])]
+
+    if isinstance(objects[0], Question):
+        _attach_quiz_chapters(objects)
+    chapter_ids = {_chapter_id(obj) for obj in objects}
+    placement = {
+        chapter_id: (subject_id, grade_id)
+        for chapter_id, subject_id, grade_id in Chapter.objects.filter(pk__in=chapter_ids)
+        .values_list('pk', 'subject_id', 'subject__grade_id')
+    }
+
+    documents = []
+    for obj in objects:
+        chapter_id = _chapter_id(obj)
+        if chapter_id not in placement:
+            continue
+        subject_id, grade_id = placement[chapter_id]
+        title, body = build(obj)
+        documents.append(SearchDocument(
+            kind=kind, object_id=obj.pk, chapter_id=chapter_id,
+            subject_id=subject_id, grade_id=grade_id,
+            title=title or '', body=body or '',
+        ))
+
+    SearchDocument.objects.bulk_create(
+        documents,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['kind', 'object_id'],
+        update_fields=DOCUMENT_FIELDS,
+    )
+    return len(documents)
+
+
+def _attach_quiz_chapters(questions):
+    """Resolve question -> chapter without a query per question"""
+    missing = {q.quiz_id for q in questions if not Question.quiz.is_cached(q)}
+    if not missing:
+        return
+    quizzes = Quiz.objects.only('id', 'chapter_id').in_bulk(missing)
+    for question in questions:
+        if question.quiz_id in quizzes:
+            question.quiz = quizzes[question.quiz_id]
+
+
+def unindex_objects(model, object_ids):
+    """Remove SearchDocument rows for deleted objects"""
+    kind = DOCUMENTS[model][0]
+    SearchDocument.objects.filter(kind=kind, object_id__in=list(object_ids)).delete()
+
+
+def move_chapter_documents(chapter):
+    """Keep subject/grade of a chapter's documents in step with the chapter"""
+    grade_id = Chapter.objects.filter(pk=chapter.pk).values_list('subject__grade_id', flat=True).first()
+    SearchDocument.objects.filter(chapter=chapter).exclude(
+        subject_id=chapter.subject_id, grade_id=grade_id
+    ).update(subject_id=chapter.subject_id, grade_id=grade_id)
+
+
+def rebuild_search_index(batch_size=BATCH_SIZE, log=None):
+    """Index every searchable object from scratch; returns {kind: count}"""
+    log = log or (lambda message: None)
+    ensure_search_index()
+    counts = {}
+    for model, (kind, _) in DOCUMENTS.items():
+        queryset = model.objects.order_by('pk')
+        if model is Question:
+            queryset = queryset.select_related('quiz')
+        counts[kind] = 0
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            counts[kind] += index_objects(batch, batch_size=batch_size)
+            last_pk = batch[-1].pk
+        # Drop documents whose object no longer exists
+        SearchDocument.objects.filter(kind=kind).exclude(
+            object_id__in=model.objects.values('pk')
+        ).delete()
+        log(f'  {kind}: {counts[kind]}')
+    return counts
+
+
+# Queries
+
+def _fts5_query(text):
+    """
+    Turn free text into an FTS5 query: every word must match, the last one as
+    a prefix. Quoting each token keeps FTS5 operators out of user input.
+    """
+    tokens = re.findall(r'\w+', text)
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search(text, grade_id=None, subject_id=None, kinds=None):
+    """
+    Return a SearchDocument queryset matching text, best matches first, with
+    a `rank` annotation (higher is better)
+    """
+    queryset = SearchDocument.objects.all()
+    if grade_id:
+        queryset = queryset.filter(grade_id=grade_id)
+    if subject_id:
+        queryset = queryset.filter(subject_id=subject_id)
+    if kinds:
+        queryset = queryset.filter(kind__in=kinds)
+
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        query = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+        queryset = queryset.filter(
+            RawSQL(f"({PG_VECTOR}) @@ {query}", [text], output_field=BooleanField())
+        ).annotate(
+            rank=RawSQL(f"ts_rank({PG_VECTOR}, {query})", [text], output_field=FloatField())
+        )
+    elif vendor == 'sqlite':
+        match = _fts5_query(text)
+        if match is None:
+            return queryset.none()
+        queryset = queryset.filter(
+            RawSQL(
+                f"{TABLE}.id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)",
+                [match], output_field=BooleanField(),
+            )
+        ).annotate(
+            # bm25 is lower for better matches
+            rank=RawSQL(
+                f"(SELECT -bm25({FTS_TABLE}, {FTS5_TITLE_WEIGHT}, {FTS5_BODY_WEIGHT}) "
+                f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = {TABLE}.id)",
+                [match], output_field=FloatField(),
+            )
+        )
+    else:
+        queryset = queryset.filter(
+            Q(title__icontains=text) | Q(body__icontains=text)
+        ).annotate(rank=Value(0.0, output_field=FloatField()))
+
+    return queryset.order_by('-rank', 'pk')
@@ -0,0 +1,233 @@
+"""
+Reference curriculum data and a synthetic data generator for load testing.
+
+The generator writes with bulk_create in fixed-size batches, one chapter
+chunk per transaction, so memory stays flat while building databases with
+millions of rows. A fixed seed always produces the same content.
+"""
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Max
+
+from .catalog_cache import catalog_cache
+from .dashboard import rebuild_subject_progress
+from .fingerprints import content_fingerprint
+from .ingestion import bulk_create_quizzes, bulk_create_flashcards
+from .models import Grade, Subject, Chapter, StudyMaterial, StudentProgress
+from .search import index_objects
+
+GRADES = [
+    ('nursery', 'Early childhood education'),
+    ('ukg', 'Upper Kindergarten'),
+    ('kg', 'Kindergarten'),
+    ('class_1', 'Elementary School - Grade 1'),
+    ('class_2', 'Elementary School - Grade 2'),
+    ('class_3', 'Elementary School - Grade 3'),
+    ('class_4', 'Elementary School - Grade 4'),
+    ('class_5', 'Elementary School - Grade 5'),
+    ('class_6', 'Middle School - Grade 6'),
+    ('class_7', 'Middle School - Grade 7'),
+    ('class_8', 'Middle School - Grade 8'),
+    ('class_9', 'Secondary School - Grade 9'),
+    ('class_10', 'Secondary School - Grade 10'),
+    ('class_11', 'Senior Secondary - Grade 11'),
+    ('class_12', 'Senior Secondary - Grade 12'),
+]
+
+SYNTHETIC_STUDENT_PREFIX = 'synthetic_student_'
+
+WORDS = (
+    'motion force energy atom cell plant equation fraction river empire climate '
+    'democracy market grammar poem velocity acid base gravity tissue triangle '
+    'history monsoon circuit magnet algebra geometry enzyme habitat trade '
+    'population resource revolution constitution molecule reaction'
+).split()
+
+
+def ensure_grades():
+    """Create any missing reference grades; returns {level: Grade}"""
+    Grade.objects.bulk_create(
+        [Grade(level=level, description=description) for level, description in GRADES],
+        ignore_conflicts=True,
+    )
+    # ignore_conflicts leaves primary keys unset, so bump the grade list as a whole
+    catalog_cache.invalidate_models(Grade)
+    return {grade.level: grade for grade in Grade.objects.filter(level__in=[level for level, _ in GRADES])}
+
+
+class SyntheticDataGenerator:
+    """
+    Builds a synthetic curriculum under every grade: N subjects per grade,
+    M chapters per subject and K materials/quizzes/questions/flashcards per
+    chapter, plus synthetic students with progress on a sample of chapters
+    """
+
+    def __init__(self, seed=42, batch_size=1000, chapter_chunk_size=200, log=None):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.chapter_chunk_size = chapter_chunk_size
+        self.log = log or (lambda message: None)
+        self.counts = {}
+
+    def run(self, subjects_per_grade=4, chapters_per_subject=5, materials_per_chapter=3,
+            quizzes_per_chapter=2, questions_per_quiz=20, flashcards_per_chapter=40,
+            students=100, chapters_per_student=50):
+        started = time.perf_counter()
+        self.counts = dict.fromkeys(
+            ['subjects', 'chapters', 'materials', 'quizzes', 'questions', 'flashcards',
+             'students', 'progress'], 0
+        )
+
+        subjects = self.ensure_subjects(ensure_grades(), subjects_per_grade)
+        chapter_ids = []
+        subjects_per_chunk = max(1, self.chapter_chunk_size // max(1, chapters_per_subject))
+        for start in range(0, len(subjects), subjects_per_chunk):
+            chunk = subjects[start:start + subjects_per_chunk]
+            with transaction.atomic():
+                chapters = self.create_chapters(chunk, chapters_per_subject)
+                self.create_materials(chapters, materials_per_chapter)
+                self.create_quizzes(chapters, quizzes_per_chapter, questions_per_quiz)
+                self.create_flashcards(chapters, flashcards_per_chapter)
+            chapter_ids.extend(chapter.id for chapter in chapters)
+            self.log(f'  {self.counts["chapters"]} chapters, {self.counts["questions"]} questions, '
+                     f'{self.counts["flashcards"]} flashcards')
+
+        self.create_students(students, chapter_ids, chapters_per_student)
+        self.counts['seconds'] = round(time.perf_counter() - started, 1)
+        return self.counts
+
+    def ensure_subjects(self, grades, subjects_per_grade):
+        names = [name for name, _ in Subject.SUBJECT_CHOICES]
+        if subjects_per_grade > len(names):
+            raise ValueError(f'At most {len(names)} subjects per grade are available')
+
+        existing = set(Subject.objects.filter(grade__in=grades.values()).values_list('grade_id', 'name'))
+        created = Subject.objects.bulk_create([
+            Subject(grade=grade, name=name, description=f'{name.replace("_", " ").title()} for {grade.level}')
+            for grade in grades.values()
+            for name in names[:subjects_per_grade]
+            if (grade.id, name) not in existing
+        ])
+        catalog_cache.invalidate_objects(created)
+        self.counts['subjects'] += len(created)
+        return list(
+            Subject.objects.filter(grade__in=grades.values(), name__in=names[:subjects_per_grade])
+            .order_by('grade_id', 'name')
+        )
+
+    def create_chapters(self, subjects, chapters_per_subject):
+        last_numbers = self.last_chapter_numbers(subjects)
+
+        chapters = []
+        for subject in subjects:
+            start = last_numbers.get(subject.id, 0)
+            for number in range(start + 1, start + 1 + chapters_per_subject):
+                content = self.words(300).capitalize()
+                chapters.append(Chapter(
+                    subject=subject,
+                    chapter_number=number,
+                    title=f'{self.words(2).title()} {number}',
+                    description=self.words(12).capitalize(),
+                    content=content,
+                    content_hash=content_fingerprint(content),
+                ))
+        chapters = Chapter.objects.bulk_create(chapters, batch_size=self.batch_size)
+        index_objects(chapters, batch_size=self.batch_size)
+        catalog_cache.invalidate_objects(chapters)
+        self.counts['chapters'] += len(chapters)
+        return chapters
+
+    def last_chapter_numbers(self, subjects):
+        return {
+            row['subject']: row['last']
+            for row in Chapter.objects.filter(subject__in=subjects).order_by()
+            .values('subject').annotate(last=Max('chapter_number'))
+        }
+
+    def create_materials(self, chapters, per_chapter):
+        materials = []
+        for chapter in chapters:
+            for i in range(per_chapter):
+                material_type = self.rng.choice(['video', 'note', 'formula', 'article'])
+                material = StudyMaterial(
+                    chapter=chapter,
+                    title=f'{self.words(3).title()}',
+                    material_type=material_type,
+                    content=self.words(40),
+                    source='Synthetic',
+                )
+                if material_type == 'video':
+                    material.video_id = f'syn{chapter.id}x{i}'
+                    material.video_url = f'https://www.youtube.com/watch?v={material.video_id}'
+                    material.quality_score = self.rng.randint(0, 80)
+                materials.append(material)
+        StudyMaterial.objects.bulk_create(materials, batch_size=self.batch_size)
+        index_objects(materials, batch_size=self.batch_size)
+        catalog_cache.invalidate_objects(materials)
+        self.counts['materials'] += len(materials)
+
+    def create_quizzes(self, chapters, quizzes_per_chapter, questions_per_quiz):
+        specs = []
+        for chapter in chapters:
+            for q in range(quizzes_per_chapter):
+                specs.append((chapter, f'{chapter.title} Quiz {q + 1}', [
+                    {
+                        'question': f'What is the {self.words(3)}?',
+                        'options': [self.words(2) for _ in range(4)],
+                        'correct_answer': self.rng.randrange(4),
+                        'difficulty': self.rng.randint(1, 3),
+                    }
+                    for _ in range(questions_per_quiz)
+                ]))
+        bulk_create_quizzes(specs, batch_size=self.batch_size, skip_duplicates=False)
+        self.counts['quizzes'] += len(specs)
+        self.counts['questions'] += len(specs) * questions_per_quiz
+
+    def create_flashcards(self, chapters, per_chapter):
+        flashcards = bulk_create_flashcards(
+            [
+                (chapter, {'question': f'Define {self.words(2)}', 'answer': self.words(15)})
+                for chapter in chapters
+                for _ in range(per_chapter)
+            ],
+            batch_size=self.batch_size,
+            skip_duplicates=False,
+        )
+        self.counts['flashcards'] += len(flashcards)
+
+    def create_students(self, count, chapter_ids, chapters_per_student):
+        if not count:
+            return
+        offset = User.objects.filter(username__startswith=SYNTHETIC_STUDENT_PREFIX).count()
+        statuses = [status for status, _ in StudentProgress.STATUS_CHOICES]
+        per_student = min(chapters_per_student, len(chapter_ids))
+        students_per_chunk = max(1, self.batch_size * 10 // max(1, per_student))
+
+        for start in range(0, count, students_per_chunk):
+            with transaction.atomic():
+                students = User.objects.bulk_create(
+                    [User(username=f'{SYNTHETIC_STUDENT_PREFIX}{offset + n}')
+                     for n in range(start, min(count, start + students_per_chunk))],
+                    batch_size=self.batch_size,
+                )
+                progress = [
+                    StudentProgress(
+                        student=student,
+                        chapter_id=chapter_id,
+                        status=self.rng.choice(statuses),
+                        progress_percentage=self.rng.randint(0, 100),
+                    )
+                    for student in students
+                    for chapter_id in self.rng.sample(chapter_ids, per_student)
+                ]
+                StudentProgress.objects.bulk_create(progress, batch_size=self.batch_size)
+                rebuild_subject_progress(students)
+            self.counts['students'] += len(students)
+            self.counts['progress'] += len(progress)
+            self.log(f'  {self.counts["students"]} students, {self.counts["progress"]} progress rows')
+
+    def words(self, count):
+        return ' '.join(self.rng.choice(WORDS) for _ in range(count))
@@ -1,8 +1,44 @@
+from django.conf import settings
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from .models import (
     Grade, Subject, Chapter, StudyMaterial, Quiz, Question, 
-    QuestionChoice, StudentProgress, Flashcard
+    QuestionChoice, StudentProgress, Flashcard, SearchDocument, ContentBundle, QuizSession,
+    FlashcardReview
 )
+from .quiz_sessions import score_percentage
+
+
+def _field_names(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+def selected_fields(request):
+    """
+    (fields, expand) from ?fields=a,b and ?expand=c of a read request:
+    fields is None when the response isn't restricted
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, set()
+    return _field_names(request.query_params.get('fields')) or None, _field_names(request.query_params.get('expand'))
+
+
+class SparseFieldsMixin:
+    """
+    ?expand= adds the named fields from expandable_fields (name -> field
+    factory); ?fields= then keeps only the named fields. Applies to the
+    top-level serializer of a request, not to nested ones.
+    """
+    expandable_fields = {}
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, expand = selected_fields(self.context.get('request'))
+        for name in expand & set(self.expandable_fields):
+            self.fields[name] = self.expandable_fields[name]()
+        if fields is not None:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
 
 
 class GradeSerializer(serializers.ModelSerializer):
@@ -17,13 +53,16 @@ class SubjectSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'grade']
 
 
-class StudyMaterialSerializer(serializers.ModelSerializer):
+class StudyMaterialSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = StudyMaterial
-        fields = ['id', 'title', 'material_type', 'content', 'video_url', 'video_id', 'source', 'created_at']
+        fields = [
+            'id', 'title', 'material_type', 'content', 'video_url', 'video_id', 'source',
+            'channel', 'quality_score', 'fetched_at', 'created_at'
+        ]
 
 
-class ChapterSerializer(serializers.ModelSerializer):
+class ChapterSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     materials = serializers.SerializerMethodField()
     
     class Meta:
@@ -35,6 +74,21 @@ class ChapterSerializer(serializers.ModelSerializer):
         return StudyMaterialSerializer(materials, many=True).data
 
 
+class ChapterListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Chapter lists without content and materials; ?expand=content,materials
+    adds them
+    """
+    expandable_fields = {
+        'content': lambda: serializers.CharField(read_only=True, allow_null=True),
+        'materials': lambda: StudyMaterialSerializer(many=True, read_only=True),
+    }
+    
+    class Meta:
+        model = Chapter
+        fields = ['id', 'title', 'description', 'chapter_number', 'created_at']
+
+
 class QuestionChoiceSerializer(serializers.ModelSerializer):
     class Meta:
         model = QuestionChoice
@@ -49,7 +103,7 @@ class QuestionSerializer(serializers.ModelSerializer):
         fields = ['id', 'question_text', 'question_type', 'difficulty', 'choices']
 
 
-class QuizSerializer(serializers.ModelSerializer):
+class QuizSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     questions = QuestionSerializer(many=True, read_only=True)
     
     class Meta:
@@ -57,13 +111,95 @@ class QuizSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'questions', 'created_at']
 
 
-class StudentProgressSerializer(serializers.ModelSerializer):
+class SessionChoiceSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = QuestionChoice
+        fields = ['id', 'choice_text', 'order']
+
+
+class SessionQuestionSerializer(serializers.ModelSerializer):
+    """A question as asked in a quiz session, without the answer"""
+    choices = SessionChoiceSerializer(many=True, read_only=True)
+    
+    class Meta:
+        model = Question
+        fields = ['id', 'question_text', 'difficulty', 'choices']
+
+
+class QuizSessionSerializer(serializers.ModelSerializer):
+    current_question = SessionQuestionSerializer(read_only=True)
+    score_percentage = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = QuizSession
+        fields = ['id', 'chapter', 'status', 'num_questions', 'answered', 'correct', 'difficulty',
+                  'score_percentage', 'current_question', 'created_at', 'completed_at']
+    
+    def get_score_percentage(self, obj):
+        return score_percentage(obj)
+
+
+class StudentProgressSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = StudentProgress
         fields = ['id', 'chapter', 'status', 'progress_percentage', 'last_studied']
+        extra_kwargs = {
+            'progress_percentage': {'min_value': 0, 'max_value': 100},
+        }
 
 
-class FlashcardSerializer(serializers.ModelSerializer):
+class FlashcardSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Flashcard
         fields = ['id', 'question', 'answer', 'created_at']
+
+
+class FlashcardReviewSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = FlashcardReview
+        fields = ['flashcard', 'ease_factor', 'interval_days', 'repetitions', 'lapses',
+                  'last_quality', 'last_reviewed_at', 'due_at']
+
+
+class DueFlashcardSerializer(serializers.ModelSerializer):
+    """A card to review with the student's state of it; review is null for new cards"""
+    review = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Flashcard
+        fields = ['id', 'chapter', 'question', 'answer', 'review']
+    
+    def get_review(self, obj):
+        if obj.review is None:
+            return None
+        data = FlashcardReviewSerializer(obj.review).data
+        del data['flashcard']
+        return data
+
+
+class SearchResultSerializer(serializers.ModelSerializer):
+    snippet = serializers.SerializerMethodField()
+    rank = serializers.FloatField(read_only=True)
+    
+    class Meta:
+        model = SearchDocument
+        fields = ['kind', 'object_id', 'chapter', 'subject', 'grade', 'title', 'snippet', 'rank']
+    
+    def get_snippet(self, obj):
+        return obj.body[:200]
+
+
+class ContentBundleSerializer(serializers.ModelSerializer):
+    grade_level = serializers.CharField(source='grade.level', read_only=True)
+    subject_name = serializers.CharField(source='subject.name', read_only=True)
+    url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ContentBundle
+        fields = ['subject', 'subject_name', 'grade', 'grade_level', 'version', 'url', 'size', 'raw_size',
+                  'chapters', 'built_at']
+    
+    def get_url(self, obj):
+        url = f'{settings.MEDIA_URL}{settings.BUNDLE_DIR}/{obj.file}'
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
@@ -0,0 +1,144 @@
+import threading
+
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, post_migrate
+from django.dispatch import receiver
+
+from . import question_pools
+from .ai_cache import response_cache
+from .catalog_cache import catalog_cache
+from .dashboard import subtract_progress
+from .models import (
+    Grade, Subject, Chapter, StudyMaterial, Quiz, Question, QuestionChoice, Flashcard, StudentProgress
+)
+from .search import ensure_search_index, index_objects, unindex_objects, move_chapter_documents
+
+
+@receiver(pre_save, sender=Chapter)
+def invalidate_ai_cache_on_content_change(sender, instance, update_fields=None, **kwargs):
+    """
+    Drop cached Gemini responses generated from a chapter's previous content
+    """
+    if instance.pk is None:
+        return
+    if update_fields is not None and 'content' not in update_fields:
+        return
+
+    old_content = Chapter.objects.filter(pk=instance.pk).values_list('content', flat=True).first()
+    if old_content and old_content != instance.content:
+        response_cache.invalidate_content(old_content)
+
+
+@receiver(post_delete, sender=Chapter)
+def invalidate_ai_cache_on_delete(sender, instance, **kwargs):
+    response_cache.invalidate_content(instance.content)
+
+
+@receiver(post_save, sender=Chapter)
+@receiver(post_save, sender=StudyMaterial)
+@receiver(post_save, sender=Flashcard)
+@receiver(post_save, sender=Question)
+def update_search_document(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Re-index a saved object. Bulk writes don't send signals; they call
+    index_objects themselves.
+    """
+    if raw:
+        return
+    index_objects([instance])
+    if sender is Chapter and not created:
+        move_chapter_documents(instance)
+
+
+@receiver(post_delete, sender=StudyMaterial)
+@receiver(post_delete, sender=Flashcard)
+@receiver(post_delete, sender=Question)
+def remove_search_document(sender, instance, **kwargs):
+    # Chapter documents go with the chapter through the foreign key cascade
+    unindex_objects(sender, [instance.pk])
+
+
+@receiver(post_save, sender=Grade)
+@receiver(post_save, sender=Subject)
+@receiver(post_save, sender=Chapter)
+@receiver(post_save, sender=StudyMaterial)
+@receiver(post_save, sender=Quiz)
+@receiver(post_save, sender=Question)
+@receiver(post_save, sender=QuestionChoice)
+@receiver(post_delete, sender=Grade)
+@receiver(post_delete, sender=Subject)
+@receiver(post_delete, sender=Chapter)
+@receiver(post_delete, sender=StudyMaterial)
+@receiver(post_delete, sender=Quiz)
+@receiver(post_delete, sender=Question)
+@receiver(post_delete, sender=QuestionChoice)
+def invalidate_catalog_cache(sender, instance, raw=False, **kwargs):
+    """
+    Expire cached catalog responses that include a saved or deleted object.
+    Bulk writes don't send signals; they call invalidate_objects themselves.
+    """
+    if raw:
+        return
+    catalog_cache.invalidate_objects([instance])
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question_pools(sender, instance, raw=False, **kwargs):
+    """
+    Drop the question pools of the chapter whose questions changed. Bulk
+    writes don't send signals; they call invalidate_chapters themselves.
+    """
+    if raw:
+        return
+    if sender is Quiz:
+        question_pools.invalidate_chapters([instance.chapter_id])
+    else:
+        question_pools.invalidate_quizzes([instance.quiz_id])
+
+
+# Progress rows being deleted, per thread and per delete (keyed by its origin)
+_deleting = threading.local()
+
+
+@receiver(pre_delete, sender=StudentProgress)
+def collect_deleted_progress(sender, instance, origin=None, **kwargs):
+    """
+    Note a progress row about to be deleted. A delete sends pre_delete for
+    all of its rows before deleting any, so subtract_deleted_progress sees
+    the whole batch.
+    """
+    pending = getattr(_deleting, 'pending', None)
+    if pending is None:
+        pending = _deleting.pending = {}
+    # Holding origin keeps its id from being reused while rows are pending
+    _, rows = pending.setdefault(id(origin), (origin, {}))
+    rows[instance.pk] = (instance.student_id, instance.chapter_id, instance.status, instance.progress_percentage)
+
+
+@receiver(post_delete, sender=StudentProgress)
+def subtract_deleted_progress(sender, instance, origin=None, **kwargs):
+    """
+    Remove the deleted progress rows from their subject aggregates, including
+    rows deleted by a chapter or student cascade. The first post_delete of a
+    delete subtracts all of its rows, with one update per aggregate.
+    """
+    _, rows = getattr(_deleting, 'pending', {}).pop(id(origin), (None, None))
+    if not rows:
+        return
+    subjects = dict(
+        Chapter.objects.filter(pk__in={chapter_id for _, chapter_id, _, _ in rows.values()})
+        .values_list('id', 'subject_id')
+    )
+    subtract_progress(
+        (student_id, subjects[chapter_id], status, percentage)
+        for student_id, chapter_id, status, percentage in rows.values()
+        if chapter_id in subjects
+    )
+
+
+@receiver(post_migrate)
+def create_search_index(sender, using='default', **kwargs):
+    if sender.name == 'app':
+        ensure_search_index(using)
@@ -0,0 +1,137 @@
+"""
+Spaced-repetition review of flashcards (SM-2).
+
+Each review grades recall from 0 (blackout) to 5 (perfect). A grade of 3 or
+more repeats the card after 1 day, then 6 days, then the previous interval
+times the card's ease factor. A lower grade is a lapse: the card starts over
+at 1 day. Every grade moves the ease factor (never below 1.3), so cards a
+student finds hard come back more often.
+
+A student's state of each card is one FlashcardReview row. Due cards are
+read from the (student, due_at) index, so a student's queue costs the same
+however many rows the table has. A batch of reviews is applied in memory
+and written with one upsert, however many cards it covers.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Flashcard, FlashcardReview
+
+QUALITIES = range(0, 6)
+PASSING_QUALITY = 3
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+FIRST_INTERVAL = 1
+SECOND_INTERVAL = 6
+STATE_FIELDS = [
+    'ease_factor', 'interval_days', 'repetitions', 'lapses', 'last_quality', 'last_reviewed_at', 'due_at'
+]
+
+
+class ReviewError(Exception):
+    pass
+
+
+def schedule(review, quality, reviewed_at):
+    """Apply one graded review to review's state"""
+    if quality >= PASSING_QUALITY:
+        review.repetitions += 1
+        if review.repetitions == 1:
+            review.interval_days = FIRST_INTERVAL
+        elif review.repetitions == 2:
+            review.interval_days = SECOND_INTERVAL
+        else:
+            review.interval_days = round(review.interval_days * review.ease_factor)
+    else:
+        review.repetitions = 0
+        review.interval_days = FIRST_INTERVAL
+        if review.last_reviewed_at is not None:
+            review.lapses += 1
+    miss = 5 - quality
+    review.ease_factor = max(MIN_EASE, round(review.ease_factor + 0.1 - miss * (0.08 + miss * 0.02), 3))
+    review.last_quality = quality
+    review.last_reviewed_at = reviewed_at
+    review.due_at = reviewed_at + timedelta(days=review.interval_days)
+
+
+def submit_reviews(student, reviews):
+    """
+    Apply (flashcard_id, quality, reviewed_at) reviews in the order given and
+    write the new states with one upsert. Reviews older than a card's last
+    review (a batch sent twice, say) are skipped. Returns the written states
+    and the number skipped.
+    """
+    if not reviews:
+        return [], 0
+    if len(reviews) > settings.FLASHCARD_REVIEW_BATCH:
+        raise ReviewError(f'Send at most {settings.FLASHCARD_REVIEW_BATCH} reviews at a time')
+    flashcard_ids = {flashcard_id for flashcard_id, _, _ in reviews}
+    missing = flashcard_ids - set(Flashcard.objects.filter(pk__in=flashcard_ids).values_list('pk', flat=True))
+    if missing:
+        raise ReviewError(f'Unknown flashcards: {", ".join(map(str, sorted(missing)))}')
+
+    states = {
+        review.flashcard_id: review
+        for review in FlashcardReview.objects.filter(student=student, flashcard_id__in=flashcard_ids)
+    }
+    changed = {}
+    skipped = 0
+    for flashcard_id, quality, reviewed_at in reviews:
+        review = states.get(flashcard_id)
+        if review is None:
+            review = states[flashcard_id] = FlashcardReview(
+                student=student, flashcard_id=flashcard_id, ease_factor=INITIAL_EASE
+            )
+        elif review.last_reviewed_at is not None and reviewed_at <= review.last_reviewed_at:
+            skipped += 1
+            continue
+        schedule(review, quality, reviewed_at)
+        changed[flashcard_id] = review
+
+    rows = [
+        FlashcardReview(student=student, flashcard_id=flashcard_id,
+                        **{field: getattr(review, field) for field in STATE_FIELDS})
+        for flashcard_id, review in changed.items()
+    ]
+    FlashcardReview.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['student', 'flashcard'], update_fields=STATE_FIELDS,
+    )
+    return list(changed.values()), skipped
+
+
+def due_cards(student, limit, chapter_id=None, now=None):
+    """
+    Up to limit cards to review now: due cards soonest first, then, when
+    chapter_id is given, the chapter's cards the student hasn't seen. Each
+    card has its FlashcardReview as .review (None for new cards). Also
+    returns when the next card falls due, if none are left.
+    """
+    now = now or timezone.now()
+    due = FlashcardReview.objects.filter(student=student, due_at__lte=now)
+    if chapter_id:
+        due = due.filter(flashcard__chapter_id=chapter_id)
+    cards = []
+    for review in due.select_related('flashcard').order_by('due_at', 'id')[:limit]:
+        review.flashcard.review = review
+        cards.append(review.flashcard)
+
+    if chapter_id and len(cards) < limit:
+        seen = FlashcardReview.objects.filter(student=student, flashcard=OuterRef('pk'))
+        new = (
+            Flashcard.objects.filter(chapter_id=chapter_id).exclude(Exists(seen))
+            .order_by('created_at', 'id')[:limit - len(cards)]
+        )
+        for card in new:
+            card.review = None
+            cards.append(card)
+
+    next_due_at = None
+    if not cards:
+        upcoming = FlashcardReview.objects.filter(student=student, due_at__gt=now)
+        if chapter_id:
+            upcoming = upcoming.filter(flashcard__chapter_id=chapter_id)
+        next_due_at = upcoming.order_by('due_at').values_list('due_at', flat=True).first()
+    return cards, next_due_at
@@ -0,0 +1,75 @@
+"""
+Server-sent events and NDJSON framing for streamed Gemini responses.
+
+Clients opt in with ?stream=sse (or ?stream=1) or ?stream=ndjson. Every
+chunk of generated text is sent as soon as it arrives, followed by a final
+"done" message carrying the request metadata, or an "error" message if
+generation fails, before the first chunk or part way through.
+"""
+import json
+import logging
+
+from django.http import StreamingHttpResponse
+
+logger = logging.getLogger(__name__)
+
+STREAM_FORMATS = {
+    'sse': 'text/event-stream',
+    'ndjson': 'application/x-ndjson',
+}
+STREAM_ALIASES = {'1': 'sse', 'true': 'sse'}
+
+
+def get_stream_format(request):
+    """Return 'sse', 'ndjson' or None from the ?stream= query parameter"""
+    value = (request.query_params.get('stream') or '').strip().lower()
+    value = STREAM_ALIASES.get(value, value)
+    return value if value in STREAM_FORMATS else None
+
+
+class StreamError(Exception):
+    """Generation failed before its first chunk; sent as the error message, already logged"""
+
+
+def failed_stream(error):
+    """An iterator that fails with error, so the response carries an "error" message"""
+    raise StreamError(str(error))
+    yield
+
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def _ndjson(event, payload):
+    return json.dumps({'type': event, **payload}) + "\n"
+
+
+def _frames(chunks, encode, meta):
+    try:
+        for text in chunks:
+            if text:
+                yield encode('chunk', {'text': text})
+    except StreamError as e:
+        yield encode('error', {'error': str(e)})
+        return
+    except Exception as e:
+        logger.exception("Streaming generation failed")
+        yield encode('error', {'error': str(e)})
+        return
+    yield encode('done', meta)
+
+
+def streaming_response(chunks, stream_format, meta=None):
+    """
+    Wrap an iterator of text chunks in a StreamingHttpResponse
+    """
+    encode = _sse if stream_format == 'sse' else _ndjson
+    response = StreamingHttpResponse(
+        _frames(chunks, encode, meta or {}),
+        content_type=STREAM_FORMATS[stream_format],
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
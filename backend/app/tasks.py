@@ -0,0 +1,173 @@
+from celery import chord, shared_task
+from django.conf import settings
+from django.db import transaction
+
+from .ai_utils import generate_summary, generate_mcq_quiz, generate_flashcards, UNAVAILABLE_ERRORS
+from .batch_generation import create_batch, finish_batch, pending_groups, process_group, start_batch
+from .bundles import build_bundles
+from .fingerprints import current_flashcards, current_quiz, remove_generated
+from .jobs import GenerationError, job_lock_held
+from .ingestion import (
+    validate_items, validate_question, validate_flashcard, create_quiz, create_flashcards
+)
+from .models import Grade, Subject, Chapter, GenerationBatch
+from .progress_buffer import flush as flush_progress_buffer
+from .serializers import QuizSerializer, FlashcardSerializer
+from .video_catalog import refresh_stale_chapters
+
+
+@shared_task(bind=True)
+def generate_summary_task(self, chapter_id, bullet_points=10):
+    """
+    Generate an AI summary of chapter content
+    """
+    with job_lock_held(self, chapter_id, bullet_points=bullet_points):
+        chapter = Chapter.objects.get(pk=chapter_id)
+        summary = generate_summary(chapter.content, bullet_points=bullet_points)
+        return {
+            'summary': summary,
+            'chapter_id': chapter.id
+        }
+
+
+@shared_task(bind=True)
+def generate_quiz_task(self, chapter_id, num_questions=10, regenerate=False):
+    """
+    Generate an MCQ quiz from chapter content and save it. A quiz already
+    generated from the current content is returned instead, unless
+    regenerate is set; quizzes generated from older content are replaced.
+    """
+    params = {'num_questions': num_questions, **({'regenerate': True} if regenerate else {})}
+    with job_lock_held(self, chapter_id, **params):
+        chapter = Chapter.objects.get(pk=chapter_id)
+        if not regenerate:
+            quiz = current_quiz(chapter)
+            if quiz is not None:
+                return QuizSerializer(quiz).data
+
+        quiz_data = generate_mcq_quiz(chapter.content, num_questions=num_questions, use_cache=not regenerate)
+        questions, _ = validate_items(quiz_data, validate_question)
+        if not questions:
+            raise GenerationError('Failed to generate quiz')
+        with transaction.atomic():
+            remove_generated([chapter], kinds=['quiz'], stale_only=not regenerate)
+            quiz = create_quiz(chapter, f"AI Generated Quiz - {chapter.title}", questions, generated=True)
+        if quiz is None:
+            raise GenerationError('Every generated question is already in this chapter')
+
+        return QuizSerializer(quiz).data
+
+
+@shared_task(bind=True)
+def generate_flashcards_task(self, chapter_id, num_cards=20, regenerate=False):
+    """
+    Generate flashcards from chapter content and save them. Flashcards
+    already generated from the current content are returned instead, unless
+    regenerate is set; cards generated from older content are replaced.
+    """
+    params = {'num_cards': num_cards, **({'regenerate': True} if regenerate else {})}
+    with job_lock_held(self, chapter_id, **params):
+        chapter = Chapter.objects.get(pk=chapter_id)
+        if not regenerate:
+            flashcards = current_flashcards(chapter)
+            if flashcards:
+                return FlashcardSerializer(flashcards, many=True).data
+
+        flashcards_data = generate_flashcards(chapter.content, num_cards=num_cards, use_cache=not regenerate)
+        cards, _ = validate_items(flashcards_data, validate_flashcard)
+        if not cards:
+            raise GenerationError('Failed to generate flashcards')
+        with transaction.atomic():
+            remove_generated([chapter], kinds=['flashcards'], stale_only=not regenerate)
+            flashcards = create_flashcards(chapter, cards, generated=True)
+        return FlashcardSerializer(flashcards, many=True).data
+
+
+@shared_task
+def refresh_video_catalog_task():
+    """
+    Periodic refresh of stored chapter videos within the YouTube quota budget
+    """
+    refreshed, quota_used = refresh_stale_chapters()
+    return {'refreshed': refreshed, 'quota_used': quota_used}
+
+
+@shared_task
+def run_generation_batch_task(batch_id):
+    """
+    Fan a generation batch out as one task per chapter group; the batch is
+    finished once every group has run
+    """
+    batch = GenerationBatch.objects.get(pk=batch_id)
+    start_batch(batch)
+    groups = pending_groups(batch, settings.GENERATION_BATCH_GROUP_SIZE)
+    if not groups:
+        finish_batch(batch)
+        return {'groups': 0}
+    chord(
+        generate_batch_group_task.s(batch_id, item_ids) for item_ids in groups
+    )(finish_generation_batch_task.si(batch_id))
+    return {'groups': len(groups)}
+
+
+@shared_task(bind=True)
+def generate_batch_group_task(self, batch_id, item_ids):
+    """
+    Generate and store content for one group of a batch. While Gemini is
+    unavailable the task re-queues itself; once out of retries its chapters
+    stay pending for a resumed run.
+    """
+    batch = GenerationBatch.objects.get(pk=batch_id)
+    try:
+        return process_group(batch, item_ids, settings.GENERATION_BATCH_WORKERS)
+    except UNAVAILABLE_ERRORS as e:
+        if not self.request.is_eager and self.request.retries < settings.AI_JOB_MAX_RETRIES:
+            raise self.retry(countdown=e.wait)
+        return {'done': 0, 'failed': 0, 'postponed': len(item_ids)}
+
+
+@shared_task
+def finish_generation_batch_task(batch_id):
+    batch = finish_batch(GenerationBatch.objects.get(pk=batch_id))
+    return {'batch_id': batch.pk, 'status': batch.status}
+
+
+@shared_task
+def refresh_stale_content_task():
+    """
+    Regenerate content of every chapter whose summary, quiz or flashcards
+    were generated from older content
+    """
+    batch = create_batch(stale=True)
+    if not batch.items.exists():
+        finish_batch(batch)
+        return {'batch_id': batch.pk, 'chapters': 0}
+    run_generation_batch_task.delay(batch.pk)
+    return {'batch_id': batch.pk, 'chapters': batch.items.count()}
+
+
+@shared_task
+def flush_progress_buffer_task():
+    """
+    Write buffered progress heartbeats, one batch of students at a time,
+    until the buffer is empty or PROGRESS_FLUSH_MAX_BATCHES were written
+    """
+    written = batches = 0
+    while batches < settings.PROGRESS_FLUSH_MAX_BATCHES:
+        rows = flush_progress_buffer()
+        if not rows:
+            break
+        written += rows
+        batches += 1
+    return {'written': written, 'batches': batches}
+
+
+@shared_task
+def build_bundles_task(grade_id=None, subject_id=None):
+    """
+    Rebuild the offline bundles of subjects whose content changed, for all
+    subjects or one grade's or subject's
+    """
+    grade = Grade.objects.get(pk=grade_id) if grade_id else None
+    subject = Subject.objects.get(pk=subject_id) if subject_id else None
+    return build_bundles(grade=grade, subject=subject)
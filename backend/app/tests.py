@@ -0,0 +1,345 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .ai_cache import AIResponseCache, content_tag, make_key, response_cache
+from .chunking import chunk_counts, estimate_tokens, within_budget
+from .dashboard import record_progress
+from .ingestion import create_quiz
+from .jobs import job_lock_key, submit_job
+from .models import Grade, Subject, Chapter, StudyMaterial, Quiz, Flashcard, StudentProgress, SubjectProgress
+from .progress_buffer import (
+    DIRTY_KEY, _coalesce, _redis_client, _student_key, buffer_events, flush, flush_student, write_events
+)
+from .tasks import generate_quiz_task, generate_summary_task
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'},
+}
+
+
+def make_chapter(content='Photosynthesis turns light into chemical energy.', chapter_number=1, subject=None):
+    if subject is None:
+        grade, _ = Grade.objects.get_or_create(level='class_10', defaults={'description': 'Class 10'})
+        subject, _ = Subject.objects.get_or_create(grade=grade, name='science', defaults={'description': 'Science'})
+    return Chapter.objects.create(
+        subject=subject, title=f'Chapter {chapter_number}', description='', chapter_number=chapter_number,
+        content=content,
+    )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AIResponseCacheTagTests(TestCase):
+    def setUp(self):
+        self.cache = AIResponseCache(alias='default')
+
+    def test_invalidate_content_drops_tagged_responses_from_both_tiers(self):
+        key = make_key('generate_summary', 'model', 'Cells divide.')
+        self.cache.set(key, 'summary', tags=[content_tag('Cells divide.')])
+        self.assertEqual(self.cache.invalidate_content('Cells divide.'), 1)
+        self.assertIsNone(self.cache.shared.get(key))
+        self.assertEqual(self.cache.local.get(key), (False, None))
+
+    def test_invalidate_content_keeps_responses_of_other_text(self):
+        kept = make_key('generate_summary', 'model', 'Atoms bond.')
+        self.cache.set(make_key('generate_summary', 'model', 'Cells divide.'), 'a', tags=[content_tag('Cells divide.')])
+        self.cache.set(kept, 'b', tags=[content_tag('Atoms bond.')])
+        self.cache.invalidate_content('Cells divide.')
+        self.assertEqual(self.cache.get(kept), 'b')
+
+    def test_editing_chapter_content_invalidates_its_responses(self):
+        chapter = make_chapter(content='Old content.')
+        key = make_key('generate_summary', 'model', 'Old content.')
+        response_cache.set(key, 'summary', tags=[content_tag('Old content.')])
+        chapter.content = 'New content.'
+        chapter.save()
+        response_cache.clear_local()
+        self.assertIsNone(response_cache.get(key))
+
+
+def text_of(tokens, word):
+    return (f'{word} ' * tokens * 4)[:tokens * 4]
+
+
+class ChunkingTests(SimpleTestCase):
+    def test_chunk_counts_sum_to_total(self):
+        chunks = [text_of(tokens, f'w{i}') for i, tokens in enumerate([1500, 900, 300, 1200, 40])]
+        for total in (1, 5, 12, 24, 37):
+            with self.subTest(total=total):
+                self.assertEqual(sum(chunk_counts(total, chunks)), total)
+
+    def test_chunk_counts_follow_chunk_size(self):
+        chunks = [text_of(1000, 'a'), text_of(500, 'b'), text_of(500, 'c')]
+        self.assertEqual(chunk_counts(8, chunks), [4, 2, 2])
+        # The remainder goes to the largest chunk
+        self.assertEqual(chunk_counts(5, chunks), [3, 1, 1])
+
+    def test_chunk_counts_minimum(self):
+        chunks = [text_of(1000, 'a'), text_of(10, 'b')]
+        self.assertEqual(chunk_counts(4, chunks, minimum=2), [4, 2])
+
+    def test_within_budget_keeps_everything_that_fits(self):
+        chunks = [text_of(1000, f'w{i}') for i in range(5)]
+        self.assertEqual(within_budget(chunks, 12000), chunks)
+
+    def test_within_budget_fills_the_budget_in_chapter_order(self):
+        chunks = [text_of(1400, f'w{i}') for i in range(30)]
+        kept = within_budget(chunks, 12000)
+        self.assertEqual(len(kept), 8)
+        self.assertLessEqual(sum(estimate_tokens(chunk) for chunk in kept), 12000)
+        self.assertEqual(kept, [chunk for chunk in chunks if chunk in kept])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class JobTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.chapter = make_chapter()
+
+    @mock.patch.object(generate_summary_task, 'apply_async')
+    def test_identical_job_in_flight_is_reused(self, apply_async):
+        job_id, created = submit_job(generate_summary_task, self.chapter.id, bullet_points=10)
+        again, created_again = submit_job(generate_summary_task, self.chapter.id, bullet_points=10)
+        self.assertTrue(created)
+        self.assertEqual((again, created_again), (job_id, False))
+        apply_async.assert_called_once()
+
+    @mock.patch.object(generate_summary_task, 'apply_async')
+    def test_jobs_with_other_parameters_are_not_reused(self, apply_async):
+        job_id, _ = submit_job(generate_summary_task, self.chapter.id, bullet_points=10)
+        other, created = submit_job(generate_summary_task, self.chapter.id, bullet_points=5)
+        self.assertTrue(created)
+        self.assertNotEqual(other, job_id)
+
+    @mock.patch('app.tasks.generate_summary', return_value='- point')
+    def test_finished_job_releases_its_lock(self, generate_summary):
+        with mock.patch.object(generate_summary_task, 'apply_async'):
+            job_id, _ = submit_job(generate_summary_task, self.chapter.id, bullet_points=10)
+        generate_summary_task.apply(kwargs={'chapter_id': self.chapter.id, 'bullet_points': 10}, task_id=job_id)
+        self.assertIsNone(cache.get(job_lock_key(generate_summary_task.name, self.chapter.id, {'bullet_points': 10})))
+
+    @mock.patch.object(generate_quiz_task, 'apply_async')
+    def test_generate_quiz_answers_202_with_job(self, apply_async):
+        response = APIClient().post(
+            f'/api/chapters/{self.chapter.id}/generate_quiz/', {'num_questions': 5}, secure=True
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertIn(response.data['job_id'], response.data['status_url'])
+        self.assertEqual(apply_async.call_args.kwargs['kwargs'], {'chapter_id': self.chapter.id, 'num_questions': 5})
+
+    @override_settings(AI_JOBS_SYNC=True)
+    @mock.patch('app.tasks.generate_mcq_quiz', return_value=[
+        {'question': 'What do plants make from light?', 'options': ['Sugar', 'Salt'], 'correct_answer': 0},
+    ])
+    def test_sync_mode_runs_job_inline(self, generate_mcq_quiz):
+        response = APIClient().post(
+            f'/api/chapters/{self.chapter.id}/generate_quiz/', {'num_questions': 1}, secure=True
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Quiz.objects.filter(chapter=self.chapter).count(), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, CATALOG_CACHE_ENABLED=False)
+class QueryCountTests(TestCase):
+    # (path, queries) for read endpoints with nested data; the count must not grow with the data
+    ENDPOINTS = [
+        ('/api/chapters/?subject_id={subject}', 1),
+        ('/api/chapters/?subject_id={subject}&expand=content,materials', 2),
+        ('/api/chapters/{chapter}/', 2),
+        ('/api/quizzes/?chapter_id={chapter}', 3),
+        ('/api/quizzes/{quiz}/', 3),
+    ]
+
+    def setUp(self):
+        self.chapter = make_chapter()
+        self.quizzes = 0
+
+    def add_nested_rows(self, count):
+        for _ in range(count):
+            self.quizzes += 1
+            sibling = make_chapter(chapter_number=self.quizzes + 1, subject=self.chapter.subject)
+            for chapter in (self.chapter, sibling):
+                StudyMaterial.objects.create(chapter=chapter, title=f'Note {self.quizzes}', material_type='note')
+                create_quiz(chapter, f'Quiz {self.quizzes}', [
+                    {'question': f'Question {self.quizzes}.{n}', 'options': ['A', 'B', 'C'],
+                     'correct_answer': 0, 'difficulty': 1}
+                    for n in range(4)
+                ])
+
+    def assert_query_counts(self):
+        ids = {
+            'subject': self.chapter.subject_id, 'chapter': self.chapter.id,
+            'quiz': self.chapter.quizzes.order_by('id').first().id,
+        }
+        client = APIClient()
+        for path, queries in self.ENDPOINTS:
+            with self.subTest(path=path), self.assertNumQueries(queries):
+                self.assertEqual(client.get(path.format(**ids), secure=True).status_code, 200)
+
+    def test_query_counts_do_not_grow_with_nested_rows(self):
+        self.add_nested_rows(1)
+        self.assert_query_counts()
+        self.add_nested_rows(4)
+        self.assert_query_counts()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProgressWriteTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username='student')
+        self.chapter = make_chapter()
+
+    def progress(self):
+        return StudentProgress.objects.values_list('status', 'progress_percentage').get(
+            student=self.student, chapter=self.chapter
+        )
+
+    def test_coalesce_keeps_the_highest_event_with_its_status(self):
+        events = [(1, 'in_progress', 30), (1, 'not_started', 10), (2, 'in_progress', 40), (2, 'mastered', 40)]
+        self.assertEqual(_coalesce(events), {1: ('in_progress', 30), 2: ('mastered', 40)})
+
+    def test_write_events_never_lowers_stored_progress(self):
+        record_progress(self.student, self.chapter, 'in_progress', 30)
+        write_events({self.student.id: {self.chapter.id: ('not_started', 10)}})
+        self.assertEqual(self.progress(), ('in_progress', 30))
+        self.assertEqual(SubjectProgress.objects.get(student=self.student).progress_total, 30)
+
+    def test_write_events_upserts_rows_and_aggregates(self):
+        record_progress(self.student, self.chapter, 'in_progress', 30)
+        other = make_chapter(chapter_number=2, subject=self.chapter.subject)
+        write_events({self.student.id: {self.chapter.id: ('mastered', 100), other.id: ('in_progress', 20)}})
+        self.assertEqual(self.progress(), ('mastered', 100))
+        aggregate = SubjectProgress.objects.get(student=self.student)
+        self.assertEqual((aggregate.chapters_started, aggregate.progress_total, aggregate.mastered), (2, 120, 1))
+
+    def test_heartbeat_without_redis_is_written_immediately(self):
+        client = APIClient()
+        client.force_authenticate(self.student)
+        response = client.post('/api/progress/heartbeat/', [
+            {'chapter_id': self.chapter.id, 'status': 'in_progress', 'progress_percentage': 50},
+        ], format='json', secure=True)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.progress(), ('in_progress', 50))
+
+
+class RedisProgressBufferTests(TestCase):
+    """Runs against the configured Redis cache; skipped without one"""
+
+    def setUp(self):
+        self.redis = _redis_client()
+        try:
+            if self.redis is None or not self.redis.ping():
+                raise ConnectionError
+        except Exception:
+            self.skipTest('Redis is not available')
+        self.student = User.objects.create_user(username='student')
+        self.chapter = make_chapter()
+        self.redis.delete(_student_key(self.student.id), DIRTY_KEY)
+        self.addCleanup(self.redis.delete, _student_key(self.student.id), DIRTY_KEY)
+
+    def buffered(self):
+        return {
+            int(chapter_id): value.decode()
+            for chapter_id, value in self.redis.hgetall(_student_key(self.student.id)).items()
+        }
+
+    def test_merge_keeps_the_highest_event_with_its_status(self):
+        buffer_events(self.student.id, [(self.chapter.id, 'in_progress', 30)])
+        buffer_events(self.student.id, [(self.chapter.id, 'not_started', 10)])
+        self.assertEqual(self.buffered(), {self.chapter.id: 'in_progress:30'})
+        buffer_events(self.student.id, [(self.chapter.id, 'mastered', 30)])
+        self.assertEqual(self.buffered(), {self.chapter.id: 'mastered:30'})
+
+    def test_flush_writes_buffered_events_once(self):
+        buffer_events(self.student.id, [(self.chapter.id, 'in_progress', 30), (self.chapter.id, 'in_progress', 60)])
+        self.assertFalse(StudentProgress.objects.exists())
+        self.assertEqual(flush(), 1)
+        self.assertEqual(flush(), 0)
+        self.assertEqual(
+            StudentProgress.objects.values_list('status', 'progress_percentage').get(), ('in_progress', 60)
+        )
+        self.assertEqual(self.buffered(), {})
+
+    def test_flush_student_writes_only_that_student(self):
+        other = User.objects.create_user(username='other')
+        self.addCleanup(self.redis.delete, _student_key(other.id))
+        buffer_events(self.student.id, [(self.chapter.id, 'in_progress', 30)])
+        buffer_events(other.id, [(self.chapter.id, 'in_progress', 40)])
+        self.assertEqual(flush_student(self.student.id), 1)
+        self.assertEqual(list(StudentProgress.objects.values_list('student_id', flat=True)), [self.student.id])
+
+    def test_failed_write_puts_events_back(self):
+        buffer_events(self.student.id, [(self.chapter.id, 'in_progress', 30)])
+        with mock.patch('app.progress_buffer.write_events', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                flush()
+        self.assertEqual(self.buffered(), {self.chapter.id: 'in_progress:30'})
+        self.assertEqual(flush(), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, CATALOG_CACHE_ENABLED=False)
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        first = make_chapter(chapter_number=1)
+        other = Subject.objects.create(grade=first.subject.grade, name='mathematics', description='Mathematics')
+        # Chapter numbers repeat across subjects, so the cursor needs both fields
+        for subject in (first.subject, other):
+            for number in range(1, 6):
+                if (subject, number) != (first.subject, 1):
+                    make_chapter(chapter_number=number, subject=subject)
+        self.ordered = list(Chapter.objects.order_by('subject_id', 'chapter_number').values_list('id', flat=True))
+
+    def walk(self, url, link='next'):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url, secure=True)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids += [item['id'] for item in response.data['results']]
+            url, pages = response.data[link], pages + 1
+        return ids, pages
+
+    def test_walks_every_row_once_in_order(self):
+        ids, pages = self.walk('/api/chapters/?page_size=3')
+        self.assertEqual(ids, self.ordered)
+        self.assertEqual(pages, 4)
+
+    def test_previous_links_walk_back(self):
+        url = '/api/chapters/?page_size=3'
+        while True:
+            response = self.client.get(url, secure=True)
+            if not response.data['next']:
+                break
+            url = response.data['next']
+        back, _ = self.walk(response.data['previous'], link='previous')
+        pages = [back[i:i + 3] for i in range(0, len(back), 3)]
+        self.assertEqual([item for page in reversed(pages) for item in page], self.ordered[:9])
+
+    def test_rows_added_before_the_cursor_do_not_shift_pages(self):
+        response = self.client.get('/api/chapters/?page_size=3', secure=True)
+        seen = [item['id'] for item in response.data['results']]
+        make_chapter(chapter_number=0, subject=Chapter.objects.get(pk=seen[0]).subject)
+        rest, _ = self.walk(response.data['next'])
+        self.assertEqual(seen + rest, self.ordered)
+
+    def test_ties_on_the_leading_field_are_not_skipped(self):
+        chapter = Chapter.objects.get(pk=self.ordered[0])
+        Flashcard.objects.bulk_create([
+            Flashcard(chapter=chapter, question=f'Card {n}', answer='Answer') for n in range(7)
+        ])
+        Flashcard.objects.update(created_at=timezone.now())
+        ids, _ = self.walk(f'/api/flashcards/?chapter_id={chapter.id}&page_size=2')
+        self.assertEqual(ids, list(Flashcard.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_invalid_cursor_is_not_found(self):
+        self.assertEqual(self.client.get('/api/chapters/?cursor=bm90LWpzb24', secure=True).status_code, 404)
+
+    def test_page_numbers_still_work(self):
+        response = self.client.get('/api/chapters/?page=2&page_size=3', secure=True)
+        self.assertEqual(response.data['count'], len(self.ordered))
+        self.assertEqual([item['id'] for item in response.data['results']], self.ordered[3:6])
@@ -0,0 +1,189 @@
+"""
+Persistent per-chapter catalog of ranked YouTube videos.
+
+Videos fetched for a chapter are stored as StudyMaterial rows so the read
+path is a database lookup; YouTube is only queried the first time a chapter
+is requested and by the periodic refresh job. Every fetch is recorded in
+videos_attempted_at, so a chapter YouTube had nothing for (no results, an
+API error, an exhausted quota) is served its empty catalog and retried only
+by the refresh job.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .catalog_cache import catalog_cache
+from .models import Chapter, StudyMaterial
+from .rate_limit import RateLimited
+from .search import index_objects
+from .youtube_utils import (
+    fetch_educational_videos, prioritize_videos_by_quality, search_educational_videos,
+    build_search_variants, SEARCH_QUOTA_COST, VIDEOS_LIST_QUOTA_COST
+)
+
+logger = logging.getLogger(__name__)
+
+REFRESH_QUOTA_COST = SEARCH_QUOTA_COST + VIDEOS_LIST_QUOTA_COST
+
+THUMBNAIL_URL = 'https://i.ytimg.com/vi/{video_id}/hqdefault.jpg'
+WATCH_URL = 'https://www.youtube.com/watch?v={video_id}'
+
+
+def refresh_quota_cost():
+    """Quota units one chapter refresh spends with the current search mode"""
+    if not settings.YOUTUBE_SEARCH_FANOUT:
+        return REFRESH_QUOTA_COST
+    return SEARCH_QUOTA_COST * len(build_search_variants('', '')) + VIDEOS_LIST_QUOTA_COST
+
+
+def catalog_videos(chapter):
+    """Stored YouTube videos of a chapter, best first"""
+    return StudyMaterial.objects.filter(
+        chapter=chapter, material_type='video', source='YouTube', video_id__isnull=False
+    ).order_by('-quality_score', 'id')
+
+
+def serialize_video(material):
+    return {
+        'title': material.title,
+        'video_id': material.video_id,
+        'thumbnail': THUMBNAIL_URL.format(video_id=material.video_id),
+        'channel': material.channel,
+        'description': material.content or '',
+        'quality_score': material.quality_score,
+        'fetched_at': material.fetched_at,
+    }
+
+
+def get_chapter_videos(chapter, limit=5):
+    """
+    Ranked videos for a chapter, fetching from YouTube only if it has never
+    been tried for the chapter
+    """
+    if chapter.videos_fetched_at is None and chapter.videos_attempted_at is None:
+        # Only the request that claims the first attempt fetches
+        claimed = Chapter.objects.filter(pk=chapter.pk, videos_attempted_at__isnull=True).update(
+            videos_attempted_at=timezone.now()
+        )
+        if claimed:
+            refresh_chapter_videos(chapter)
+    return [serialize_video(material) for material in catalog_videos(chapter)[:limit]]
+
+
+def refresh_chapter_videos(chapter):
+    """
+    Fetch and rank videos for a chapter and replace its stored YouTube videos.
+
+    Returns the number of videos stored. The attempt is always recorded,
+    but the stored videos are kept when YouTube returns no results, so a
+    missing key or API error doesn't mark the chapter as warmed.
+    """
+    attempted_at = timezone.now()
+    # update() skips Chapter signals and keeps updated_at tied to content edits
+    Chapter.objects.filter(pk=chapter.pk).update(videos_attempted_at=attempted_at)
+    chapter.videos_attempted_at = attempted_at
+
+    if settings.YOUTUBE_SEARCH_FANOUT:
+        videos = search_educational_videos(
+            topic=chapter.title,
+            grade=chapter.subject.grade.level,
+            limit=settings.YOUTUBE_CATALOG_VIDEOS_PER_CHAPTER,
+        )
+    else:
+        videos = fetch_educational_videos(
+            topic=chapter.title,
+            grade=chapter.subject.grade.level,
+            limit=settings.YOUTUBE_CATALOG_VIDEOS_PER_CHAPTER,
+        )
+        if videos:
+            videos = prioritize_videos_by_quality(videos)
+    if not videos:
+        return 0
+
+    now = timezone.now()
+    with transaction.atomic():
+        existing = {material.video_id: material for material in catalog_videos(chapter)}
+        to_create, to_update = [], []
+
+        for video in videos:
+            material = existing.pop(video['video_id'], None)
+            if material is None:
+                material = StudyMaterial(
+                    chapter=chapter,
+                    material_type='video',
+                    source='YouTube',
+                    video_id=video['video_id'],
+                    video_url=WATCH_URL.format(video_id=video['video_id']),
+                )
+                to_create.append(material)
+            else:
+                to_update.append(material)
+            material.title = video['title'][:200]
+            material.channel = video['channel'][:200]
+            material.content = video['description']
+            material.quality_score = video.get('quality_score', 0)
+            material.fetched_at = now
+
+        StudyMaterial.objects.bulk_create(to_create)
+        StudyMaterial.objects.bulk_update(
+            to_update, ['title', 'channel', 'content', 'quality_score', 'fetched_at']
+        )
+        index_objects(to_create + to_update)
+        catalog_cache.invalidate_objects(to_create + to_update)
+        if existing:
+            StudyMaterial.objects.filter(pk__in=[m.pk for m in existing.values()]).delete()
+
+        Chapter.objects.filter(pk=chapter.pk).update(videos_fetched_at=now)
+        chapter.videos_fetched_at = now
+
+    return len(videos)
+
+
+def stale_chapters(max_age=None):
+    """
+    Stale chapters, never tried first and then the longest since their last
+    attempt, so chapters YouTube keeps failing for don't hold up the rest
+    """
+    max_age = max_age if max_age is not None else settings.YOUTUBE_REFRESH_MAX_AGE
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    return Chapter.objects.select_related('subject__grade').exclude(
+        videos_fetched_at__gte=cutoff
+    ).order_by(F('videos_attempted_at').asc(nulls_first=True), 'id')
+
+
+def refresh_stale_chapters(quota_budget=None, batch_size=None, max_age=None):
+    """
+    Refresh stale chapters in batches until the YouTube quota budget is spent.
+
+    Returns (chapters refreshed, quota units used).
+    """
+    quota_budget = quota_budget if quota_budget is not None else settings.YOUTUBE_REFRESH_QUOTA_BUDGET
+    batch_size = batch_size or settings.YOUTUBE_REFRESH_BATCH_SIZE
+
+    cost = refresh_quota_cost()
+
+    refreshed = 0
+    quota_used = 0
+    attempted = []
+    while quota_used + cost <= quota_budget:
+        affordable = (quota_budget - quota_used) // cost
+        batch = list(stale_chapters(max_age).exclude(pk__in=attempted)[:min(batch_size, affordable)])
+        if not batch:
+            break
+        for chapter in batch:
+            attempted.append(chapter.pk)
+            try:
+                stored = refresh_chapter_videos(chapter)
+            except RateLimited as e:
+                # The shared daily quota ran out before this job's own budget
+                logger.warning("Stopping video refresh: %s", e.detail)
+                return refreshed, quota_used
+            quota_used += cost
+            if stored:
+                refreshed += 1
+
+    return refreshed, quota_used
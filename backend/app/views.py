@@ -1,30 +1,48 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
+from rest_framework.reverse import reverse
+from django.conf import settings
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from .models import (
-    Grade, Subject, Chapter, StudyMaterial, Quiz, Question, 
-    QuestionChoice, StudentProgress, Flashcard
+    Grade, Subject, Chapter, StudyMaterial, Quiz, StudentProgress, Flashcard, SearchDocument, ContentBundle,
+    QuizSession, FlashcardReview
 )
+from .dashboard import record_progress, student_dashboard
+from .progress_buffer import MAX_HEARTBEAT_EVENTS, buffer_events, flush_student
 from .serializers import (
-    GradeSerializer, SubjectSerializer, ChapterSerializer, 
-    StudyMaterialSerializer, QuizSerializer, StudentProgressSerializer, FlashcardSerializer
+    GradeSerializer, SubjectSerializer, ChapterSerializer, ChapterListSerializer,
+    StudyMaterialSerializer, QuizSerializer, StudentProgressSerializer, FlashcardSerializer,
+    SearchResultSerializer, ContentBundleSerializer, QuizSessionSerializer, FlashcardReviewSerializer,
+    DueFlashcardSerializer, selected_fields
 )
-from .youtube_utils import fetch_educational_videos, prioritize_videos_by_quality
+from .pagination import KeysetPagination
+from .quiz_sessions import QuizSessionError, answer_question, start_session
+from .spaced_repetition import QUALITIES, ReviewError, due_cards, submit_reviews
+from .video_catalog import get_chapter_videos
+from .search import search
+from .rate_limit import AIRateThrottle, VideoRateThrottle
 from .ai_utils import (
-    generate_summary, generate_mcq_quiz, solve_doubt, 
-    generate_flashcards, explain_concept
+    solve_doubt, explain_concept,
+    stream_summary, stream_doubt_solution, stream_concept_explanation
 )
+from .streaming import get_stream_format, streaming_response
+from .ai_cache import response_cache
+from .catalog_cache import CatalogCacheMixin
+from .jobs import GenerationError, submit_job, run_job, get_job
+from .tasks import generate_summary_task, generate_quiz_task, generate_flashcards_task
 
 
-class GradeViewSet(viewsets.ReadOnlyModelViewSet):
+class GradeViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Grade.objects.all()
     serializer_class = GradeSerializer
     permission_classes = [AllowAny]
 
 
-class SubjectViewSet(viewsets.ReadOnlyModelViewSet):
+class SubjectViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Subject.objects.all()
     serializer_class = SubjectSerializer
     permission_classes = [AllowAny]
@@ -36,33 +54,48 @@ class SubjectViewSet(viewsets.ReadOnlyModelViewSet):
         return Subject.objects.all()
 
 
-class ChapterViewSet(viewsets.ReadOnlyModelViewSet):
+class ChapterViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = ChapterSerializer
     permission_classes = [AllowAny]
+    pagination_class = KeysetPagination
+    # Unique through (subject, chapter_number)
+    cursor_ordering = ('subject_id', 'chapter_number')
+    
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ChapterListSerializer
+        return ChapterSerializer
     
     def get_queryset(self):
+        # fetch_videos reads chapter.subject.grade when warming a chapter
+        queryset = Chapter.objects.select_related('subject__grade')
+        if self.action == 'list':
+            # Lists carry content and materials only when expanded
+            _, expand = selected_fields(self.request)
+            if 'materials' in expand:
+                queryset = queryset.prefetch_related('materials')
+            if 'content' not in expand:
+                queryset = queryset.defer('content')
+        elif self.action == 'retrieve':
+            queryset = queryset.prefetch_related('materials')
+        
         subject_id = self.request.query_params.get('subject_id')
         if subject_id:
-            return Chapter.objects.filter(subject_id=subject_id)
-        return Chapter.objects.all()
+            return queryset.filter(subject_id=subject_id)
+        return queryset
     
-    @action(detail=True, methods=['get'])
+    @action(detail=True, methods=['get'], throttle_classes=[VideoRateThrottle])
     def fetch_videos(self, request, pk=None):
         """
-        Fetch educational videos for a chapter from YouTube
+        Ranked educational videos for a chapter, served from the stored
+        catalog once the chapter has been fetched from YouTube
         """
         chapter = self.get_object()
-        videos = fetch_educational_videos(
-            topic=chapter.title,
-            grade=chapter.subject.grade.level
-        )
+        videos = get_chapter_videos(chapter, limit=5)
         
-        # Prioritize by quality
-        videos = prioritize_videos_by_quality(videos)
-        
-        return Response({'videos': videos[:5]})
+        return Response({'videos': videos})
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], throttle_classes=[AIRateThrottle])
     def generate_summary(self, request, pk=None):
         """
         Generate AI summary of chapter content
@@ -74,14 +107,17 @@ class ChapterViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        summary = generate_summary(chapter.content, bullet_points=10)
+        stream_format = get_stream_format(request)
+        if stream_format:
+            return streaming_response(
+                stream_summary(chapter.content, bullet_points=10),
+                stream_format,
+                meta={'chapter_id': chapter.id}
+            )
         
-        return Response({
-            'summary': summary,
-            'chapter_id': chapter.id
-        })
+        return _submit_generation(request, generate_summary_task, chapter, bullet_points=10)
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], throttle_classes=[AIRateThrottle])
     def generate_quiz(self, request, pk=None):
         """
         Auto-generate MCQ quiz from chapter content
@@ -93,39 +129,19 @@ class ChapterViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        num_questions = request.data.get('num_questions', 10)
-        
-        quiz_data = generate_mcq_quiz(chapter.content, num_questions=num_questions)
-        
-        if not quiz_data:
+        try:
+            num_questions = int(request.data.get('num_questions', 10))
+        except (TypeError, ValueError):
             return Response(
-                {'error': 'Failed to generate quiz'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-        
-        # Save quiz to database
-        quiz = Quiz.objects.create(title=f"AI Generated Quiz - {chapter.title}", chapter=chapter)
-        
-        for idx, q in enumerate(quiz_data):
-            question = Question.objects.create(
-                quiz=quiz,
-                question_text=q['question'],
-                question_type='mcq',
-                difficulty=1 if q.get('difficulty') == 'easy' else 2 if q.get('difficulty') == 'medium' else 3
+                {'error': 'num_questions must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            
-            for i, option in enumerate(q['options']):
-                QuestionChoice.objects.create(
-                    question=question,
-                    choice_text=option,
-                    is_correct=(i == q['correct_answer']),
-                    order=i
-                )
         
-        serializer = QuizSerializer(quiz)
-        return Response(serializer.data)
+        return _submit_generation(
+            request, generate_quiz_task, chapter, num_questions=num_questions, **_regenerate_param(request)
+        )
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], throttle_classes=[AIRateThrottle])
     def generate_flashcards(self, request, pk=None):
         """
         Auto-generate flashcards from chapter content
@@ -137,32 +153,107 @@ class ChapterViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        num_cards = request.data.get('num_cards', 20)
-        
-        flashcards_data = generate_flashcards(chapter.content, num_cards=num_cards)
-        
-        if not flashcards_data:
+        try:
+            num_cards = int(request.data.get('num_cards', 20))
+        except (TypeError, ValueError):
             return Response(
-                {'error': 'Failed to generate flashcards'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {'error': 'num_cards must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Save flashcards to database
-        for card in flashcards_data:
-            Flashcard.objects.create(
-                chapter=chapter,
-                question=card['question'],
-                answer=card['answer']
+        return _submit_generation(
+            request, generate_flashcards_task, chapter, num_cards=num_cards, **_regenerate_param(request)
+        )
+
+
+def _regenerate_param(request):
+    """
+    {'regenerate': True} when the client asks to replace content already
+    generated from the chapter's current text; omitted otherwise so default
+    requests keep sharing one job key
+    """
+    value = request.data.get('regenerate')
+    if value is True or str(value).lower() in ('1', 'true'):
+        return {'regenerate': True}
+    return {}
+
+
+def _progress_event(data):
+    """
+    (chapter_id, status, progress_percentage) of a progress report and None,
+    or None and an error message
+    """
+    if not hasattr(data, 'get'):
+        return None, 'Each progress report must be an object'
+    try:
+        chapter_id = int(data.get('chapter_id'))
+    except (TypeError, ValueError):
+        return None, 'chapter_id must be an integer'
+    progress_status = data.get('status')
+    if progress_status not in dict(StudentProgress.STATUS_CHOICES):
+        return None, 'status must be one of: ' + ', '.join(dict(StudentProgress.STATUS_CHOICES))
+    try:
+        progress = int(data.get('progress_percentage', 0))
+    except (TypeError, ValueError):
+        return None, 'progress_percentage must be an integer'
+    if not 0 <= progress <= 100:
+        return None, 'progress_percentage must be between 0 and 100'
+    return (chapter_id, progress_status, progress), None
+
+
+def _review_entry(data, now):
+    """
+    (flashcard_id, quality, reviewed_at) of a flashcard review and None, or
+    None and an error message
+    """
+    if not hasattr(data, 'get'):
+        return None, 'Each review must be an object'
+    try:
+        flashcard_id = int(data.get('flashcard_id'))
+        quality = int(data.get('quality'))
+    except (TypeError, ValueError):
+        return None, 'flashcard_id and quality must be integers'
+    if quality not in QUALITIES:
+        return None, f'quality must be between {QUALITIES[0]} and {QUALITIES[-1]}'
+    reviewed_at = now
+    if data.get('reviewed_at'):
+        reviewed_at = parse_datetime(str(data['reviewed_at']))
+        if reviewed_at is None:
+            return None, 'reviewed_at must be an ISO 8601 datetime'
+        if timezone.is_naive(reviewed_at):
+            reviewed_at = timezone.make_aware(reviewed_at)
+        # Clocks of offline clients can run ahead
+        reviewed_at = min(reviewed_at, now)
+    return (flashcard_id, quality, reviewed_at), None
+
+
+def _submit_generation(request, task, chapter, **params):
+    """
+    Enqueue a generation task and answer 202 with its job id, or run it
+    inline and answer with the result when AI_JOBS_SYNC is enabled
+    """
+    if settings.AI_JOBS_SYNC:
+        try:
+            return Response(run_job(task, chapter.id, **params))
+        except GenerationError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-        
-        flashcards = Flashcard.objects.filter(chapter=chapter)
-        serializer = FlashcardSerializer(flashcards, many=True)
-        return Response(serializer.data)
+    
+    job_id, created = submit_job(task, chapter.id, **params)
+    return Response({
+        'job_id': job_id,
+        'status_url': reverse('job-detail', args=[job_id], request=request),
+        'deduplicated': not created,
+        'chapter_id': chapter.id
+    }, status=status.HTTP_202_ACCEPTED)
 
 
-class StudyMaterialViewSet(viewsets.ReadOnlyModelViewSet):
+class StudyMaterialViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = StudyMaterialSerializer
     permission_classes = [AllowAny]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         chapter_id = self.request.query_params.get('chapter_id')
@@ -171,47 +262,179 @@ class StudyMaterialViewSet(viewsets.ReadOnlyModelViewSet):
         return StudyMaterial.objects.all()
 
 
-class QuizViewSet(viewsets.ReadOnlyModelViewSet):
+class QuizViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Quiz.objects.all()
     serializer_class = QuizSerializer
     permission_classes = [AllowAny]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
+        queryset = Quiz.objects.all()
+        fields, _ = selected_fields(self.request)
+        if fields is None or 'questions' in fields:
+            queryset = queryset.prefetch_related('questions__choices')
         chapter_id = self.request.query_params.get('chapter_id')
         if chapter_id:
-            return Quiz.objects.filter(chapter_id=chapter_id)
-        return Quiz.objects.all()
+            return queryset.filter(chapter_id=chapter_id)
+        return queryset
 
 
 class StudentProgressViewSet(viewsets.ModelViewSet):
     serializer_class = StudentProgressSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         return StudentProgress.objects.filter(student=self.request.user)
     
+    # Writes go through record_progress so the dashboard aggregates stay current
+    def perform_create(self, serializer):
+        data = serializer.validated_data
+        serializer.instance = record_progress(
+            self.request.user, data['chapter'], data.get('status', 'not_started'),
+            data.get('progress_percentage', 0)
+        )
+    
+    def perform_update(self, serializer):
+        instance = serializer.instance
+        data = serializer.validated_data
+        chapter = data.get('chapter', instance.chapter)
+        if chapter.pk != instance.chapter_id:
+            instance.delete()
+        serializer.instance = record_progress(
+            self.request.user, chapter, data.get('status', instance.status),
+            data.get('progress_percentage', instance.progress_percentage)
+        )
+    
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Read-your-writes: apply the student's buffered heartbeats first
+        if self.action != 'heartbeat':
+            flush_student(request.user.pk)
+    
     @action(detail=False, methods=['post'])
     def update_progress(self, request):
         """
         Update student progress for a chapter
         """
-        chapter_id = request.data.get('chapter_id')
-        progress_status = request.data.get('status')
-        progress = request.data.get('progress_percentage', 0)
+        event, error = _progress_event(request.data)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        chapter_id, progress_status, progress = event
         
-        chapter = get_object_or_404(Chapter, id=chapter_id)
+        chapter = get_object_or_404(Chapter.objects.select_related('subject'), id=chapter_id)
         
-        student_progress, created = StudentProgress.objects.update_or_create(
-            student=request.user,
-            chapter=chapter,
-            defaults={
-                'status': progress_status,
-                'progress_percentage': progress
-            }
-        )
+        student_progress = record_progress(request.user, chapter, progress_status, progress)
         
         serializer = self.get_serializer(student_progress)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['post'])
+    def heartbeat(self, request):
+        """
+        Report progress without waiting for the database: events are
+        buffered, coalesced per chapter and written in bulk
+        """
+        reports = request.data
+        if isinstance(reports, dict) and 'events' in reports:
+            reports = reports['events']
+        elif not isinstance(reports, list):
+            reports = [reports]
+        if not reports or len(reports) > MAX_HEARTBEAT_EVENTS:
+            return Response(
+                {'error': f'Send between 1 and {MAX_HEARTBEAT_EVENTS} events'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        events = []
+        for report in reports:
+            event, error = _progress_event(report)
+            if error:
+                return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+            events.append(event)
+        
+        buffer_events(request.user.pk, events)
+        return Response({'buffered': len(events)}, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=False, methods=['get'])
+    def dashboard(self, request):
+        """
+        Completion per grade and subject, status counts and recently
+        studied chapters, read from the per-subject aggregates
+        """
+        return Response(student_dashboard(request.user))
+
+
+class QuizSessionViewSet(viewsets.GenericViewSet):
+    """
+    Adaptive quizzes: questions are drawn one at a time at a difficulty
+    that follows the student's answers, and graded on the server
+    """
+    serializer_class = QuizSessionSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-created_at', '-id')
+    
+    def get_queryset(self):
+        return (
+            QuizSession.objects.filter(student=self.request.user)
+            .select_related('current_question')
+            .prefetch_related('current_question__choices')
+        )
+    
+    def list(self, request):
+        queryset = self.get_queryset()
+        chapter_id = request.query_params.get('chapter_id')
+        if chapter_id:
+            queryset = queryset.filter(chapter_id=chapter_id)
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+    
+    def retrieve(self, request, pk=None):
+        return Response(self.get_serializer(self.get_object()).data)
+    
+    def create(self, request):
+        try:
+            chapter_id = int(request.data.get('chapter_id'))
+            num_questions = int(request.data.get('num_questions') or settings.QUIZ_SESSION_DEFAULT_QUESTIONS)
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'chapter_id and num_questions must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        chapter = get_object_or_404(Chapter.objects.select_related('subject'), id=chapter_id)
+        
+        try:
+            session = start_session(request.user, chapter, num_questions)
+        except QuizSessionError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(session).data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['post'])
+    def answer(self, request, pk=None):
+        """
+        Answer the current question; returns whether it was correct, the
+        correct choice and the session with its next question
+        """
+        session = self.get_object()
+        try:
+            question_id = int(request.data.get('question_id'))
+            choice_id = int(request.data.get('choice_id'))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'question_id and choice_id must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            session, answer = answer_question(session.pk, request.user, question_id, choice_id)
+        except QuizSessionError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'correct': answer.is_correct,
+            'correct_choice_id': answer.correct_choice_id,
+            'session': self.get_serializer(session).data,
+        })
 
 
 class DoubtSolverViewSet(viewsets.ViewSet):
@@ -219,6 +442,7 @@ class DoubtSolverViewSet(viewsets.ViewSet):
     Endpoint to solve student doubts using AI
     """
     permission_classes = [AllowAny]
+    throttle_classes = [AIRateThrottle]
     
     @action(detail=False, methods=['post'])
     def ask_doubt(self, request):
@@ -231,6 +455,14 @@ class DoubtSolverViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        stream_format = get_stream_format(request)
+        if stream_format:
+            return streaming_response(
+                stream_doubt_solution(problem),
+                stream_format,
+                meta={'problem': problem}
+            )
+        
         solution = solve_doubt(problem, problem_image=image)
         
         return Response({
@@ -244,6 +476,7 @@ class ExplainConceptViewSet(viewsets.ViewSet):
     Get AI-powered concept explanation
     """
     permission_classes = [AllowAny]
+    throttle_classes = [AIRateThrottle]
     
     @action(detail=False, methods=['post'])
     def explain(self, request):
@@ -256,6 +489,14 @@ class ExplainConceptViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        stream_format = get_stream_format(request)
+        if stream_format:
+            return streaming_response(
+                stream_concept_explanation(concept, grade),
+                stream_format,
+                meta={'concept': concept}
+            )
+        
         explanation = explain_concept(concept, grade)
         
         return Response({
@@ -267,9 +508,150 @@ class ExplainConceptViewSet(viewsets.ViewSet):
 class FlashcardViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = FlashcardSerializer
     permission_classes = [AllowAny]
+    pagination_class = KeysetPagination
+    cursor_ordering = ('created_at', 'id')
     
     def get_queryset(self):
         chapter_id = self.request.query_params.get('chapter_id')
         if chapter_id:
             return Flashcard.objects.filter(chapter_id=chapter_id)
         return Flashcard.objects.all()
+
+
+class FlashcardReviewViewSet(viewsets.GenericViewSet):
+    """
+    Spaced-repetition review: the student's due cards, and graded reviews
+    that schedule each card's next one
+    """
+    serializer_class = FlashcardReviewSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    cursor_ordering = ('flashcard_id',)
+    
+    def get_queryset(self):
+        return FlashcardReview.objects.filter(student=self.request.user)
+    
+    def list(self, request):
+        page = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+    
+    def create(self, request):
+        """
+        Submit graded reviews; all of them are written at once
+        """
+        reviews = request.data
+        if isinstance(reviews, dict) and 'reviews' in reviews:
+            reviews = reviews['reviews']
+        elif not isinstance(reviews, list):
+            reviews = [reviews]
+        
+        now = timezone.now()
+        entries = []
+        for review in reviews:
+            entry, error = _review_entry(review, now)
+            if error:
+                return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+            entries.append(entry)
+        if not entries:
+            return Response({'error': 'reviews is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            states, skipped = submit_reviews(request.user, entries)
+        except ReviewError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'reviewed': len(states),
+            'skipped': skipped,
+            'results': self.get_serializer(states, many=True).data,
+        })
+    
+    @action(detail=False, methods=['get'])
+    def due(self, request):
+        """
+        Cards to review now, soonest due first, then unseen cards of chapter_id
+        """
+        try:
+            limit = int(request.query_params.get('limit', settings.FLASHCARD_DUE_DEFAULT))
+            chapter_id = int(request.query_params.get('chapter_id') or 0) or None
+        except ValueError:
+            return Response(
+                {'error': 'limit and chapter_id must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, settings.FLASHCARD_DUE_MAX))
+        
+        cards, next_due_at = due_cards(request.user, limit, chapter_id)
+        return Response({
+            'results': DueFlashcardSerializer(cards, many=True).data,
+            'next_due_at': next_due_at,
+        })
+
+
+class ContentBundleViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Current offline bundle of each subject; download the file at url
+    """
+    serializer_class = ContentBundleSerializer
+    permission_classes = [AllowAny]
+    lookup_field = 'subject'
+    
+    def get_queryset(self):
+        queryset = ContentBundle.objects.select_related('subject', 'grade').order_by('grade_id', 'subject_id')
+        grade_id = self.request.query_params.get('grade_id')
+        if grade_id:
+            return queryset.filter(grade_id=grade_id)
+        return queryset
+
+
+class SearchViewSet(viewsets.GenericViewSet):
+    """
+    Ranked full-text search across chapters, materials, flashcards and questions
+    """
+    serializer_class = SearchResultSerializer
+    permission_classes = [AllowAny]
+    
+    def list(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'error': 'q is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        kinds = [kind for kind in request.query_params.get('kind', '').split(',') if kind]
+        valid_kinds = {kind for kind, _ in SearchDocument.KIND_CHOICES}
+        if set(kinds) - valid_kinds:
+            return Response(
+                {'error': f"kind must be one of {', '.join(sorted(valid_kinds))}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        results = search(
+            query,
+            grade_id=request.query_params.get('grade_id'),
+            subject_id=request.query_params.get('subject_id'),
+            kinds=kinds,
+        )
+        page = self.paginate_queryset(results)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class AICacheViewSet(viewsets.ViewSet):
+    """
+    Hit/miss counters for the Gemini response cache
+    """
+    permission_classes = [IsAdminUser]
+    
+    def list(self, request):
+        return Response(response_cache.stats())
+
+
+class JobViewSet(viewsets.ViewSet):
+    """
+    Status and result of background AI generation jobs
+    """
+    permission_classes = [AllowAny]
+    
+    def retrieve(self, request, pk=None):
+        return Response(get_job(pk))
@@ -1,14 +1,56 @@
+import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from django.conf import settings
+from django.core.cache import cache
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from .metrics import track_external, record_cache
+from .rate_limit import RateLimited, consume
+
+logger = logging.getLogger(__name__)
+
 YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY')
 
+# videos.list accepts at most 50 comma-joined ids per call
+VIDEOS_LIST_MAX_IDS = 50
+
+# YouTube Data API quota units: search.list costs 100, one batched videos.list costs 1
+SEARCH_QUOTA_COST = 100
+VIDEOS_LIST_QUOTA_COST = 1
+STATS_CACHE_PREFIX = 'youtube:stats:'
+
+# Fraction of a fan-out search deadline spent waiting on search.list calls
+SEARCH_DEADLINE_SHARE = 0.8
+
+TRUSTED_CHANNELS = [
+    'Khan Academy',
+    'BYJU\'S',
+    'Physics Wallah',
+    'Amoeba Sisters',
+    'CrashCourse',
+    'TED-Ed',
+]
+
+# httplib2 connections are not thread-safe, so each thread keeps its own client
+_client_local = threading.local()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
 def get_youtube_client():
-    """Get YouTube API client"""
+    """Get YouTube API client, built once and reused on this thread"""
     if not YOUTUBE_API_KEY:
         return None
-    return build('youtube', 'v3', developerKey=YOUTUBE_API_KEY)
+    client = getattr(_client_local, 'client', None)
+    if client is None:
+        client = build('youtube', 'v3', developerKey=YOUTUBE_API_KEY, cache_discovery=False)
+        _client_local.client = client
+    return client
 
 
 def fetch_educational_videos(topic, grade, limit=5):
@@ -22,85 +64,238 @@ def fetch_educational_videos(topic, grade, limit=5):
     try:
         query = f"Class {grade} {topic} educational explanation"
         
-        request = youtube.search().list(
-            q=query,
-            part='snippet',
-            type='video',
-            maxResults=limit,
-            order='relevance',
-            relevanceLanguage='en',
-            videoDuration='medium',
-        )
-        
-        response = request.execute()
-        
-        videos = []
-        for item in response.get('items', []):
-            video_data = {
-                'title': item['snippet']['title'],
-                'video_id': item['id']['videoId'],
-                'thumbnail': item['snippet']['thumbnails']['high']['url'],
-                'channel': item['snippet']['channelTitle'],
-                'description': item['snippet']['description'],
-            }
-            videos.append(video_data)
-        
-        return videos
+        with track_external('youtube', 'fetch_educational_videos'):
+            return _search(youtube, {
+                'q': query,
+                'relevanceLanguage': 'en',
+                'videoDuration': 'medium',
+            }, limit)
     
     except HttpError as e:
-        print(f"YouTube API Error: {e}")
+        logger.warning("YouTube API error: %s", e)
         return []
 
 
+def _search(youtube, params, limit):
+    """Run one search.list call and flatten the results"""
+    consume('youtube_quota', SEARCH_QUOTA_COST)
+    request = youtube.search().list(
+        part='snippet',
+        type='video',
+        maxResults=limit,
+        order='relevance',
+        **params,
+    )
+    
+    response = request.execute()
+    
+    videos = []
+    for item in response.get('items', []):
+        video_data = {
+            'title': item['snippet']['title'],
+            'video_id': item['id']['videoId'],
+            'thumbnail': item['snippet']['thumbnails']['high']['url'],
+            'channel': item['snippet']['channelTitle'],
+            'description': item['snippet']['description'],
+        }
+        videos.append(video_data)
+    
+    return videos
+
+
+def build_search_variants(topic, grade):
+    """
+    search.list parameters for each query variant: the base query in every
+    configured language and duration bucket, plus one search restricted to
+    each trusted channel id
+    """
+    query = f"Class {grade} {topic} educational explanation"
+    variants = [
+        {'q': query, 'relevanceLanguage': language, 'videoDuration': duration}
+        for language in settings.YOUTUBE_SEARCH_LANGUAGES
+        for duration in settings.YOUTUBE_SEARCH_DURATIONS
+    ]
+    variants += [
+        {'q': f"{topic} class {grade}", 'channelId': channel_id}
+        for channel_id in settings.YOUTUBE_TRUSTED_CHANNEL_IDS
+    ]
+    return variants
+
+
+def _get_executor():
+    # Created lazily so each forked gunicorn/celery worker gets its own threads
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.YOUTUBE_SEARCH_MAX_WORKERS,
+                thread_name_prefix='youtube-search',
+            )
+    return _executor
+
+
+def _search_variant(params, limit):
+    # Runs on a pool thread, so it uses that thread's own client
+    try:
+        with track_external('youtube', 'search_educational_videos'):
+            return _search(get_youtube_client(), params, limit)
+    except HttpError as e:
+        logger.warning("YouTube API Error: %s", e, exc_info=True)
+        return []
+
+
+def search_educational_videos(topic, grade, limit=5, deadline=None):
+    """
+    Run every query variant concurrently, merge them deduplicated by video_id
+    and rank the result with prioritize_videos_by_quality.
+
+    Latency is bounded by the slowest search rather than their sum. Variants
+    still running when the deadline (seconds) passes are left out, and if
+    there's no time left for the statistics lookup videos are ranked on
+    channel alone. Returns at most limit videos.
+    """
+    if not get_youtube_client():
+        return []
+    deadline = deadline if deadline is not None else settings.YOUTUBE_SEARCH_DEADLINE
+    started = time.monotonic()
+    executor = _get_executor()
+    
+    futures = [
+        executor.submit(_search_variant, params, limit)
+        for params in build_search_variants(topic, grade)
+    ]
+    # Leave part of the budget for the statistics lookup that ranking needs
+    done, not_done = wait(futures, timeout=deadline * SEARCH_DEADLINE_SHARE)
+    for future in not_done:
+        future.cancel()
+    if not_done:
+        logger.warning("YouTube search deadline hit: %d of %d variants missing", len(not_done), len(futures))
+    
+    # Merge in variant order so the base query wins ties
+    videos = {}
+    for future in futures:
+        if future not in done:
+            continue
+        if future.exception() is not None:
+            logger.warning("YouTube search variant failed: %s", future.exception())
+            continue
+        for video in future.result():
+            videos.setdefault(video['video_id'], video)
+    videos = list(videos.values())
+    if not videos:
+        return []
+    
+    remaining = deadline - (time.monotonic() - started)
+    stats_future = executor.submit(get_video_stats_batch, [video['video_id'] for video in videos])
+    try:
+        stats = stats_future.result(timeout=max(remaining, 0))
+    except FutureTimeoutError:
+        logger.warning("YouTube search deadline hit before video statistics were fetched")
+        stats = {}
+    
+    return prioritize_videos_by_quality(videos, stats=stats)[:limit]
+
+
 def get_video_stats(video_id):
     """
     Get view count and engagement metrics
     """
+    return get_video_stats_batch([video_id]).get(video_id)
+
+
+def get_video_stats_batch(video_ids):
+    """
+    Get view count and engagement metrics for many videos at once.
+
+    Cached stats are reused; the rest are fetched with one videos.list call
+    per 50 ids. Returns a dict of video_id -> stats for the videos found.
+    """
+    video_ids = list(dict.fromkeys(video_ids))
+    stats = _get_cached_stats(video_ids)
+    missing = [video_id for video_id in video_ids if video_id not in stats]
+    record_cache('youtube_stats', 'hits', len(stats))
+    record_cache('youtube_stats', 'misses', len(missing))
+    if not missing:
+        return stats
+    
     youtube = get_youtube_client()
     if not youtube:
-        return None
+        return stats
     
-    try:
-        request = youtube.videos().list(
-            part='statistics,contentDetails',
-            id=video_id
-        )
-        response = request.execute()
+    fetched = {}
+    for start in range(0, len(missing), VIDEOS_LIST_MAX_IDS):
+        chunk = missing[start:start + VIDEOS_LIST_MAX_IDS]
+        try:
+            consume('youtube_quota', VIDEOS_LIST_QUOTA_COST)
+        except RateLimited:
+            # Rank what we have on channel alone rather than fail the search
+            logger.warning("YouTube quota budget exhausted, skipping video statistics")
+            break
+        try:
+            request = youtube.videos().list(
+                part='statistics',
+                id=','.join(chunk),
+                maxResults=VIDEOS_LIST_MAX_IDS,
+            )
+            with track_external('youtube', 'get_video_stats_batch'):
+                response = request.execute()
+        except HttpError as e:
+            logger.warning("YouTube API Error: %s", e, exc_info=True)
+            continue
         
-        if response['items']:
-            stats = response['items'][0]['statistics']
-            return {
-                'views': int(stats.get('viewCount', 0)),
-                'likes': int(stats.get('likeCount', 0)),
-                'comments': int(stats.get('commentCount', 0)),
+        for item in response.get('items', []):
+            item_stats = item.get('statistics', {})
+            fetched[item['id']] = {
+                'views': int(item_stats.get('viewCount', 0)),
+                'likes': int(item_stats.get('likeCount', 0)),
+                'comments': int(item_stats.get('commentCount', 0)),
             }
-        return None
-    except HttpError as e:
-        print(f"YouTube API Error: {e}")
-        return None
+    
+    _set_cached_stats(fetched)
+    stats.update(fetched)
+    return stats
 
 
-def prioritize_videos_by_quality(videos):
+def _get_cached_stats(video_ids):
+    if not video_ids:
+        return {}
+    try:
+        cached = cache.get_many([STATS_CACHE_PREFIX + video_id for video_id in video_ids])
+    except Exception as e:
+        logger.warning("YouTube stats cache read failed: %s", e)
+        return {}
+    return {key[len(STATS_CACHE_PREFIX):]: value for key, value in cached.items()}
+
+
+def _set_cached_stats(stats):
+    if not stats:
+        return
+    try:
+        cache.set_many(
+            {STATS_CACHE_PREFIX + video_id: value for video_id, value in stats.items()},
+            settings.YOUTUBE_STATS_CACHE_TTL,
+        )
+    except Exception as e:
+        logger.warning("YouTube stats cache write failed: %s", e)
+
+
+def prioritize_videos_by_quality(videos, stats=None):
     """
-    Score videos based on channel authority and engagement
+    Score videos based on channel authority and engagement.
+
+    stats maps video_id to statistics; fetched when not given.
     """
-    trusted_channels = [
-        'Khan Academy',
-        'BYJU\'S',
-        'Physics Wallah',
-        'Amoeba Sisters',
-        'CrashCourse',
-        'TED-Ed',
-    ]
+    if stats is None:
+        stats = get_video_stats_batch([video['video_id'] for video in videos])
     
     for video in videos:
         score = 0
-        if any(channel in video['channel'] for channel in trusted_channels):
+        if any(channel in video['channel'] for channel in TRUSTED_CHANNELS):
             score += 50
         
-        stats = get_video_stats(video['video_id'])
-        if stats:
-            views = stats.get('views', 0)
+        video_stats = stats.get(video['video_id'])
+        if video_stats:
+            views = video_stats.get('views', 0)
             if views > 100000:
                 score += 30
             elif views > 10000:
@@ -27,6 +27,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.metrics.PrometheusMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -76,7 +77,8 @@ CORS_ALLOW_CREDENTIALS = True
 
 # REST Framework
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # Large lists override this with app.pagination.KeysetPagination
+    'DEFAULT_PAGINATION_CLASS': 'app.pagination.StandardPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
@@ -106,12 +108,39 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Offline subject bundles under MEDIA_ROOT/BUNDLE_DIR, rebuilt by the
+# build-content-bundles beat job when their content changes. Replaced files
+# stay downloadable for BUNDLE_FILE_GRACE seconds.
+BUNDLE_DIR = os.getenv('BUNDLE_DIR', 'bundles')
+BUNDLE_FILE_GRACE = int(os.getenv('BUNDLE_FILE_GRACE', 60 * 60 * 24))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # API Keys
 YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY')
 GOOGLE_GEMINI_API_KEY = os.getenv('GOOGLE_GEMINI_API_KEY')
 
+# How long per-video YouTube statistics are reused before being re-fetched
+YOUTUBE_STATS_CACHE_TTL = int(os.getenv('YOUTUBE_STATS_CACHE_TTL', 60 * 60 * 6))
+
+# Stored video catalog: videos kept per chapter and the periodic refresh budget
+# (search.list costs 100 quota units; the default daily quota is 10,000)
+YOUTUBE_CATALOG_VIDEOS_PER_CHAPTER = int(os.getenv('YOUTUBE_CATALOG_VIDEOS_PER_CHAPTER', 10))
+YOUTUBE_REFRESH_QUOTA_BUDGET = int(os.getenv('YOUTUBE_REFRESH_QUOTA_BUDGET', 5000))
+YOUTUBE_REFRESH_BATCH_SIZE = int(os.getenv('YOUTUBE_REFRESH_BATCH_SIZE', 20))
+YOUTUBE_REFRESH_MAX_AGE = int(os.getenv('YOUTUBE_REFRESH_MAX_AGE', 60 * 60 * 24 * 7))
+
+# Concurrent fan-out search: every language x duration bucket, plus one search
+# per trusted channel id, each costing 100 quota units
+YOUTUBE_SEARCH_FANOUT = os.getenv('YOUTUBE_SEARCH_FANOUT', 'False').lower() == 'true'
+YOUTUBE_SEARCH_LANGUAGES = os.getenv('YOUTUBE_SEARCH_LANGUAGES', 'en').split(',')
+YOUTUBE_SEARCH_DURATIONS = os.getenv('YOUTUBE_SEARCH_DURATIONS', 'medium,short,long').split(',')
+YOUTUBE_TRUSTED_CHANNEL_IDS = [
+    channel_id for channel_id in os.getenv('YOUTUBE_TRUSTED_CHANNEL_IDS', '').split(',') if channel_id
+]
+YOUTUBE_SEARCH_DEADLINE = float(os.getenv('YOUTUBE_SEARCH_DEADLINE', 8))
+YOUTUBE_SEARCH_MAX_WORKERS = int(os.getenv('YOUTUBE_SEARCH_MAX_WORKERS', 8))
+
 # Celery Configuration
 CELERY_BROKER_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
@@ -119,6 +148,43 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_TASK_TRACK_STARTED = True
+CELERY_RESULT_EXPIRES = int(os.getenv('CELERY_RESULT_EXPIRES', 60 * 60 * 24))
+
+# AI generation jobs: set AI_JOBS_SYNC=True to run them inline (tests, local dev)
+AI_JOBS_SYNC = os.getenv('AI_JOBS_SYNC', 'False').lower() == 'true'
+AI_JOB_LOCK_TTL = int(os.getenv('AI_JOB_LOCK_TTL', 600))
+# Times a job re-queues itself while the Gemini budget refills or its circuit is open
+AI_JOB_MAX_RETRIES = int(os.getenv('AI_JOB_MAX_RETRIES', 5))
+
+# Batch content generation (generate_content command): chapters per group
+# (generated concurrently, written in one transaction), concurrent Gemini calls
+# per group, and attempts per chapter before a resumed batch skips it
+GENERATION_BATCH_GROUP_SIZE = int(os.getenv('GENERATION_BATCH_GROUP_SIZE', 5))
+GENERATION_BATCH_WORKERS = int(os.getenv('GENERATION_BATCH_WORKERS', 4))
+GENERATION_BATCH_MAX_ATTEMPTS = int(os.getenv('GENERATION_BATCH_MAX_ATTEMPTS', 3))
+
+CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERY_BEAT_SCHEDULE = {
+    'refresh-video-catalog': {
+        'task': 'app.tasks.refresh_video_catalog_task',
+        'schedule': int(os.getenv('YOUTUBE_REFRESH_INTERVAL', 60 * 60 * 24)),
+    },
+    'flush-progress-buffer': {
+        'task': 'app.tasks.flush_progress_buffer_task',
+        'schedule': int(os.getenv('PROGRESS_FLUSH_INTERVAL', 5)),
+    },
+    'build-content-bundles': {
+        'task': 'app.tasks.build_bundles_task',
+        'schedule': int(os.getenv('BUNDLE_BUILD_INTERVAL', 60 * 60)),
+    },
+}
+# Regenerating stale AI content spends Gemini budget, so it is opt-in
+if os.getenv('STALE_CONTENT_REFRESH_INTERVAL'):
+    CELERY_BEAT_SCHEDULE['refresh-stale-content'] = {
+        'task': 'app.tasks.refresh_stale_content_task',
+        'schedule': int(os.getenv('STALE_CONTENT_REFRESH_INTERVAL')),
+    }
 
 # Cache
 CACHES = {
@@ -128,6 +194,79 @@ CACHES = {
     }
 }
 
+# Gemini response cache (local LRU tier in front of CACHES[AI_CACHE_ALIAS])
+AI_CACHE_ALIAS = os.getenv('AI_CACHE_ALIAS', 'default')
+AI_CACHE_TTL = int(os.getenv('AI_CACHE_TTL', 60 * 60 * 24 * 7))
+AI_CACHE_LOCAL_MAX_ENTRIES = int(os.getenv('AI_CACHE_LOCAL_MAX_ENTRIES', 256))
+AI_CACHE_LOCAL_TTL = int(os.getenv('AI_CACHE_LOCAL_TTL', 300))
+
+# Catalog responses (grades, subjects, chapters, materials, quizzes) cached in
+# CACHES[CATALOG_CACHE_ALIAS] and served with ETag/Last-Modified. Clients and
+# CDNs may reuse a response for CATALOG_CACHE_MAX_AGE seconds before revalidating.
+CATALOG_CACHE_ENABLED = os.getenv('CATALOG_CACHE_ENABLED', 'True').lower() == 'true'
+CATALOG_CACHE_ALIAS = os.getenv('CATALOG_CACHE_ALIAS', 'default')
+CATALOG_CACHE_TTL = int(os.getenv('CATALOG_CACHE_TTL', 60 * 60))
+CATALOG_CACHE_MAX_AGE = int(os.getenv('CATALOG_CACHE_MAX_AGE', 0))
+
+# Progress heartbeats are buffered in CACHES[PROGRESS_BUFFER_ALIAS] and written
+# in bulk by the flush-progress-buffer beat job (PROGRESS_FLUSH_INTERVAL above)
+PROGRESS_BUFFER_ALIAS = os.getenv('PROGRESS_BUFFER_ALIAS', 'default')
+PROGRESS_FLUSH_BATCH_SIZE = int(os.getenv('PROGRESS_FLUSH_BATCH_SIZE', 500))
+PROGRESS_FLUSH_MAX_BATCHES = int(os.getenv('PROGRESS_FLUSH_MAX_BATCHES', 20))
+
+# Adaptive quiz sessions draw questions from per-chapter, per-difficulty id
+# pools in CACHES[QUIZ_POOL_ALIAS]; a session's copy expires QUIZ_SESSION_TTL
+# seconds after it was made and is re-seeded if the session goes on
+QUIZ_POOL_ALIAS = os.getenv('QUIZ_POOL_ALIAS', 'default')
+QUIZ_SESSION_TTL = int(os.getenv('QUIZ_SESSION_TTL', 60 * 60 * 6))
+QUIZ_SESSION_DEFAULT_QUESTIONS = int(os.getenv('QUIZ_SESSION_DEFAULT_QUESTIONS', 10))
+QUIZ_SESSION_MAX_QUESTIONS = int(os.getenv('QUIZ_SESSION_MAX_QUESTIONS', 50))
+QUIZ_START_DIFFICULTY = int(os.getenv('QUIZ_START_DIFFICULTY', 2))
+
+# Flashcard review: at most FLASHCARD_REVIEW_BATCH reviews per submission and
+# FLASHCARD_DUE_MAX cards per due-cards request
+FLASHCARD_REVIEW_BATCH = int(os.getenv('FLASHCARD_REVIEW_BATCH', 200))
+FLASHCARD_DUE_DEFAULT = int(os.getenv('FLASHCARD_DUE_DEFAULT', 20))
+FLASHCARD_DUE_MAX = int(os.getenv('FLASHCARD_DUE_MAX', 100))
+
+# External API budgets (shared token buckets) and per-client AI throttles
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+RATE_LIMIT_CACHE_ALIAS = os.getenv('RATE_LIMIT_CACHE_ALIAS', 'default')
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv('GEMINI_REQUESTS_PER_MINUTE', 60))
+GEMINI_TOKENS_PER_MINUTE = int(os.getenv('GEMINI_TOKENS_PER_MINUTE', 120000))
+YOUTUBE_DAILY_QUOTA = int(os.getenv('YOUTUBE_DAILY_QUOTA', 10000))
+AI_THROTTLE_RATE = os.getenv('AI_THROTTLE_RATE', '20/min') or None
+VIDEO_THROTTLE_RATE = os.getenv('VIDEO_THROTTLE_RATE', '60/min') or None
+
+# Long chapter content is split into chunks of at most AI_CHUNK_TOKENS that are
+# processed in parallel (map-reduce); at most AI_CONTENT_TOKEN_BUDGET tokens of a
+# chapter are sent per generation, sampled across the chapter. The requested
+# items (questions, cards, bullet points) are split across chunks by length
+AI_CHUNK_TOKENS = int(os.getenv('AI_CHUNK_TOKENS', 1500))
+AI_CONTENT_TOKEN_BUDGET = int(os.getenv('AI_CONTENT_TOKEN_BUDGET', 12000))
+AI_CHUNK_WORKERS = int(os.getenv('AI_CHUNK_WORKERS', 4))
+
+# Gemini client: per-attempt (and per-streamed-chunk) timeout, retries with
+# jittered backoff within a total deadline, and a circuit breaker that fails
+# fast after consecutive transient failures (seconds unless noted)
+GEMINI_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', 30))
+GEMINI_TOTAL_DEADLINE = float(os.getenv('GEMINI_TOTAL_DEADLINE', 75))
+GEMINI_MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', 2))
+GEMINI_BACKOFF_BASE = float(os.getenv('GEMINI_BACKOFF_BASE', 0.5))
+GEMINI_BACKOFF_MAX = float(os.getenv('GEMINI_BACKOFF_MAX', 8))
+GEMINI_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('GEMINI_CIRCUIT_FAILURE_THRESHOLD', 5))
+GEMINI_CIRCUIT_RESET_TIMEOUT = float(os.getenv('GEMINI_CIRCUIT_RESET_TIMEOUT', 30))
+# Upper bound on in-flight (including abandoned, hung) Gemini calls per process
+GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', 16))
+
+# Prometheus metrics: queues whose length /metrics reports
+METRICS_CELERY_QUEUES = os.getenv('METRICS_CELERY_QUEUES', 'celery').split(',')
+# /metrics answers a bearer METRICS_TOKEN or clients in METRICS_ALLOWED_IPS
+# (addresses or networks, comma separated); with neither set it is only served
+# when DEBUG is on
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv('METRICS_ALLOWED_IPS', '').split(',') if ip.strip()]
+
 # Security settings for production
 if not DEBUG:
     SECURE_SSL_REDIRECT = True
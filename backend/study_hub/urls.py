@@ -3,10 +3,13 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
+from app.bundles import bundle_file_view
+from app.metrics import metrics_view
 from app.views import (
     GradeViewSet, SubjectViewSet, ChapterViewSet, StudyMaterialViewSet,
     QuizViewSet, StudentProgressViewSet, DoubtSolverViewSet, 
-    ExplainConceptViewSet, FlashcardViewSet
+    ExplainConceptViewSet, FlashcardViewSet, SearchViewSet, AICacheViewSet, JobViewSet, ContentBundleViewSet,
+    QuizSessionViewSet, FlashcardReviewViewSet
 )
 
 router = DefaultRouter()
@@ -16,13 +19,22 @@ router.register(r'chapters', ChapterViewSet, basename='chapter')
 router.register(r'materials', StudyMaterialViewSet, basename='material')
 router.register(r'quizzes', QuizViewSet, basename='quiz')
 router.register(r'progress', StudentProgressViewSet, basename='progress')
+router.register(r'quiz-sessions', QuizSessionViewSet, basename='quiz-session')
+router.register(r'flashcard-reviews', FlashcardReviewViewSet, basename='flashcard-review')
 router.register(r'doubt-solver', DoubtSolverViewSet, basename='doubt-solver')
 router.register(r'explain', ExplainConceptViewSet, basename='explain')
 router.register(r'flashcards', FlashcardViewSet, basename='flashcard')
+router.register(r'search', SearchViewSet, basename='search')
+router.register(r'ai-cache', AICacheViewSet, basename='ai-cache')
+router.register(r'jobs', JobViewSet, basename='job')
+router.register(r'bundles', ContentBundleViewSet, basename='bundle')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include(router.urls)),
+    path('metrics', metrics_view, name='metrics'),
+    # Served in production too; the names are versioned, so responses are cached for a year
+    path(f'{settings.MEDIA_URL.lstrip("/")}{settings.BUNDLE_DIR}/<path:name>', bundle_file_view, name='bundle-file'),
 ]
 
 if settings.DEBUG:
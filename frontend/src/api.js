@@ -9,6 +9,61 @@ const api = axios.create({
   },
 });
 
+const JOB_POLL_INTERVAL_MS = 1500;
+const JOB_MAX_POLLS = 120;
+
+// AI generation endpoints answer 202 with a job id; poll until the job finishes
+const waitForJob = async (response) => {
+  if (response.status !== 202) return response;
+  const jobId = response.data.job_id;
+  for (let attempt = 0; attempt < JOB_MAX_POLLS; attempt += 1) {
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    const { data } = await api.get(`/jobs/${jobId}/`);
+    if (data.status === 'SUCCESS') return { ...response, status: 200, data: data.result };
+    if (data.status === 'FAILURE') throw new Error(data.error || 'Job failed');
+  }
+  throw new Error('Timed out waiting for job');
+};
+
+// Streamed AI responses: POST with ?stream=ndjson and call onChunk(text) for
+// every chunk as it arrives. Resolves with the full text once the stream ends.
+const streamPost = async (path, body, onChunk) => {
+  const response = await fetch(`${API_BASE_URL}/api${path}?stream=ndjson`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(body || {}),
+  });
+  if (!response.ok) {
+    const data = await response.json().catch(() => ({}));
+    throw new Error(data.error || `Request failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let text = '';
+  const handleLine = (line) => {
+    if (!line.trim()) return;
+    const message = JSON.parse(line);
+    if (message.type === 'chunk') {
+      text += message.text;
+      onChunk(message.text, text);
+    } else if (message.type === 'error') {
+      throw new Error(message.error);
+    }
+  };
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    lines.forEach(handleLine);
+  }
+  handleLine(buffer);
+  return text;
+};
+
 // Grades
 export const fetchGrades = () => api.get('/grades/');
 export const fetchGrade = (id) => api.get(`/grades/${id}/`);
@@ -22,16 +77,21 @@ export const fetchSubject = (id) => api.get(`/subjects/${id}/`);
 
 // Chapters
 export const fetchChapters = (subjectId) => {
-  const params = subjectId ? { subject_id: subjectId } : {};
+  // The chapter cards show each chapter's materials
+  const params = subjectId ? { subject_id: subjectId, expand: 'materials' } : { expand: 'materials' };
   return api.get('/chapters/', { params });
 };
 export const fetchChapter = (id) => api.get(`/chapters/${id}/`);
 export const fetchVideos = (chapterId) => api.get(`/chapters/${chapterId}/fetch_videos/`);
-export const generateSummary = (chapterId) => api.post(`/chapters/${chapterId}/generate_summary/`);
+export const generateSummary = (chapterId) =>
+  api.post(`/chapters/${chapterId}/generate_summary/`).then(waitForJob);
 export const generateQuiz = (chapterId, numQuestions = 10) => 
-  api.post(`/chapters/${chapterId}/generate_quiz/`, { num_questions: numQuestions });
+  api.post(`/chapters/${chapterId}/generate_quiz/`, { num_questions: numQuestions }).then(waitForJob);
 export const generateFlashcards = (chapterId, numCards = 10) => 
-  api.post(`/chapters/${chapterId}/generate_flashcards/`, { num_cards: numCards });
+  api.post(`/chapters/${chapterId}/generate_flashcards/`, { num_cards: numCards }).then(waitForJob);
+export const streamSummary = (chapterId, onChunk) =>
+  streamPost(`/chapters/${chapterId}/generate_summary/`, {}, onChunk);
+export const fetchJob = (jobId) => api.get(`/jobs/${jobId}/`);
 
 // Study Materials
 export const fetchMaterials = (chapterId) => {
@@ -45,12 +105,49 @@ export const fetchQuizzes = (chapterId) => {
   return api.get('/quizzes/', { params });
 };
 
+// Quiz sessions
+export const startQuizSession = (chapterId, numQuestions = 10) =>
+  api.post('/quiz-sessions/', { chapter_id: chapterId, num_questions: numQuestions });
+export const answerQuizQuestion = (sessionId, questionId, choiceId) =>
+  api.post(`/quiz-sessions/${sessionId}/answer/`, { question_id: questionId, choice_id: choiceId });
+export const fetchQuizSessions = (chapterId) => {
+  const params = chapterId ? { chapter_id: chapterId } : {};
+  return api.get('/quiz-sessions/', { params });
+};
+
 // Flashcards
 export const fetchFlashcards = (chapterId) => {
   const params = chapterId ? { chapter_id: chapterId } : {};
   return api.get('/flashcards/', { params });
 };
 
+// Flashcard review (spaced repetition)
+export const fetchDueFlashcards = (chapterId, limit = 20) => {
+  const params = chapterId ? { chapter_id: chapterId, limit } : { limit };
+  return api.get('/flashcard-reviews/due/', { params });
+};
+// reviews: [{ flashcard_id, quality, reviewed_at }]; quality is 0-5
+export const submitFlashcardReviews = (reviews) => api.post('/flashcard-reviews/', { reviews });
+
+// Search
+export const searchContent = (query, { gradeId, subjectId, kinds, page } = {}) => {
+  const params = { q: query };
+  if (gradeId) params.grade_id = gradeId;
+  if (subjectId) params.subject_id = subjectId;
+  if (kinds && kinds.length) params.kind = kinds.join(',');
+  if (page) params.page = page;
+  return api.get('/search/', { params });
+};
+
+// Offline bundles: one file per subject with all of its chapters,
+// materials, quizzes and flashcards
+export const fetchBundles = (gradeId) => {
+  const params = gradeId ? { grade_id: gradeId } : {};
+  return api.get('/bundles/', { params });
+};
+
+export const downloadBundle = (bundle) => axios.get(bundle.url);
+
 // AI Features
 export const solveDoubt = (problemDescription) => 
   api.post('/doubt-solver/ask_doubt/', { problem_description: problemDescription });
@@ -58,4 +155,10 @@ export const solveDoubt = (problemDescription) =>
 export const explainConcept = (concept, grade) => 
   api.post('/explain/explain/', { concept, grade });
 
+export const streamDoubtSolution = (problemDescription, onChunk) =>
+  streamPost('/doubt-solver/ask_doubt/', { problem_description: problemDescription }, onChunk);
+
+export const streamConceptExplanation = (concept, grade, onChunk) =>
+  streamPost('/explain/explain/', { concept, grade }, onChunk);
+
 export default api;